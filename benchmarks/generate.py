@@ -0,0 +1,212 @@
+''' Generator for synthetic repositories used by the benchmarks
+
+Each shape mimics a repository layout that is seen in production:
+
+wide
+    one folder with many files
+deep
+    deeply nested folders with a file on each level
+linear
+    a long linear history, every commit changes one file
+merges
+    a history where most commits on master are merges of short branches
+binary
+    a few large binary blobs
+
+The repositories are bare, deterministic for a given scale and seed and are
+only generated if they don't exist yet:
+
+    python -m benchmarks.generate --scale small path/to/repos
+'''
+
+import argparse
+import os
+import random
+
+import pygit2
+
+
+# number of files, folder depth, commits and blob sizes for each scale
+SCALES = {
+    'tiny':  {'files': 200, 'depth': 10, 'commits': 200,
+              'blobs': 2, 'blob_size': 256 * 1024},
+    'small': {'files': 5000, 'depth': 50, 'commits': 5000,
+              'blobs': 4, 'blob_size': 4 * 1024 * 1024},
+    'large': {'files': 50000, 'depth': 200, 'commits': 100000,
+              'blobs': 8, 'blob_size': 64 * 1024 * 1024},
+    }
+
+SHAPES = ('wide', 'deep', 'linear', 'merges', 'binary')
+
+
+class TreeState(object):
+    ''' Nested dict of the files in a commit, writes only changed trees
+
+    state = TreeState(pg2_repo)
+    state['some/path.txt'] = blob_id
+    tree_id = state.write()
+    '''
+
+    def __init__(self, pg2_repo):
+        self._pg2_repo = pg2_repo
+        self._root = {}
+        # tree ids of unchanged folders, keyed by id() of the folder dict
+        self._tree_ids = {}
+
+    def __setitem__(self, git_path, blob_id):
+        ''' Set a blob for a path, folders are created as needed '''
+        names = git_path.split('/')
+        folder = self._root
+        self._tree_ids.pop(id(folder), None)
+        for name in names[:-1]:
+            folder = folder.setdefault(name, {})
+            self._tree_ids.pop(id(folder), None)
+        folder[names[-1]] = blob_id
+
+    def write(self):
+        ''' Write all changed trees and return the id of the root tree '''
+        return self._write(self._root)
+
+    def _write(self, folder):
+        tree_id = self._tree_ids.get(id(folder))
+        if tree_id is not None:
+            return tree_id
+        builder = self._pg2_repo.TreeBuilder()
+        for name, value in folder.items():
+            if isinstance(value, dict):
+                builder.insert(name, self._write(value),
+                               pygit2.GIT_FILEMODE_TREE)
+            else:
+                builder.insert(name, value, pygit2.GIT_FILEMODE_BLOB)
+        tree_id = builder.write()
+        self._tree_ids[id(folder)] = tree_id
+        return tree_id
+
+
+class Generator(object):
+    ''' Create the synthetic repositories of one scale
+
+    generator = Generator('path/to/repos', scale='small', seed=42)
+    path = generator.repository('linear')
+    '''
+
+    def __init__(self, directory, scale='small', seed=42):
+        self.directory = directory
+        self.scale = scale
+        self.sizes = SCALES[scale]
+        self.seed = seed
+
+    def repository(self, shape):
+        ''' Return the path to a repository, generate it if needed '''
+        path = os.path.join(
+            self.directory, '%s-%s-%d.git' % (shape, self.scale, self.seed))
+        if not os.path.exists(os.path.join(path, 'refs', 'heads', 'master')):
+            pg2_repo = pygit2.init_repository(path, bare=True)
+            self._random = random.Random(self.seed)
+            self._time = 1400000000
+            getattr(self, '_generate_' + shape)(pg2_repo)
+        return path
+
+    def _text(self, lines=40):
+        ''' Return some random text '''
+        words = ('git', 'dict', 'tree', 'blob', 'commit', 'path', 'folder')
+        choice = self._random.choice
+        return '\n'.join(
+            ' '.join(choice(words) for i in range(8)) for j in range(lines)
+            ).encode('utf-8') + b'\n'
+
+    def _commit(self, pg2_repo, tree_id, parents, message):
+        ''' Create a commit one minute after the previous one '''
+        self._time += 60
+        signature = pygit2.Signature(
+            'Bench Mark', 'bench@example.com', self._time, 0)
+        return pg2_repo.create_commit(
+            None, signature, signature, message, tree_id, parents)
+
+    def _set_master(self, pg2_repo, commit_id):
+        pg2_repo.create_reference('refs/heads/master', commit_id, force=True)
+
+    def _generate_wide(self, pg2_repo):
+        state = TreeState(pg2_repo)
+        for i in range(self.sizes['files']):
+            blob_id = pg2_repo.create_blob(self._text(5))
+            state['wide/file-%06d.txt' % i] = blob_id
+        state['README.txt'] = pg2_repo.create_blob(b'wide folder\n')
+        commit_id = self._commit(pg2_repo, state.write(), [], 'wide folder')
+        self._set_master(pg2_repo, commit_id)
+
+    def _generate_deep(self, pg2_repo):
+        state = TreeState(pg2_repo)
+        path = ''
+        for level in range(self.sizes['depth']):
+            path += 'level-%03d/' % level
+            state[path + 'file.txt'] = pg2_repo.create_blob(self._text(5))
+        commit_id = self._commit(pg2_repo, state.write(), [], 'deep folders')
+        self._set_master(pg2_repo, commit_id)
+
+    def _paths(self, count=200):
+        ''' Return paths of files in a few nested folders '''
+        return [
+            'src/module-%02d/sub-%d/file-%03d.txt' % (i % 20, i % 3, i)
+            for i in range(count)]
+
+    def _generate_linear(self, pg2_repo):
+        state = TreeState(pg2_repo)
+        paths = self._paths()
+        for path in paths:
+            state[path] = pg2_repo.create_blob(self._text())
+        parents = [self._commit(pg2_repo, state.write(), [], 'initial')]
+        for i in range(self.sizes['commits'] - 1):
+            path = self._random.choice(paths)
+            state[path] = pg2_repo.create_blob(self._text())
+            commit_id = self._commit(
+                pg2_repo, state.write(), parents, 'change %s' % path)
+            parents = [commit_id]
+        self._set_master(pg2_repo, parents[0])
+
+    def _generate_merges(self, pg2_repo):
+        ''' Master consists of merges of branches with two commits each '''
+        state = TreeState(pg2_repo)
+        paths = self._paths()
+        for path in paths:
+            state[path] = pg2_repo.create_blob(self._text())
+        master = self._commit(pg2_repo, state.write(), [], 'initial')
+        commits = 1
+        while commits < self.sizes['commits']:
+            branch = master
+            for i in range(2):
+                path = self._random.choice(paths)
+                state[path] = pg2_repo.create_blob(self._text())
+                branch = self._commit(
+                    pg2_repo, state.write(), [branch], 'change %s' % path)
+            # the merge result is the state of the branch
+            master = self._commit(
+                pg2_repo, state.write(), [master, branch], 'merge branch')
+            commits += 3
+        self._set_master(pg2_repo, master)
+
+    def _generate_binary(self, pg2_repo):
+        state = TreeState(pg2_repo)
+        size = self.sizes['blob_size']
+        for i in range(self.sizes['blobs']):
+            data = bytes(self._random.getrandbits(8) for j in range(4096))
+            data = data * (size // len(data))
+            state['assets/blob-%02d.bin' % i] = pg2_repo.create_blob(data)
+        commit_id = self._commit(pg2_repo, state.write(), [], 'binaries')
+        self._set_master(pg2_repo, commit_id)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory', help='directory for the repositories')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shape', choices=SHAPES, action='append')
+    options = parser.parse_args(arguments)
+    generator = Generator(options.directory, options.scale, options.seed)
+    for shape in options.shape or SHAPES:
+        print(generator.repository(shape))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,592 @@
+''' Benchmarks for the hot paths of gitdict
+
+Run the benchmarks and write the results as JSON:
+
+    python -m benchmarks.run --scale small --repos path/to/repos -o new.json
+
+Compare two result files, slower benchmarks are reported as regressions:
+
+    python -m benchmarks.run compare old.json new.json
+
+Each benchmark is timed 'repeat' times on the same Repository object: the
+first run is reported as "cold", the fastest as "min". The peak memory of
+Python allocations (tracemalloc) is measured in an extra run; memory
+allocated inside libgit2 is not included.
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pygit2
+
+import gitdict
+
+from .generate import SCALES, Generator
+
+
+# registered benchmarks: (name, shape, setup function)
+BENCHMARKS = []
+
+
+def benchmark(shape):
+    ''' Register a benchmark for a repository shape
+
+    The decorated function gets the path to the repository and returns the
+    function to time. It may also return a tuple (function, cleanup).
+    '''
+    def register(setup):
+        BENCHMARKS.append((setup.__name__, shape, setup))
+        return setup
+    return register
+
+
+@benchmark('wide')
+def folder_getitem_wide(path):
+    repo = gitdict.Repository(path)
+    names = ['wide/' + name for name in list(repo['wide'].keys())[::50]]
+    def run():
+        for name in names:
+            repo[name]
+    return run
+
+
+@benchmark('wide')
+def folder_contains_missing(path):
+    repo = gitdict.Repository(path)
+    folder = repo['wide']
+    names = ['missing-%d.txt' % i for i in range(100)]
+    def run():
+        for name in names:
+            name in folder
+            folder.get(name)
+    return run
+
+
+@benchmark('wide')
+def folder_len_and_keys(path):
+    repo = gitdict.Repository(path)
+    folder = repo['wide']
+    def run():
+        len(folder)
+        list(folder.keys())
+    return run
+
+
+@benchmark('wide')
+def walk_wide(path):
+    repo = gitdict.Repository(path)
+    def run():
+        for folder, folders, files in repo.walk():
+            pass
+    return run
+
+
+def hash_work(data):
+    ''' a CPU heavy function of a file content, for folder.map() '''
+    return hashlib.pbkdf2_hmac('sha256', data, b'gitdict', 200)
+
+
+@benchmark('wide')
+def hash_files_wide(path):
+    ''' the serial baseline for folder_map_wide '''
+    repo = gitdict.Repository(path)
+    def run():
+        for folder, folders, files in repo.walk():
+            for file in files:
+                hash_work(file.data)
+    return run
+
+
+@benchmark('wide')
+def folder_map_wide(path):
+    repo = gitdict.Repository(path)
+    def run():
+        for git_path, result in repo.map(hash_work):
+            pass
+    return run
+
+
+@benchmark('wide')
+def manifest_open_wide(path):
+    ''' startup of a worker with an up to date manifest: open and look up '''
+    repo = gitdict.Repository(path)
+    temp_dir = tempfile.mkdtemp()
+    manifest_path = os.path.join(temp_dir, 'manifest')
+    repo.export_manifest(manifest_path).close()
+    def run():
+        manifest = repo.open_manifest(manifest_path)
+        for entry in manifest.prefix('wide/'):
+            pass
+        manifest.close()
+    def cleanup():
+        shutil.rmtree(temp_dir)
+    return run, cleanup
+
+
+@benchmark('wide')
+def registry_startup(path):
+    ''' configure 2000 repositories and use one of them '''
+    parent = os.path.dirname(path)
+    def run():
+        registry = gitdict.RepositoryRegistry()
+        for index in range(2000):
+            registry.add(index, os.path.join(parent, 'repo-%d.git' % index))
+        registry.add('wide', path)
+        registry['wide']['wide']
+        registry.close()
+    return run
+
+
+@benchmark('deep')
+def folder_getitem_deep(path):
+    repo = gitdict.Repository(path)
+    deepest = [folder for folder, folders, files in repo.walk()][-1]
+    git_path = deepest.git_path + '/file.txt'
+    def run():
+        repo[git_path]
+    return run
+
+
+@benchmark('deep')
+def folder_getitem_missing_deep(path):
+    ''' crawler probes: missing names at the end of deep paths '''
+    repo = gitdict.Repository(path)
+    deepest = [folder for folder, folders, files in repo.walk()][-1]
+    git_paths = [deepest.git_path + '/missing-%d' % i for i in range(20)]
+    def run():
+        for git_path in git_paths:
+            repo.get(git_path)
+            git_path in repo
+    return run
+
+
+@benchmark('deep')
+def walk_deep(path):
+    repo = gitdict.Repository(path)
+    def run():
+        for folder, folders, files in repo.walk():
+            pass
+    return run
+
+
+@benchmark('binary')
+def file_data(path):
+    repo = gitdict.Repository(path)
+    files = list(repo['assets'].values())
+    def run():
+        for gf in files:
+            gf.data
+    return run
+
+
+@benchmark('wide')
+def file_data_small(path):
+    repo = gitdict.Repository(path)
+    files = list(repo['wide'].values())[:1000]
+    def run():
+        for gf in files:
+            gf.data
+    return run
+
+
+@benchmark('wide')
+def file_data_small_traced(path):
+    ''' same as file_data_small, shows the cost of enabled tracing '''
+    repo = gitdict.Repository(path)
+    repo.enable_tracing(hook=lambda span: None)
+    files = list(repo['wide'].values())[:1000]
+    def run():
+        for gf in files:
+            gf.data
+    return run
+
+
+@benchmark('deep')
+def folder_getitem_deep_traced(path):
+    repo = gitdict.Repository(path)
+    repo.enable_tracing(hook=lambda span: None)
+    deepest = [folder for folder, folders, files in repo.walk()][-1]
+    git_path = deepest.git_path + '/file.txt'
+    def run():
+        repo[git_path]
+    return run
+
+
+@benchmark('wide')
+def archive_zip_wide(path):
+    repo = gitdict.Repository(path)
+    def run():
+        for chunk in repo.archive('zip'):
+            pass
+    return run
+
+
+@benchmark('binary')
+def archive_tar_gz_binary(path):
+    repo = gitdict.Repository(path)
+    def run():
+        for chunk in repo.archive('tar.gz'):
+            pass
+    return run
+
+
+# a file in the linear and merge repositories
+FILE_PATH = 'src/module-00/sub-0/file-000.txt'
+
+
+@benchmark('wide')
+def transaction_import(path):
+    # the transactions advance the branch, so a copy of the repository is used
+    temp_dir = tempfile.mkdtemp()
+    copy = os.path.join(temp_dir, 'repo')
+    shutil.copytree(path, copy)
+    repo = gitdict.Repository(copy)
+    author = ('Bench Mark', 'bench@example.com')
+    runs = iter(range(1000))
+    def run():
+        folder = 'import-%d/' % next(runs)
+        with repo.transaction('import', author) as tx:
+            for index in range(1000):
+                git_path = '%s%02d/%04d.txt' % (folder, index % 10, index)
+                tx[git_path] = str(index)
+    def cleanup():
+        shutil.rmtree(temp_dir)
+    return run, cleanup
+
+
+@benchmark('linear')
+def commit_history_for(path):
+    repo = gitdict.Repository(path)
+    git_path = FILE_PATH
+    def run():
+        list(repo.commit_history_for(git_path))
+    return run
+
+
+@benchmark('linear')
+def commit_history_for_root(path):
+    ''' the same file history, in a repository rooted at a folder '''
+    repo = gitdict.Repository(path, root='src/module-00')
+    git_path = FILE_PATH[len('src/module-00/'):]
+    def run():
+        list(repo.commit_history_for(git_path))
+    return run
+
+
+@benchmark('linear')
+def commit_history_for_folder(path):
+    repo = gitdict.Repository(path)
+    def run():
+        list(repo.commit_history_for('src/module-00'))
+    return run
+
+
+@benchmark('linear')
+def commit_history_for_graph(path):
+    repo = gitdict.Repository(path)
+    repo.write_commit_graph()
+    git_path = FILE_PATH
+    def run():
+        list(repo.commit_history_for(git_path))
+    def cleanup():
+        repo.commit_graph.close()
+        os.remove(repo.commit_graph.path)
+    return run, cleanup
+
+
+@benchmark('linear')
+def history_page(path):
+    repo = gitdict.Repository(path)
+    node = repo['src/module-00']
+    def run():
+        page = node.history(limit=20)
+        node.history(limit=20, after=page[-1])
+    return run
+
+
+@benchmark('linear')
+def commit_table_build(path):
+    repo = gitdict.Repository(path)
+    def run():
+        repo._commit_table = None
+        repo.commit_table
+    return run
+
+
+@benchmark('linear')
+def commit_table_counts(path):
+    ''' commits per author and week of the last half of the history '''
+    repo = gitdict.Repository(path)
+    table = repo.commit_table
+    since = table.times[len(table) // 2]
+    def run():
+        rows = table.select(since=since)
+        table.count_by_author(rows)
+        table.count_by_period(rows=rows)
+    return run
+
+
+@benchmark('linear')
+def last_commit_for(path):
+    repo = gitdict.Repository(path)
+    git_path = FILE_PATH
+    def run():
+        repo.last_commit_for(git_path)
+    return run
+
+
+@benchmark('linear')
+def repository_history(path):
+    repo = gitdict.Repository(path)
+    def run():
+        len(repo.history)
+    return run
+
+
+@benchmark('linear')
+def history_for_paths(path):
+    repo = gitdict.Repository(path)
+    git_paths = [
+        gf.git_path for folder, folders, files in repo.walk()
+        for gf in files][:50]
+    def run():
+        repo.history_for_paths(git_paths)
+    return run
+
+
+@benchmark('linear')
+def folder_activity(path):
+    repo = gitdict.Repository(path)
+    folder = repo['src/module-00']
+    def run():
+        folder.activity()
+    return run
+
+
+@benchmark('linear')
+def file_blame(path):
+    repo = gitdict.Repository(path)
+    gf = repo[FILE_PATH]
+    def run():
+        repo._blame_cache.clear()
+        gf.blame()
+    return run
+
+
+@benchmark('linear')
+def file_versions(path):
+    ''' the content of every revision of a file '''
+    repo = gitdict.Repository(path)
+    gf = repo[FILE_PATH]
+    def run():
+        for version in gf.versions():
+            version.content()
+    return run
+
+
+@benchmark('linear')
+def diffstats_page(path):
+    ''' the diffstats of a page of 50 commits, without cached results '''
+    repo = gitdict.Repository(path)
+    commits = repo.history(limit=50)
+    def run():
+        repo._diffstat_cache.clear()
+        repo.diffstats(commits)
+    return run
+
+
+@benchmark('linear')
+def diff_page(path):
+    ''' the patches of a page of 20 commits, the uncached baseline '''
+    repo = gitdict.Repository(path)
+    commits = repo.history(limit=21)
+    def run():
+        for new, old in zip(commits, commits[1:]):
+            for patch in repo.diff(new, old):
+                patch.hunks
+    return run
+
+
+@benchmark('linear')
+def compact_diff_page(path):
+    ''' the compact diffs of a page of 20 commits, requested again '''
+    repo = gitdict.Repository(path)
+    commits = repo.history(limit=21)
+    def run():
+        for new, old in zip(commits, commits[1:]):
+            repo.compact_diff(old, new)
+    return run
+
+
+@benchmark('linear')
+def unique_blobs_history(path):
+    ''' every distinct blob in the trees of 100 commits '''
+    repo = gitdict.Repository(path)
+    commits = repo.history(limit=100)
+    def run():
+        for item in repo.unique_blobs(commits):
+            pass
+    return run
+
+
+@benchmark('merges')
+def commit_history_for_merges(path):
+    repo = gitdict.Repository(path)
+    git_path = FILE_PATH
+    def run():
+        list(repo.commit_history_for(git_path))
+    return run
+
+
+@benchmark('merges')
+def commit_history_for_merges_first_parent(path):
+    repo = gitdict.Repository(path)
+    git_path = FILE_PATH
+    def run():
+        list(repo.commit_history_for(git_path, mode='first-parent'))
+    return run
+
+
+@benchmark('merges')
+def commit_history_for_merges_full(path):
+    repo = gitdict.Repository(path)
+    git_path = FILE_PATH
+    def run():
+        list(repo.commit_history_for(git_path, mode='full'))
+    return run
+
+
+@benchmark('merges')
+def last_commit_for_merges(path):
+    repo = gitdict.Repository(path)
+    git_path = FILE_PATH
+    def run():
+        repo.last_commit_for(git_path)
+    return run
+
+
+def measure(func, repeat):
+    ''' Return the timings and the peak memory for a function '''
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'cold': timings[0],
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+        'repeat': repeat,
+        'peak_memory': peak,
+        }
+
+
+def run(generator, repeat=5, selected=None):
+    ''' Run the benchmarks and return the results as a dict '''
+    results = []
+    for name, shape, setup in BENCHMARKS:
+        if selected and not any(part in name for part in selected):
+            continue
+        path = generator.repository(shape)
+        prepared = setup(path)
+        func, cleanup = prepared if isinstance(prepared, tuple) else (
+            prepared, None)
+        try:
+            result = measure(func, repeat)
+        finally:
+            if cleanup is not None:
+                cleanup()
+        result.update({'name': name, 'shape': shape})
+        results.append(result)
+        print('%-32s %-8s %10.6f s %12d B' % (
+            name, shape, result['min'], result['peak_memory']),
+            file=sys.stderr)
+    return {
+        'gitdict': gitdict.__version__,
+        'pygit2': pygit2.__version__,
+        'libgit2': pygit2.LIBGIT2_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': generator.scale,
+        'seed': generator.seed,
+        'time': int(time.time()),
+        'results': results,
+        }
+
+
+def compare(old, new, threshold=1.2):
+    ''' Return lines comparing two result dicts and the regression count '''
+    old_results = {result['name']: result for result in old['results']}
+    lines = []
+    regressions = 0
+    for result in new['results']:
+        previous = old_results.get(result['name'])
+        if previous is None or not previous['min']:
+            continue
+        ratio = result['min'] / previous['min']
+        flag = ''
+        if ratio > threshold:
+            flag = 'REGRESSION'
+            regressions += 1
+        lines.append('%-32s %10.6f -> %10.6f s  x%.2f %s' % (
+            result['name'], previous['min'], result['min'], ratio, flag))
+    return lines, regressions
+
+
+def main(arguments=None):
+    arguments = sys.argv[1:] if arguments is None else arguments
+    if arguments and arguments[0] == 'compare':
+        parser = argparse.ArgumentParser(description='compare results')
+        parser.add_argument('old')
+        parser.add_argument('new')
+        parser.add_argument('--threshold', type=float, default=1.2)
+        options = parser.parse_args(arguments[1:])
+        with open(options.old) as old, open(options.new) as new:
+            lines, regressions = compare(
+                json.load(old), json.load(new), options.threshold)
+        print('\n'.join(lines))
+        return 1 if regressions else 0
+    parser = argparse.ArgumentParser(description='run the benchmarks')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--repos', help='directory for generated repos, '
+                        'a temporary directory if not set')
+    parser.add_argument('-o', '--output', help='file for the JSON results')
+    parser.add_argument('benchmarks', nargs='*',
+                        help='only run benchmarks containing these names')
+    options = parser.parse_args(arguments)
+    directory = options.repos or tempfile.mkdtemp(prefix='gitdict-bench-')
+    try:
+        generator = Generator(directory, options.scale, options.seed)
+        results = run(generator, options.repeat, options.benchmarks)
+    finally:
+        if not options.repos:
+            shutil.rmtree(directory)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as file_handle:
+            file_handle.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,4 +3,9 @@ __version__ = "0.1.2"
 from .repository import Repository
 from .folder import FolderBase, Folder
 from .file import File
-from .utils import GitDictError
\ No newline at end of file
+from .history import History
+from .blame import Blame
+from .sharedcache import SharedCache
+from .registry import RepositoryRegistry
+from .transaction import Transaction
+from .utils import GitDictError
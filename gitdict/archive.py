@@ -0,0 +1,389 @@
+''' Streaming tar and zip archives of git trees
+
+The archives are written as a generator of byte chunks while the tree is
+walked in tree order, folders before their content. Only one blob is held in
+memory at a time, besides the compressed output kept for reuse:
+
+archive_chunks(pg2_repo, tree, format, mtime, prefix='', stats=None,
+               cache_size=16 MiB)
+
+Blobs that appear more than once in the tree are compressed only once, the
+compressed output is kept until its last use, up to cache_size bytes:
+
+zip
+    every file is compressed on its own, the deflated data and crc of a blob
+    is reused for all its paths
+tar.gz
+    a gzip file may consist of several members, the tar data of a repeated
+    blob of at least REUSE_MINIMUM bytes is compressed as a member of its own
+    and the member is reused
+
+The tar and zip headers contain the paths, identical subtrees at different
+paths therefore share only the compressed blobs, not the headers.
+'''
+
+import collections
+import struct
+import tarfile
+import time
+import zipfile
+import zlib
+
+import pygit2
+
+from .utils import GitDictError
+
+
+ARCHIVE_FORMATS = ('tar', 'tar.gz', 'zip')
+
+# minimal size of a repeated blob to be compressed as its own gzip member
+REUSE_MINIMUM = 4096
+
+# size of the data chunks of large blobs
+CHUNK_SIZE = 64 * 1024
+
+# permissions for the file modes of tree entries
+TREE_MODE = 0o755
+FILE_MODES = {
+    pygit2.GIT_FILEMODE_BLOB: 0o644,
+    pygit2.GIT_FILEMODE_BLOB_EXECUTABLE: 0o755,
+    pygit2.GIT_FILEMODE_LINK: 0o777,
+    }
+
+TAR_BLOCK = 512
+TAR_RECORD = 20 * TAR_BLOCK
+
+ZIP64_LIMIT = 0xffffffff
+ZIP_FILE_HEADER = struct.Struct('<4s2B4HL2L2H')
+ZIP_CENTRAL_DIR = struct.Struct('<4s4B4HL2L5H2L')
+ZIP_END = struct.Struct('<4s4H2LH')
+ZIP64_END = struct.Struct('<4sQ2H2L4Q')
+ZIP64_LOCATOR = struct.Struct('<4sLQL')
+
+
+def archive_chunks(pg2_repo, tree, format, mtime, prefix='', stats=None,
+                   cache_size=16 * 1024 * 1024):
+    ''' Generator for the byte chunks of an archive of a tree
+
+    pg2_repo:   pygit2.Repository containing the tree
+    tree:       pygit2.Tree to archive
+    format:     one of 'tar', 'tar.gz' or 'zip'
+    mtime:      unix timestamp used as modification time of all entries
+    prefix:     path prefix for all entries, e.g. 'project/'
+    stats:      optional stats.Stats, to count the bytes read
+    cache_size: maximum bytes of compressed output kept for reuse
+
+    Raises a GitDictError for an unknown format.
+    '''
+    if format not in ARCHIVE_FORMATS:
+        raise GitDictError('Unknown archive format: ' + repr(format))
+    entries = _Entries(pg2_repo, tree, prefix, stats)
+    if format == 'tar':
+        return _tar_chunks(entries, mtime)
+    if format == 'tar.gz':
+        return _tar_gz_chunks(entries, mtime, cache_size)
+    return _zip_chunks(entries, mtime, cache_size)
+
+
+class _Entries(object):
+    ''' The entries of a tree, in tree order, and the blob contents '''
+
+    def __init__(self, pg2_repo, tree, prefix, stats):
+        self._pg2_repo = pg2_repo
+        self._tree = tree
+        self._prefix = prefix
+        self._stats = stats
+
+    def __iter__(self):
+        ''' Iterate over (path, filemode, object id), folders end with '/' '''
+        return self._walk(self._tree, self._prefix)
+
+    def _walk(self, tree, prefix):
+        for entry in tree:
+            path = prefix + entry.name
+            if entry.filemode in FILE_MODES:
+                yield path, entry.filemode, entry.id
+            elif entry.filemode == pygit2.GIT_FILEMODE_TREE:
+                yield path + '/', entry.filemode, entry.id
+                yield from self._walk(self._pg2_repo[entry.id], path + '/')
+            else:
+                # submodules are archived as empty folders, like git does
+                yield path + '/', pygit2.GIT_FILEMODE_TREE, None
+
+    def repeated_blobs(self):
+        ''' Return a Counter of the blob ids that appear more than once '''
+        counter = collections.Counter(
+            oid for path, filemode, oid in self if filemode in FILE_MODES)
+        return collections.Counter(
+            {oid: count for oid, count in counter.items() if count > 1})
+
+    def data(self, oid):
+        ''' Return the content of a blob '''
+        data = self._pg2_repo[oid].data
+        if self._stats is not None:
+            self._stats.count('bytes_read', len(data))
+        return data
+
+
+class _ReuseCache(object):
+    ''' Compressed output for repeated blobs, kept until the last use '''
+
+    def __init__(self, repeated, cache_size):
+        ''' Initialization of the cache
+
+        repeated:   Counter with the number of uses of each repeated blob
+        cache_size: maximum number of cached bytes
+        '''
+        self._remaining = repeated
+        self._cache_size = cache_size
+        self._cached = {}
+        self._size = 0
+
+    def is_repeated(self, oid):
+        ''' Check if a blob has further uses in the archive '''
+        return self._remaining.get(oid, 0) > 0
+
+    def use(self, oid):
+        ''' Return the cached value for a blob or None and count the use '''
+        remaining = self._remaining.get(oid, 0) - 1
+        if remaining > 0:
+            self._remaining[oid] = remaining
+            return self._cached.get(oid)
+        self._remaining.pop(oid, None)
+        value = self._cached.pop(oid, None)
+        if value is not None:
+            self._size -= len(value[-1])
+        return value
+
+    def store(self, oid, value):
+        ''' Keep a value, its last item is the compressed output '''
+        if oid not in self._remaining:
+            return
+        if self._size + len(value[-1]) <= self._cache_size:
+            self._cached[oid] = value
+            self._size += len(value[-1])
+
+
+def _tar_header(path, filemode, mtime, size=0, linkname=''):
+    ''' Return the tar header for an entry '''
+    info = tarfile.TarInfo(path)
+    info.mtime = mtime
+    info.uname = info.gname = 'root'
+    if filemode == pygit2.GIT_FILEMODE_TREE:
+        info.type = tarfile.DIRTYPE
+        info.mode = TREE_MODE
+    elif filemode == pygit2.GIT_FILEMODE_LINK:
+        info.type = tarfile.SYMTYPE
+        info.mode = FILE_MODES[filemode]
+        info.linkname = linkname
+    else:
+        info.mode = FILE_MODES[filemode]
+        info.size = size
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+
+def _tar_padding(size):
+    ''' Return the zero bytes to fill up the last block of some data '''
+    return bytes(-size % TAR_BLOCK)
+
+
+def _tar_entries(entries, mtime):
+    ''' Generator for tuples (blob id or None, data, padding) of the entries
+
+    The header of a file is returned separately, with None as blob id and
+    without padding, followed by the content of the file and its padding.
+    '''
+    for path, filemode, oid in entries:
+        if filemode == pygit2.GIT_FILEMODE_TREE:
+            yield None, _tar_header(path, filemode, mtime), b''
+            continue
+        data = entries.data(oid)
+        if filemode == pygit2.GIT_FILEMODE_LINK:
+            linkname = data.decode('utf-8', 'surrogateescape')
+            header = _tar_header(path, filemode, mtime, linkname=linkname)
+            yield None, header, b''
+            continue
+        yield None, _tar_header(path, filemode, mtime, len(data)), b''
+        yield oid, data, _tar_padding(len(data))
+
+
+def _tar_end(size):
+    ''' Return the end of archive marker, padded to the record size '''
+    size += 2 * TAR_BLOCK
+    return bytes(2 * TAR_BLOCK + (-size % TAR_RECORD))
+
+
+def _tar_chunks(entries, mtime):
+    ''' Generator for the chunks of an uncompressed tar archive '''
+    size = 0
+    for oid, data, padding in _tar_entries(entries, mtime):
+        size += len(data) + len(padding)
+        yield from _chunked(data)
+        if padding:
+            yield padding
+    yield _tar_end(size)
+
+
+def _tar_gz_chunks(entries, mtime, cache_size):
+    ''' Generator for the chunks of a gzip compressed tar archive '''
+    cache = _ReuseCache(entries.repeated_blobs(), cache_size)
+    compressor = None
+    size = 0
+    for oid, data, padding in _tar_entries(entries, mtime):
+        size += len(data) + len(padding)
+        if oid is not None and cache.is_repeated(oid):
+            member = cache.use(oid)
+            if member is None and len(data) >= REUSE_MINIMUM:
+                member = (_gzip_member(data + padding), )
+                cache.store(oid, member)
+            if member is not None:
+                if compressor is not None:
+                    yield compressor.flush()
+                    compressor = None
+                yield member[0]
+                continue
+        if compressor is None:
+            compressor = _gzip_compressor()
+        for chunk in _chunked(data):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        if padding:
+            compressed = compressor.compress(padding)
+            if compressed:
+                yield compressed
+    if compressor is None:
+        compressor = _gzip_compressor()
+    yield compressor.compress(_tar_end(size))
+    yield compressor.flush()
+
+
+def _gzip_compressor():
+    ''' Return a zlib compressor writing a gzip member '''
+    return zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _gzip_member(data):
+    ''' Return data compressed as a complete gzip member '''
+    compressor = _gzip_compressor()
+    return compressor.compress(data) + compressor.flush()
+
+
+def _chunked(data):
+    ''' Generator for slices of data of at most CHUNK_SIZE bytes '''
+    if len(data) <= CHUNK_SIZE:
+        if data:
+            yield data
+        return
+    view = memoryview(data)
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield view[start:start + CHUNK_SIZE].tobytes()
+
+
+def _zip_dos_time(mtime):
+    ''' Return the dos date and time of a unix timestamp '''
+    year, month, day, hour, minute, second = time.localtime(mtime)[:6]
+    year = max(year, 1980)
+    return (hour << 11 | minute << 5 | second // 2,
+            (year - 1980) << 9 | month << 5 | day)
+
+
+def _zip_filename(path):
+    ''' Return the encoded file name and the general purpose flags '''
+    try:
+        return path.encode('ascii'), 0
+    except UnicodeEncodeError:
+        # language encoding flag, the name is utf-8 encoded
+        return path.encode('utf-8', 'surrogateescape'), 0x800
+
+
+def _zip_chunks(entries, mtime, cache_size):
+    ''' Generator for the chunks of a zip archive
+
+    The content of each file is compressed before its local header is
+    written, therefore the zip needs no data descriptors. ZIP64 extensions
+    are used for large files and archives.
+    '''
+    cache = _ReuseCache(entries.repeated_blobs(), cache_size)
+    dos_time, dos_date = _zip_dos_time(mtime)
+    central_directory = []
+    offset = 0
+    for path, filemode, oid in entries:
+        filename, flags = _zip_filename(path)
+        if filemode == pygit2.GIT_FILEMODE_TREE:
+            crc, method, size, compressed = 0, 0, 0, b''
+            external = (0o40000 | TREE_MODE) << 16 | 0x10
+        else:
+            external = (filemode & 0o170000 | FILE_MODES[filemode]) << 16
+            reused = cache.use(oid)
+            if reused is None:
+                data = entries.data(oid)
+                size, crc = len(data), zlib.crc32(data)
+                compressor = zlib.compressobj(
+                    9, zlib.DEFLATED, -zlib.MAX_WBITS)
+                compressed = compressor.compress(data) + compressor.flush()
+                method = zipfile.ZIP_DEFLATED
+                if len(compressed) >= size:
+                    method, compressed = zipfile.ZIP_STORED, data
+                del data
+                cache.store(oid, (crc, method, size, compressed))
+            else:
+                crc, method, size, compressed = reused
+        extra = b''
+        version = 20
+        if size > ZIP64_LIMIT or len(compressed) > ZIP64_LIMIT:
+            extra = struct.pack('<HHQQ', 1, 16, size, len(compressed))
+            version = 45
+            header_sizes = (ZIP64_LIMIT, ZIP64_LIMIT)
+        else:
+            header_sizes = (len(compressed), size)
+        header = ZIP_FILE_HEADER.pack(
+            b'PK\x03\x04', version, 0, flags, method, dos_time, dos_date,
+            crc, header_sizes[0], header_sizes[1], len(filename), len(extra))
+        yield header + filename + extra
+        yield from _chunked(compressed)
+        central_directory.append((
+            filename, flags, method, crc, len(compressed), size, external,
+            offset))
+        offset += len(header) + len(filename) + len(extra) + len(compressed)
+        del compressed
+    yield from _zip_central_directory(
+        central_directory, dos_time, dos_date, offset)
+
+
+def _zip_central_directory(central_directory, dos_time, dos_date, start):
+    ''' Generator for the central directory and the end records '''
+    size = 0
+    for (filename, flags, method, crc, compressed_size, file_size, external,
+         offset) in central_directory:
+        zip64 = []
+        if file_size > ZIP64_LIMIT or compressed_size > ZIP64_LIMIT:
+            zip64.extend((file_size, compressed_size))
+            file_size = compressed_size = ZIP64_LIMIT
+        if offset > ZIP64_LIMIT:
+            zip64.append(offset)
+            offset = ZIP64_LIMIT
+        extra = b''
+        version = 20
+        if zip64:
+            extra = struct.pack(
+                '<HH' + 'Q' * len(zip64), 1, 8 * len(zip64), *zip64)
+            version = 45
+        # created on unix (3), the external attributes are the file mode
+        record = ZIP_CENTRAL_DIR.pack(
+            b'PK\x01\x02', version, 3, version, 0, flags, method, dos_time,
+            dos_date, crc, compressed_size, file_size, len(filename),
+            len(extra), 0, 0, 0, external, offset)
+        record += filename + extra
+        size += len(record)
+        yield record
+    count = len(central_directory)
+    end = b''
+    if count > 0xffff or start > ZIP64_LIMIT or size > ZIP64_LIMIT:
+        end = ZIP64_END.pack(
+            b'PK\x06\x06', 44, 45, 45, 0, 0, count, count, size, start)
+        end += ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, start + size, 1)
+        count = min(count, 0xffff)
+        size = min(size, ZIP64_LIMIT)
+        start = min(start, ZIP64_LIMIT)
+    yield end + ZIP_END.pack(b'PK\x05\x06', 0, 0, count, count, size, start, 0)
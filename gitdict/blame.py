@@ -0,0 +1,186 @@
+''' gitdict.Blame '''
+
+import array
+import struct
+
+import pygit2
+
+from .utils import GitDictError
+
+
+def count_lines(data):
+    ''' Return the number of lines in binary data '''
+    lines = data.count(b'\n')
+    if data and not data.endswith(b'\n'):
+        lines += 1
+    return lines
+
+
+class Blame(object):
+    ''' Per line information about the commit that introduced the line
+
+    A Blame should not be initialized directly, but retrieved from a file:
+        blame = repo['some_file.txt'].blame()
+
+    The data is stored in compact arrays, one entry per line:
+    blame.commit_ids
+        list of the distinct commit ids in the blame
+    blame.commit_indexes
+        array with the index into commit_ids for each line
+    blame.original_lines
+        array with the line number (starting at 1) each line had in the
+        commit that introduced it
+
+    len(blame)
+        number of lines
+    blame[index]
+        tuple (commit id, original line number) for a line, starting at 0
+    for commit_id, original_line in blame
+        iterate over all lines
+    blame.to_bytes(), Blame.from_bytes(data)
+        compact binary form, e.g. for a sharedcache.SharedCache
+    '''
+
+    def __init__(self, commit_ids, commit_indexes, original_lines):
+        ''' Initialization of the blame
+
+        commit_ids:     list of distinct pygit2.Oid
+        commit_indexes: array of indexes into commit_ids, one per line
+        original_lines: array of original line numbers, one per line
+        '''
+        self.commit_ids = commit_ids
+        self.commit_indexes = commit_indexes
+        self.original_lines = original_lines
+
+    @classmethod
+    def for_new_file(cls, commit_id, line_count):
+        ''' Return a blame for a file, where all lines are new
+
+        commit_id:  pygit2.Oid of the commit that introduced the file
+        line_count: number of lines in the file
+        '''
+        commit_indexes = array.array('I', bytes(4 * line_count))
+        original_lines = array.array('I', range(1, line_count + 1))
+        return cls([commit_id], commit_indexes, original_lines)
+
+    @classmethod
+    def from_bytes(cls, data):
+        ''' Return a blame from the binary form created by to_bytes() '''
+        id_count, line_count = struct.unpack_from('<II', data)
+        position = 8
+        commit_ids = []
+        for i in range(id_count):
+            raw = data[position:position + 20]
+            commit_ids.append(pygit2.Oid(raw=raw))
+            position += 20
+        commit_indexes = array.array('I')
+        original_lines = array.array('I')
+        size = line_count * commit_indexes.itemsize
+        commit_indexes.frombytes(data[position:position + size])
+        original_lines.frombytes(data[position + size:position + 2 * size])
+        return cls(commit_ids, commit_indexes, original_lines)
+
+    def to_bytes(self):
+        ''' Return the blame in a compact binary form '''
+        header = struct.pack('<II', len(self.commit_ids), len(self))
+        commit_ids = b''.join(oid.raw for oid in self.commit_ids)
+        return (header + commit_ids + self.commit_indexes.tobytes() +
+                self.original_lines.tobytes())
+
+    def __len__(self):
+        ''' Return the number of lines '''
+        return len(self.commit_indexes)
+
+    def __getitem__(self, index):
+        ''' Return a tuple (commit id, original line number) for a line '''
+        commit_id = self.commit_ids[self.commit_indexes[index]]
+        return commit_id, self.original_lines[index]
+
+    def __iter__(self):
+        ''' Iterate over tuples (commit id, original line number) '''
+        commit_ids = self.commit_ids
+        for commit_index, original_line in zip(self.commit_indexes,
+                                                self.original_lines):
+            yield commit_ids[commit_index], original_line
+
+    def apply(self, patch, commit_id, line_count):
+        ''' Return the blame for a newer revision of the file
+
+        Lines outside of the hunks of the patch keep their attribution, only
+        lines added in the hunks are attributed to the new commit.
+
+        patch:      pygit2.Patch from this revision to the newer one
+        commit_id:  pygit2.Oid of the commit of the newer revision
+        line_count: number of lines in the newer revision
+        '''
+        commit_ids = list(self.commit_ids)
+        # the commit id is only added, if a line is attributed to it
+        new_index = len(commit_ids)
+        added = False
+        old_indexes, old_lines = self.commit_indexes, self.original_lines
+        commit_indexes = array.array('I')
+        original_lines = array.array('I')
+        old_position = 0
+        for hunk in patch.hunks:
+            hunk_lines = [
+                line for line in hunk.lines if line.origin in ' +-']
+            old_numbers = [
+                line.old_lineno for line in hunk_lines if line.origin != '+']
+            if old_numbers:
+                hunk_start = old_numbers[0] - 1
+            else:
+                # pure insertion after the line 'old_start'
+                hunk_start = hunk.old_start
+            # unchanged lines before the hunk
+            commit_indexes.extend(old_indexes[old_position:hunk_start])
+            original_lines.extend(old_lines[old_position:hunk_start])
+            old_position = hunk_start
+            for line in hunk_lines:
+                if line.origin == '+':
+                    added = True
+                    commit_indexes.append(new_index)
+                    original_lines.append(line.new_lineno)
+                    continue
+                if line.origin == ' ':
+                    old_line = line.old_lineno - 1
+                    commit_indexes.append(old_indexes[old_line])
+                    original_lines.append(old_lines[old_line])
+                old_position = line.old_lineno
+        commit_indexes.extend(old_indexes[old_position:])
+        original_lines.extend(old_lines[old_position:])
+        if len(commit_indexes) != line_count:
+            msg = 'Patch does not match the blamed revision, %d != %d lines'
+            raise GitDictError(msg % (len(commit_indexes), line_count))
+        if added:
+            commit_ids.append(commit_id)
+        return Blame(commit_ids, commit_indexes, original_lines)
+
+    @classmethod
+    def merge(cls, blames, commit_id):
+        ''' Return the blame for a merge commit from its parents
+
+        A line is attributed to the merge commit only if it is new in all
+        blames, otherwise the first blame with another commit is used.
+
+        blames:     blames of the merged revision, one for each parent of
+                    the merge, see apply()
+        commit_id:  pygit2.Oid of the merge commit
+        '''
+        commit_ids = []
+        indexes = {}
+        commit_indexes = array.array('I')
+        original_lines = array.array('I')
+        for line in range(len(blames[0])):
+            for blame in blames:
+                line_commit, original_line = blame[line]
+                if line_commit != commit_id:
+                    break
+            else:
+                line_commit, original_line = blames[0][line]
+            index = indexes.get(line_commit.raw)
+            if index is None:
+                index = indexes[line_commit.raw] = len(commit_ids)
+                commit_ids.append(line_commit)
+            commit_indexes.append(index)
+            original_lines.append(original_line)
+        return cls(commit_ids, commit_indexes, original_lines)
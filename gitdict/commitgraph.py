@@ -0,0 +1,278 @@
+''' gitdict.CommitGraph '''
+
+import collections
+import hashlib
+import mmap
+import os
+import struct
+
+import pygit2
+
+from .utils import GitDictError
+
+
+# information about a commit needed for walking the history
+CommitInfo = collections.namedtuple(
+    'CommitInfo', ['id', 'commit_time', 'parent_ids', 'tree_id'])
+
+# file layout constants, see git's Documentation/technical/commit-graph.txt
+SIGNATURE = b'CGPH'
+HASH_LENGTH = 20
+CHUNK_FANOUT = b'OIDF'
+CHUNK_OID_LOOKUP = b'OIDL'
+CHUNK_COMMIT_DATA = b'CDAT'
+CHUNK_EXTRA_EDGES = b'EDGE'
+PARENT_NONE = 0x70000000
+PARENT_EXTRA_EDGES = 0x80000000
+GENERATION_MAX = 0x3FFFFFFF
+
+
+def commit_graph_path(git_dir):
+    ''' Return the path of the commit-graph file for a git directory '''
+    return os.path.join(git_dir, 'objects', 'info', 'commit-graph')
+
+
+class CommitGraph(object):
+    ''' Reader for git's commit-graph file
+
+    The commit-graph file stores the parents, root tree ids, commit times and
+    generation numbers of commits in a table. The file is memory mapped and
+    read in place, no commit object has to be inflated.
+
+    graph = CommitGraph('path/to/repo.git/objects/info/commit-graph')
+    oid in graph
+        check if the commit is stored in the graph
+    len(graph)
+        number of commits in the graph
+    graph.info(oid)
+        CommitInfo tuple (id, commit_time, parent_ids, tree_id) or None
+    graph.generation(oid)
+        generation number of a commit or None
+    graph.close()
+        release the memory map
+    '''
+
+    def __init__(self, path):
+        ''' Open and memory map a commit-graph file
+
+        path:   path to the commit-graph file
+
+        Raises a GitDictError, if the file could not be read or has an
+        unsupported format
+        '''
+        try:
+            with open(path, 'rb') as file_handle:
+                self._mmap = mmap.mmap(
+                    file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            raise GitDictError('could not open commit graph at ' + path)
+        self.path = path
+        try:
+            self._read_header()
+        except (GitDictError, struct.error):
+            self.close()
+            raise GitDictError('unsupported commit graph at ' + path)
+
+    def _read_header(self):
+        ''' Read the header and the chunk offsets of the file '''
+        data = self._mmap
+        signature, version, hash_version, chunk_count, base_count = \
+            struct.unpack_from('>4sBBBB', data, 0)
+        if signature != SIGNATURE or version != 1 or hash_version != 1:
+            raise GitDictError('unsupported commit graph format')
+        if base_count != 0:
+            # split commit graphs are not supported
+            raise GitDictError('unsupported commit graph chain')
+        chunks = {}
+        for i in range(chunk_count):
+            chunk_id, offset = struct.unpack_from('>4sQ', data, 8 + 12 * i)
+            chunks[chunk_id] = offset
+        for chunk_id in (CHUNK_FANOUT, CHUNK_OID_LOOKUP, CHUNK_COMMIT_DATA):
+            if chunk_id not in chunks:
+                raise GitDictError('missing commit graph chunk')
+        self._fanout = chunks[CHUNK_FANOUT]
+        self._oid_lookup = chunks[CHUNK_OID_LOOKUP]
+        self._commit_data = chunks[CHUNK_COMMIT_DATA]
+        self._extra_edges = chunks.get(CHUNK_EXTRA_EDGES)
+        self._count = struct.unpack_from('>I', data, self._fanout + 4 * 255)[0]
+
+    def __len__(self):
+        ''' Return the number of commits in the graph '''
+        return self._count
+
+    def __contains__(self, oid):
+        ''' Check if a commit is stored in the graph '''
+        return self._position(oid) is not None
+
+    def _position(self, oid):
+        ''' Return the position of a commit in the graph or None
+
+        oid:    pygit2.Oid of the commit
+        '''
+        raw = oid.raw
+        data = self._mmap
+        first = raw[0]
+        low = 0
+        if first > 0:
+            offset = self._fanout + 4 * (first - 1)
+            low = struct.unpack_from('>I', data, offset)[0]
+        high = struct.unpack_from('>I', data, self._fanout + 4 * first)[0]
+        # binary search in the sorted table of object ids
+        while low < high:
+            middle = (low + high) // 2
+            start = self._oid_lookup + HASH_LENGTH * middle
+            current = data[start:start + HASH_LENGTH]
+            if current < raw:
+                low = middle + 1
+            elif current > raw:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def _oid(self, position):
+        ''' Return the pygit2.Oid stored at a position '''
+        start = self._oid_lookup + HASH_LENGTH * position
+        return pygit2.Oid(raw=self._mmap[start:start + HASH_LENGTH])
+
+    def _entry(self, position):
+        ''' Return the unpacked commit data at a position '''
+        offset = self._commit_data + (HASH_LENGTH + 16) * position
+        tree = self._mmap[offset:offset + HASH_LENGTH]
+        values = struct.unpack_from('>IIII', self._mmap, offset + HASH_LENGTH)
+        return (tree,) + values
+
+    def _parent_positions(self, first, second):
+        ''' Return the positions of all parents of a commit '''
+        if first == PARENT_NONE:
+            return []
+        if second == PARENT_NONE:
+            return [first]
+        if not second & PARENT_EXTRA_EDGES:
+            return [first, second]
+        # octopus merge, the other parents are listed in the EDGE chunk
+        parents = [first]
+        offset = self._extra_edges + 4 * (second & ~PARENT_EXTRA_EDGES)
+        while True:
+            edge = struct.unpack_from('>I', self._mmap, offset)[0]
+            parents.append(edge & ~PARENT_EXTRA_EDGES)
+            if edge & PARENT_EXTRA_EDGES:
+                return parents
+            offset += 4
+
+    def info(self, oid):
+        ''' Return a CommitInfo for a commit or None if it is not stored
+
+        oid:    pygit2.Oid of the commit
+        '''
+        position = self._position(oid)
+        if position is None:
+            return None
+        tree, first, second, high, low = self._entry(position)
+        parents = self._parent_positions(first, second)
+        commit_time = ((high & 0x3) << 32) | low
+        parent_ids = [self._oid(parent) for parent in parents]
+        return CommitInfo(oid, commit_time, parent_ids, pygit2.Oid(raw=tree))
+
+    def generation(self, oid):
+        ''' Return the generation number of a commit or None
+
+        oid:    pygit2.Oid of the commit
+        '''
+        position = self._position(oid)
+        if position is None:
+            return None
+        return self._entry(position)[3] >> 2
+
+    def close(self):
+        ''' Release the memory map of the file '''
+        self._mmap.close()
+
+
+def write_commit_graph(pg2_repo):
+    ''' Write a commit-graph file for all commits reachable from references
+
+    pg2_repo:   the pygit2.Repository to write the commit graph for
+
+    The file is written in the same format as `git commit-graph write` does
+    and replaces an existing commit-graph file. Returns the path to the file.
+    '''
+    tips = []
+    for name in pg2_repo.listall_references():
+        try:
+            target = pg2_repo.lookup_reference(name).peel(pygit2.Commit)
+        except (ValueError, KeyError, pygit2.GitError):
+            # references to trees or blobs don't have a history
+            continue
+        tips.append(target.id)
+    if not tips:
+        raise GitDictError('no commits found in repository')
+    sorting = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
+    walker = pg2_repo.walk(tips[0], sorting)
+    for tip in tips[1:]:
+        walker.push(tip)
+    # parents are always visited before their children
+    generations = {}
+    commits = []
+    for commit in walker:
+        parent_ids = commit.parent_ids
+        generation = 1 + max(
+            (generations[parent] for parent in parent_ids), default=0)
+        generations[commit.id] = min(generation, GENERATION_MAX)
+        commits.append(commit)
+    commits.sort(key=lambda commit: commit.id.raw)
+    positions = {commit.id: i for i, commit in enumerate(commits)}
+
+    fanout = [0] * 256
+    for commit in commits:
+        fanout[commit.id.raw[0]] += 1
+    total = 0
+    for i, count in enumerate(fanout):
+        total += count
+        fanout[i] = total
+    fanout_chunk = struct.pack('>256I', *fanout)
+    oid_chunk = b''.join(commit.id.raw for commit in commits)
+    commit_data = []
+    extra_edges = []
+    for commit in commits:
+        parents = [positions[parent] for parent in commit.parent_ids]
+        first = parents[0] if parents else PARENT_NONE
+        if len(parents) < 2:
+            second = PARENT_NONE
+        elif len(parents) == 2:
+            second = parents[1]
+        else:
+            second = PARENT_EXTRA_EDGES | len(extra_edges)
+            extra_edges.extend(parents[1:-1])
+            extra_edges.append(PARENT_EXTRA_EDGES | parents[-1])
+        commit_time = commit.commit_time
+        high = (generations[commit.id] << 2) | ((commit_time >> 32) & 0x3)
+        commit_data.append(commit.tree_id.raw)
+        commit_data.append(struct.pack(
+            '>IIII', first, second, high, commit_time & 0xFFFFFFFF))
+    chunks = [
+        (CHUNK_FANOUT, fanout_chunk),
+        (CHUNK_OID_LOOKUP, oid_chunk),
+        (CHUNK_COMMIT_DATA, b''.join(commit_data))]
+    if extra_edges:
+        edge_chunk = struct.pack('>%dI' % len(extra_edges), *extra_edges)
+        chunks.append((CHUNK_EXTRA_EDGES, edge_chunk))
+
+    header = struct.pack('>4sBBBB', SIGNATURE, 1, 1, len(chunks), 0)
+    offset = len(header) + 12 * (len(chunks) + 1)
+    table = []
+    for chunk_id, chunk in chunks:
+        table.append(struct.pack('>4sQ', chunk_id, offset))
+        offset += len(chunk)
+    table.append(struct.pack('>4sQ', b'\0\0\0\0', offset))
+    content = b''.join(
+        [header] + table + [chunk for chunk_id, chunk in chunks])
+    content += hashlib.sha1(content).digest()
+
+    path = commit_graph_path(pg2_repo.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.lock'
+    with open(temp_path, 'wb') as file_handle:
+        file_handle.write(content)
+    os.replace(temp_path, path)
+    return path
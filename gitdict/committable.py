@@ -0,0 +1,302 @@
+''' gitdict.CommitTable '''
+
+import array
+import collections
+
+import pygit2
+
+from .utils import ensure_timestamp
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# length of a period for count_by_period(), one week
+WEEK = 7 * 24 * 60 * 60
+
+# the typecodes of the columns and the matching numpy types
+COLUMNS = {
+    'times': ('q', 'int64'),
+    'author_ids': ('q', 'int64'),
+    'parent_offsets': ('q', 'int64'),
+    'parent_rows': ('q', 'int64'),
+    }
+
+
+class CommitTable(object):
+    ''' All commits of a branch as columns of compact arrays
+
+    A CommitTable should not be initialized directly, but retrieved from a
+    repository:
+        table = repo.commit_table
+
+    Each commit reachable from the opened commit is a row, the rows are
+    sorted with the oldest commit first, parents always before their
+    children. No commit object is kept, the table consists of:
+
+    table.ids
+        the raw commit ids, 20 bytes per row
+    table.times
+        the commit times as unix timestamps
+    table.author_ids
+        the row of the author in table.authors
+    table.authors
+        list of interned (name, email) tuples
+    table.parent_offsets, table.parent_rows
+        the parents of row i are parent_rows[parent_offsets[i]:
+        parent_offsets[i + 1]]
+
+    The columns are numpy arrays if numpy is installed, array.array
+    objects otherwise. The queries use numpy for vectorized filtering and
+    grouping, or fall back to plain loops:
+
+    len(table)
+        number of commits
+    table.select(since=None, until=None, author=None)
+        list of the rows of matching commits, newest first
+    table.count_by_author(rows=None)
+        collections.Counter of (name, email) tuples
+    table.count_by_period(period=WEEK, rows=None)
+        OrderedDict of the start of each period and the number of commits
+    table.commit_id(row)
+        pygit2.Oid of a row
+    table.row(commitish)
+        row of a commit or None
+    table.parents(row)
+        list of the rows of the parents
+    table.commits(rows)
+        iterator of the pygit2.Commit objects for rows
+
+    If the branch moves forward, only the new commits are appended, see
+    extend().
+    '''
+
+    def __init__(self, pg2_repo, tip_id, stats=None):
+        ''' Initialization of the commit table
+
+        pg2_repo:   the pygit2.Repository
+        tip_id:     pygit2.Oid of the newest commit
+        stats:      optional stats.Stats, the visited commits are counted
+        '''
+        self._pg2_repo = pg2_repo
+        self._stats = stats
+        self._clear()
+        self._append(self._walk(tip_id))
+        self.tip_id = tip_id
+
+    def _clear(self):
+        ''' Remove all rows '''
+        self._ids = bytearray()
+        self._columns = {
+            name: array.array(typecode)
+            for name, (typecode, dtype) in COLUMNS.items()}
+        self._columns['parent_offsets'].append(0)
+        self._rows = {}
+        self.authors = []
+        self._author_ids = {}
+        self._numpy_columns = None
+
+    def _walk(self, tip_id, hide_id=None):
+        ''' Return a commit walker, oldest commit and parents first '''
+        sorting = (pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME |
+                   pygit2.GIT_SORT_REVERSE)
+        walker = self._pg2_repo.walk(tip_id, sorting)
+        if hide_id is not None:
+            walker.hide(hide_id)
+        return walker
+
+    def _append(self, commits):
+        ''' Append rows for commits, their parents must be known already '''
+        rows = self._rows
+        times = self._columns['times']
+        author_ids = self._columns['author_ids']
+        parent_offsets = self._columns['parent_offsets']
+        parent_rows = self._columns['parent_rows']
+        visited = 0
+        for commit in commits:
+            visited += 1
+            raw = commit.id.raw
+            rows[raw] = len(times)
+            self._ids.extend(raw)
+            times.append(commit.commit_time)
+            author = commit.author
+            key = (author.name, author.email)
+            author_id = self._author_ids.get(key)
+            if author_id is None:
+                author_id = self._author_ids[key] = len(self.authors)
+                self.authors.append(key)
+            author_ids.append(author_id)
+            parent_rows.extend(
+                rows[parent_id.raw] for parent_id in commit.parent_ids)
+            parent_offsets.append(len(parent_rows))
+        if self._stats is not None and visited:
+            self._stats.count('commits_visited', visited)
+        self._numpy_columns = None
+
+    def extend(self, tip_id):
+        ''' Update the table for a new tip of the branch
+
+        If the new tip is a descendant of the old one, only the new commits
+        are walked and appended. Otherwise, e.g. after a forced push, the
+        table is built again.
+        '''
+        if tip_id == self.tip_id:
+            return
+        if self._pg2_repo.descendant_of(tip_id, self.tip_id):
+            self._append(self._walk(tip_id, self.tip_id))
+        else:
+            self._clear()
+            self._append(self._walk(tip_id))
+        self.tip_id = tip_id
+
+    def __len__(self):
+        ''' Return the number of commits '''
+        return len(self._columns['times'])
+
+    def _column(self, name):
+        ''' Return a column as numpy array or array.array '''
+        if numpy is None:
+            return self._columns[name]
+        if self._numpy_columns is None:
+            # copies of the arrays, a view would prevent appending rows
+            self._numpy_columns = {
+                key: numpy.frombuffer(column, dtype=COLUMNS[key][1]).copy()
+                for key, column in self._columns.items()}
+        return self._numpy_columns[name]
+
+    @property
+    def ids(self):
+        ''' Return the raw commit ids, 20 bytes per row '''
+        return bytes(self._ids)
+
+    @property
+    def times(self):
+        ''' Return the commit times as unix timestamps '''
+        return self._column('times')
+
+    @property
+    def author_ids(self):
+        ''' Return the rows of the authors in table.authors '''
+        return self._column('author_ids')
+
+    @property
+    def parent_offsets(self):
+        ''' Return the offsets of the parents of each row in parent_rows '''
+        return self._column('parent_offsets')
+
+    @property
+    def parent_rows(self):
+        ''' Return the rows of the parents, see parent_offsets '''
+        return self._column('parent_rows')
+
+    def commit_id(self, row):
+        ''' Return the pygit2.Oid of a row '''
+        start = 20 * row
+        return pygit2.Oid(raw=bytes(self._ids[start:start + 20]))
+
+    def row(self, commitish):
+        ''' Return the row of a commit or None
+
+        commitish:  a pygit2.Commit or pygit2.Oid
+        '''
+        oid = getattr(commitish, 'id', commitish)
+        return self._rows.get(oid.raw)
+
+    def parents(self, row):
+        ''' Return the rows of the parents of a row '''
+        offsets = self._columns['parent_offsets']
+        return list(self._columns['parent_rows'][
+            offsets[row]:offsets[row + 1]])
+
+    def commits(self, rows):
+        ''' Generator of the pygit2.Commit objects for rows '''
+        for row in rows:
+            yield self._pg2_repo[self.commit_id(row)]
+
+    def _author_rows(self, author):
+        ''' Return the ids of the authors with this name or email '''
+        return [author_id for author_id, (name, email)
+                in enumerate(self.authors) if author in (name, email)]
+
+    def select(self, since=None, until=None, author=None):
+        ''' Return the rows of the matching commits, newest first
+
+        since:  only commits at or after this point in time
+        until:  only commits at or before this point in time
+                a datetime or a unix timestamp, see utils.ensure_timestamp
+        author: only commits with this author name or email
+        '''
+        since = None if since is None else ensure_timestamp(since)
+        until = None if until is None else ensure_timestamp(until)
+        author_ids = None if author is None else self._author_rows(author)
+        if numpy is not None:
+            mask = numpy.ones(len(self), dtype=bool)
+            if since is not None:
+                mask &= self.times >= since
+            if until is not None:
+                mask &= self.times <= until
+            if author_ids is not None:
+                mask &= numpy.isin(self.author_ids, author_ids)
+            return numpy.flatnonzero(mask)[::-1].tolist()
+        times = self._columns['times']
+        authors = self._columns['author_ids']
+        author_ids = None if author_ids is None else set(author_ids)
+        rows = []
+        for row in range(len(self) - 1, -1, -1):
+            if since is not None and times[row] < since:
+                continue
+            if until is not None and times[row] > until:
+                continue
+            if author_ids is not None and authors[row] not in author_ids:
+                continue
+            rows.append(row)
+        return rows
+
+    def count_by_author(self, rows=None):
+        ''' Return a collections.Counter of (name, email) tuples
+
+        rows:   only count these rows, e.g. from select()
+        '''
+        if numpy is not None:
+            author_ids = self.author_ids
+            if rows is not None:
+                author_ids = author_ids[numpy.asarray(rows, dtype='int64')]
+            counts = numpy.bincount(author_ids, minlength=len(self.authors))
+            return collections.Counter({
+                self.authors[author_id]: int(count)
+                for author_id, count in enumerate(counts) if count})
+        column = self._columns['author_ids']
+        author_ids = column
+        if rows is not None:
+            author_ids = (column[row] for row in rows)
+        counts = collections.Counter(author_ids)
+        return collections.Counter({
+            self.authors[author_id]: count
+            for author_id, count in counts.items()})
+
+    def count_by_period(self, period=WEEK, rows=None):
+        ''' Return the number of commits per period, oldest period first
+
+        period: length of a period in seconds, the periods start at
+                multiples of it since the epoch, e.g. on thursdays for weeks
+        rows:   only count these rows, e.g. from select()
+
+        Returns an OrderedDict with the start of each period with commits as
+        unix timestamp and the number of commits.
+        '''
+        if numpy is not None:
+            times = self.times
+            if rows is not None:
+                times = times[numpy.asarray(rows, dtype='int64')]
+            starts, counts = numpy.unique(
+                times // period * period, return_counts=True)
+            return collections.OrderedDict(
+                zip(starts.tolist(), counts.tolist()))
+        column = self._columns['times']
+        times = column
+        if rows is not None:
+            times = (column[row] for row in rows)
+        counts = collections.Counter(time // period * period for time in times)
+        return collections.OrderedDict(sorted(counts.items()))
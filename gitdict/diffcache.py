@@ -0,0 +1,155 @@
+''' Compact diffs and a cache for them
+
+A pygit2.Diff is bound to the repository and can not be stored or sent to
+another process. A CompactDiff holds the same information in plain tuples and
+strings:
+
+CompactDiff(files, added, removed)
+    files:      tuple of FileDiff for the changed files
+    added:      total number of added lines
+    removed:    total number of removed lines
+FileDiff(old_path, new_path, status, binary, added, removed, hunks)
+    status:     one letter like `git diff --name-status`, e.g. 'A', 'M', 'D'
+    hunks:      tuple of Hunk, empty for binary files
+Hunk(old_start, old_lines, new_start, new_lines, header, lines)
+    lines:      tuple of (origin, content), origin is ' ', '+' or '-'
+
+Tree and blob ids are immutable, the diff of two ids with the same options
+never changes. The DiffCache keeps the compact diffs by these keys, the least
+recently used diffs are dropped if the cache grows larger than its budget.
+'''
+
+import collections
+import threading
+
+
+CompactDiff = collections.namedtuple(
+    'CompactDiff', ['files', 'added', 'removed'])
+
+FileDiff = collections.namedtuple(
+    'FileDiff', ['old_path', 'new_path', 'status', 'binary', 'added',
+                 'removed', 'hunks'])
+
+Hunk = collections.namedtuple(
+    'Hunk', ['old_start', 'old_lines', 'new_start', 'new_lines', 'header',
+             'lines'])
+
+EMPTY_DIFF = CompactDiff((), 0, 0)
+
+# estimated bytes used by the python objects of a file, hunk and line,
+# besides the strings
+FILE_OVERHEAD = 200
+HUNK_OVERHEAD = 150
+LINE_OVERHEAD = 120
+
+
+def compact_diff(patches):
+    ''' Return a tuple (CompactDiff, estimated size in bytes) for patches
+
+    patches:    iterable of pygit2.Patch, e.g. a pygit2.Diff
+    '''
+    files = []
+    size = 0
+    total_added = total_removed = 0
+    for patch in patches:
+        delta = patch.delta
+        hunks = []
+        if not delta.is_binary:
+            for hunk in patch.hunks:
+                lines = tuple(
+                    (line.origin, line.content) for line in hunk.lines)
+                size += HUNK_OVERHEAD + len(hunk.header) + sum(
+                    LINE_OVERHEAD + len(content) for origin, content in lines)
+                hunks.append(Hunk(hunk.old_start, hunk.old_lines,
+                                  hunk.new_start, hunk.new_lines,
+                                  hunk.header, lines))
+        context, added, removed = patch.line_stats
+        old_path, new_path = delta.old_file.path, delta.new_file.path
+        size += FILE_OVERHEAD + len(old_path) + len(new_path)
+        files.append(FileDiff(old_path, new_path, delta.status_char(),
+                              delta.is_binary, added, removed, tuple(hunks)))
+        total_added += added
+        total_removed += removed
+    return CompactDiff(tuple(files), total_added, total_removed), size
+
+
+def prefixed(diff, prefix):
+    ''' Return a CompactDiff with a prefix added to all paths '''
+    if not prefix:
+        return diff
+    files = tuple(
+        file_diff._replace(old_path=prefix + file_diff.old_path,
+                           new_path=prefix + file_diff.new_path)
+        for file_diff in diff.files)
+    return diff._replace(files=files)
+
+
+class DiffCache(object):
+    ''' LRU cache of CompactDiff tuples with a budget in bytes
+
+    cache = DiffCache(max_bytes=16 * 1024 * 1024, stats=None)
+    cache.get(key)
+        the cached CompactDiff or None, counted as hit or miss
+    cache.put(key, diff, size)
+        store a diff with its estimated size, see compact_diff()
+    len(cache)
+        number of cached diffs
+    cache.bytes
+        estimated size of all cached diffs
+    cache.clear()
+        remove all diffs
+
+    A diff larger than the budget is not stored. The cache is thread safe.
+    '''
+
+    def __init__(self, max_bytes, stats=None):
+        ''' Initialization of the cache
+
+        max_bytes:  maximum estimated size of all cached diffs
+        stats:      optional stats.Stats to count hits, misses and evictions
+        '''
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._stats = stats
+        # key: (diff, size), least recently used first
+        self._diffs = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        ''' Count an event in the stats, if present '''
+        if self._stats is not None:
+            self._stats.count('diff_cache_' + name)
+
+    def get(self, key):
+        ''' Return the cached CompactDiff for a key or None '''
+        with self._lock:
+            item = self._diffs.get(key)
+            if item is not None:
+                self._diffs.move_to_end(key)
+        self._count('misses' if item is None else 'hits')
+        return None if item is None else item[0]
+
+    def put(self, key, diff, size):
+        ''' Store a diff, the least recently used diffs are dropped '''
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._diffs.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._diffs[key] = (diff, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                key, (diff, size) = self._diffs.popitem(last=False)
+                self.bytes -= size
+                self._count('evictions')
+
+    def __len__(self):
+        ''' Return the number of cached diffs '''
+        return len(self._diffs)
+
+    def clear(self):
+        ''' Remove all diffs '''
+        with self._lock:
+            self._diffs.clear()
+            self.bytes = 0
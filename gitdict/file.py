@@ -6,7 +6,15 @@ import io
 
 import pygit2
 
-from .utils import GitDictError, NodeMixin
+from .utils import GitDictError, NodeMixin, NULL_OID
+from .tracing import traced
+from .blame import count_lines
+from .lines import Lines
+from .lfs import parse_pointer
+
+
+# marker for a pointer that was not parsed yet
+_UNKNOWN = object()
 
 
 class File(NodeMixin):
@@ -22,14 +30,28 @@ class File(NodeMixin):
     file.last_commit
         last commit that affected the folder
     file.history
-        list of commits that affected the folder (newest first)
+        commits that affected the file (newest first), see history.History
     
     file.encoding
         encoding for the file, defaults to repo.default_encoding
+    file.lfs_pointer
+        lfs.Pointer with the oid and size if the file is stored in Git LFS,
+        otherwise None
+    file.size
+        size of the file content in bytes
     file.data
-        binary data of the file content
+        binary data of the file content, read from the local Git LFS store
+        for a pointer file
+    file.open()
+        binary file object of the content, Git LFS objects are streamed 
+        from the local store
     file.text
         text content of the file, decoded using file.encoding
+    file.line_count
+        number of lines in the file
+    file.lines
+        lines.Lines of the file, file.lines[start:stop] decodes only the 
+        requested lines
     file.decode(encoding=None)
         decode the binary content of the file
         if encoding is None, file.encoding is used
@@ -38,6 +60,16 @@ class File(NodeMixin):
         pygit2.diff object for the folder compared to the commit
         committish might be a pygit2.Commit or an pygit2.Oid like id
         if reference is also a committish, the diff is between the two commits 
+    file.diffstat(committish, reference=None)
+        dict with the git path and the (added, removed) line counts
+    file.compact_diff(committish, reference=None, context_lines=3,
+                      interhunk_lines=0)
+        diffcache.CompactDiff of the changes, cached by the blob ids
+    file.blame()
+        blame.Blame with the commit and original line number for each line
+    file.versions(limit=None, offset=0, follow=False)
+        iterator of (commit, blob_id, content) tuples for the revisions of 
+        the file, newest first, content() returns the data of a revision
 
     
     file.__name__, file.__parent__: pyramid traversal implementation
@@ -59,17 +91,84 @@ class File(NodeMixin):
         # the encoding ist set to the default encoding set in Repository class
         # that defaults to utf-8
         self.encoding = self._repository.default_encoding
+        self._lfs_pointer = _UNKNOWN
     
     @property
+    def lfs_pointer(self):
+        ''' Return the lfs.Pointer of a Git LFS pointer file or None '''
+        if self._lfs_pointer is _UNKNOWN:
+            self._lfs_pointer = parse_pointer(self._pg2_blob)
+        return self._lfs_pointer
+    
+    @property
+    def size(self):
+        ''' Return the size of the content in bytes, without reading it '''
+        pointer = self.lfs_pointer
+        if pointer is not None:
+            return pointer.size
+        return self._pg2_blob.size
+    
+    @property
+    @traced('data')
     def data(self):
-        ''' Return raw binary file content '''
-        return self._pg2_blob.data
+        ''' Return raw binary file content 
+        
+        For a Git LFS pointer file, the object is read from the local store.
+        Raises GitDictError if it is not available, it is not downloaded.
+        '''
+        pointer = self.lfs_pointer
+        if pointer is None:
+            data = self._pg2_blob.data
+        else:
+            with self._repository._open_lfs_object(pointer) as file_object:
+                data = file_object.read()
+        self._repository._stats.count('bytes_read', len(data))
+        return data
+    
+    @traced('open')
+    def open(self):
+        ''' Return a binary file object of the content
+        
+        A Git LFS object is read from the local store in chunks as needed, 
+        large files are not loaded into memory. Raises GitDictError if the
+        object is not available.
+        '''
+        pointer = self.lfs_pointer
+        if pointer is None:
+            return io.BytesIO(self.data)
+        return self._repository._open_lfs_object(pointer)
     
     @property
     def text(self):
         ''' Return file content as text, uses currently set encoding. '''
         return self.decode()
     
+    @property
+    def line_count(self):
+        ''' Return the number of lines, without decoding the content '''
+        repository = self._repository
+        blob_id = self._pg2_blob.id
+        with repository._cache_lock:
+            cache = repository._line_index_cache
+            starts = cache.get(blob_id)
+            if starts is not None:
+                cache.move_to_end(blob_id)
+        if starts is not None:
+            return len(starts)
+        return count_lines(self.data)
+    
+    @property
+    def lines(self):
+        ''' Return the lines of the file as a lines.Lines sequence.
+        
+        The byte offsets of the lines are computed once for each revision of
+        the file and cached by the repository. Only the lines that are 
+        accessed are decoded, using the current file.encoding.
+        '''
+        data = self.data
+        starts = self._repository._line_starts(self._pg2_blob.id, data)
+        return Lines(data, starts, self.encoding)
+    
     def decode(self, encoding=None):
         ''' Return Data as decoded text, might use a specified encoding 
         
@@ -79,8 +178,9 @@ class File(NodeMixin):
         '''
         if encoding:
             self.encoding = encoding
-        return self._pg2_blob.data.decode(self.encoding)
+        return self.data.decode(self.encoding)
     
+    @traced('diff')
     def diff(self, commitish, reference=None):
         ''' Get a diff for the same file in an other commmit
                 
@@ -105,6 +205,82 @@ class File(NodeMixin):
             msg = 'Diff impossible between %s and %s '
             raise GitDictError(msg % (pg2_diff_blob, pg2_ref_blob))
     
+    @traced('diffstat')
+    def diffstat(self, commitish, reference=None):
+        ''' Return the added and removed lines of the changes to the file.
+        
+        commitish:  value that refers to a commit, the old revision
+                    see utils.ensure_oid()
+        reference:  a commit with the new revision
+                    if reference is None, use the current file
+        
+        Returns an OrderedDict like Folder.diffstat(), with the git path of 
+        the file as key, if it was changed.
+        '''
+        old_blob = self._get_object_from_commit(commitish)
+        if reference is None:
+            new_blob = self._pg2_blob
+        else:
+            new_blob = self._get_object_from_commit(reference)
+        stats = collections.OrderedDict()
+        for pg2_object in (old_blob, new_blob):
+            if pg2_object is not None and not isinstance(
+                    pg2_object, pygit2.Blob):
+                msg = 'Diffstat impossible between %s and %s '
+                raise GitDictError(msg % (old_blob, new_blob))
+        old_id = NULL_OID if old_blob is None else old_blob.id
+        new_id = NULL_OID if new_blob is None else new_blob.id
+        if old_id != new_id:
+            stats[self.git_path] = self._repository._line_stats(
+                old_id, new_id)
+        return stats
+    
+    @traced('compact_diff')
+    def compact_diff(self, commitish, reference=None, context_lines=3,
+                     interhunk_lines=0):
+        ''' Return the changes to the file as a compact, serializable diff.
+        
+        commitish:       value that refers to a commit, the old revision
+                         see utils.ensure_oid()
+        reference:       a commit with the new revision
+                         if reference is None, use the current file
+        context_lines:   number of unchanged lines around a change
+        interhunk_lines: maximum number of unchanged lines between two 
+                         changes in one hunk
+        
+        Returns a diffcache.CompactDiff with the git path of the file, see 
+        Repository.compact_diff()
+        '''
+        old_blob = self._get_object_from_commit(commitish)
+        if reference is None:
+            new_blob = self._pg2_blob
+        else:
+            new_blob = self._get_object_from_commit(reference)
+        for pg2_object in (old_blob, new_blob):
+            if pg2_object is not None and not isinstance(
+                    pg2_object, pygit2.Blob):
+                msg = 'Diff impossible between %s and %s '
+                raise GitDictError(msg % (old_blob, new_blob))
+        return self._repository._compact_diff(
+            old_blob, new_blob, self.git_path, context_lines, interhunk_lines)
+    
+    def blame(self):
+        ''' Return a blame.Blame with the commit that introduced each line '''
+        return self._repository.blame_for(self.git_path)
+    
+    def versions(self, limit=None, offset=0, follow=False):
+        ''' Return an iterator of the revisions of the file, newest first
+        
+        limit:  maximum number of versions to return
+        offset: number of versions to skip
+        follow: continue under the previous name of a renamed file
+        
+        The data of a revision is read when content() of its version is 
+        called, see Repository.versions_for()
+        '''
+        return self._repository.versions_for(
+            self.git_path, limit=limit, offset=offset, follow=follow)
+    
     def __iter__(self):
         ''' Iterating over lines in a text file 
         
@@ -8,8 +8,11 @@ import collections
 import pygit2
 
 # imports of gitdict package
-from .utils import GitDictError, NodeMixin
+from .utils import GitDictError, NodeMixin, ensure_oid
 from .file import File
+from .tracing import traced
+from .archive import archive_chunks
+from .parallel import map_blobs
 
 
 class FolderBase(collections.abc.Mapping):
@@ -41,6 +44,14 @@ class FolderBase(collections.abc.Mapping):
     folder.walk()
         similar to os.walk() returns iterator of tuples 
         (parent_folder, [contained folders], [contained files])
+    folder.archive(format='tar', revision=None, prefix='')
+        generator of byte chunks of a tar, tar.gz or zip archive
+    folder.activity(since=None, lines=False)
+        commits, authors and last change of every file, see 
+        Repository.activity_for()
+    folder.map(func, pattern=None, processes=None, chunk_size=None)
+        iterator of (git path, func(data)) for all files, computed by a 
+        process pool
     '''
 
     def __contains__(self, key):
@@ -48,10 +59,15 @@ class FolderBase(collections.abc.Mapping):
         
         key: name of child object
         '''
+        repository = self._repository
+        missing_key = (self._pg2_tree.id, key)
+        if repository._is_missing(missing_key):
+            return False
         try:
             entry = self._pg2_tree[key]
             return entry.type in self.child_map
         except KeyError:
+            repository._remember_missing(missing_key)
             return False
     
     def get(self, key, default=None):
@@ -70,13 +86,34 @@ class FolderBase(collections.abc.Mapping):
         
         key: name of child object
         raises KeyError, if the child object doesn't exist
+        
+        Missing paths are remembered by the repository, a repeated lookup of
+        a missing path raises the KeyError right away.
         '''
+        repository = self._repository
+        missing_key = (self._pg2_tree.id, key)
+        if repository._is_missing(missing_key):
+            raise KeyError(key)
+        tracer = repository._tracer
+        try:
+            if tracer is None:
+                return self._getitem(key)
+            with tracer.span('getitem', os.path.join(self.git_path, key)):
+                return self._getitem(key)
+        except KeyError:
+            repository._remember_missing(missing_key)
+            raise
+    
+    def _getitem(self, key):
+        ''' Return a child object, the untraced implementation of [] '''
         # also a path might be requested
         # in order to get the right "chain", we need to spit the path up, 
         # get only the current child and pass the rest of the path along
         if os.path.sep in key:
             child_name, rest = key.split(os.path.sep, 1)
-            child = self[child_name]
+            child = self._getitem(child_name)
+            if isinstance(child, FolderBase):
+                return child._getitem(rest)
             return child[rest]
         # a direct child element was requested
         entry = self._pg2_tree[key]
@@ -138,6 +175,13 @@ class FolderBase(collections.abc.Mapping):
         In contrast to os.walk, not the git paths are returned but the actual
         File or Folder objects.
         '''
+        tracer = self._repository._tracer
+        if tracer is None:
+            return self._walk()
+        return tracer.traced_iter('walk', self.git_path, self._walk())
+    
+    def _walk(self):
+        ''' Folder tree generator, the untraced implementation of walk() '''
         folders = []
         files = []
         for item in self.values():
@@ -147,7 +191,81 @@ class FolderBase(collections.abc.Mapping):
                 files.append(item)
         yield (self, folders, files)
         for folder in folders:
-            yield from folder.walk()
+            yield from folder._walk()
+    
+    @traced('activity')
+    def activity(self, since=None, lines=False):
+        ''' Return the activity of every file in the folder, most active first
+        
+        The history is walked only once, see Repository.activity_for()
+        
+        since:  stop the walk at commits older than this point in time
+                a datetime or a unix timestamp, see utils.ensure_timestamp
+        lines:  also sum up the added and removed lines
+        '''
+        return self._repository.activity_for(self.git_path, since, lines)
+    
+    def map(self, func, pattern=None, processes=None, chunk_size=None):
+        ''' Return an iterator of (git path, func(data)) for all files
+        
+        The function is called in a pool of worker processes. Only the blob
+        ids are sent to the workers, each worker opens the repository and
+        reads the files itself. A file content that appears at several paths
+        is processed only once. The results are returned as soon as they are
+        available, in no particular order, see parallel.py
+        
+        func:       function called with the binary content of a file, it 
+                    must be picklable, e.g. defined at module level
+        pattern:    only files with a git path matching this fnmatch pattern,
+                    e.g. '*.py'; '*' also matches '/'
+        processes:  number of worker processes, defaults to os.cpu_count()
+        chunk_size: number of files sent to a worker at once, by default the
+                    files are split in four chunks per process
+        '''
+        prefix = self.git_path + '/' if self.git_path else ''
+        results = map_blobs(self._repository._pg2_repo, self._pg2_tree, func,
+                            pattern, processes, chunk_size, prefix)
+        tracer = self._repository._tracer
+        if tracer is None:
+            return results
+        return tracer.traced_iter('map', self.git_path, results)
+    
+    def archive(self, format='tar', revision=None, prefix=''):
+        ''' Return a generator for the byte chunks of an archive.
+        
+        The archive is streamed in tree order, only one file is read into 
+        memory at a time. Permissions and symbolic links are taken from the 
+        file modes of the tree entries, the modification time of all entries
+        is the commit time, like `git archive` does it. Compressed output of
+        files that appear more than once is reused, see archive.py
+        
+        format:     'tar', 'tar.gz' or 'zip'
+        revision:   archive the folder as it was in this commit
+                    a commitish, see utils.ensure_oid()
+                    if revision is None, the opened revision is used
+        prefix:     path prefix for all entries, e.g. 'project/'
+        
+        Raises a GitDictError for an unknown format or if the folder does 
+        not exist in the revision.
+        '''
+        repository = self._repository
+        pg2_repo = repository._pg2_repo
+        if revision is None:
+            commit, pg2_tree = repository.last_commit, self._pg2_tree
+        else:
+            commit = pg2_repo[ensure_oid(revision)]
+            if not isinstance(commit, pygit2.Commit):
+                raise GitDictError('Not a commit: ' + repr(commit))
+            pg2_tree = commit.tree
+            if self.git_path or repository.root:
+                entry = repository._tree_entry(commit.tree_id, self.git_path)
+                if entry is None or entry.type != 'tree':
+                    msg = 'No folder %s in commit %s'
+                    raise GitDictError(msg % (self.git_path, commit.id))
+                pg2_tree = pg2_repo[entry.id]
+        return archive_chunks(pg2_repo, pg2_tree, format, commit.commit_time,
+                              prefix, repository._stats,
+                              repository.archive_cache_size)
 
 
 class Folder(FolderBase, NodeMixin):
@@ -181,6 +299,10 @@ class Folder(FolderBase, NodeMixin):
     folder.walk()
         similar to os.walk() returns iterator of tuples 
         (parent_folder, [contained folders], [contained files])
+    folder.activity(since=None, lines=False)
+        commits, authors and last change of every file in one history walk
+    folder.map(func, pattern=None, processes=None, chunk_size=None)
+        (git path, func(data)) for all files, computed by a process pool
     
     From utils.NodeMixin:
     folder.git_path
@@ -188,12 +310,17 @@ class Folder(FolderBase, NodeMixin):
     folder.last_commit
         last commit that affected the folder
     folder.history
-        list of commits that affected the folder (newest first)
+        commits that affected the folder (newest first), see history.History
     
     folder.diff(committish, reference=None)
         pygit2.diff object for the folder compared to the commit
         committish might be a pygit2.Commit or an pygit2.Oid like id
         if reference is also a committish, the diff is between the two commits 
+    folder.diffstat(committish, reference=None)
+        dict of git paths and (added, removed) line counts of the changes
+    folder.compact_diff(committish, reference=None, context_lines=3,
+                        interhunk_lines=0)
+        diffcache.CompactDiff of the changes, cached by the tree ids
     
     folder.__name__, folder.__parent__: pyramid traversal implementation
     '''
@@ -217,6 +344,7 @@ class Folder(FolderBase, NodeMixin):
         pg2_object = self._repository._pg2_repo[tree_entry.id]
         return child_class(tree_entry.name, self, self._repository, pg2_object)
     
+    @traced('diff')
     def diff(self, commitish, reference=None):
         ''' Get a pygit2.diff for the same folder in an other commmit.
         
@@ -241,6 +369,64 @@ class Folder(FolderBase, NodeMixin):
             msg = 'Diff impossible between %s and %s '
             raise GitDictError(msg % (pg2_diff_tree, pg2_ref_tree))
     
+    @traced('diffstat')
+    def diffstat(self, commitish, reference=None):
+        ''' Return the added and removed lines of the changes per file.
+        
+        commitish:  value that refers to a commit, the old revision
+                    see utils.ensure_oid()
+        reference:  a commit with the new revision
+                    if reference is None, use the current folder
+        
+        Returns an OrderedDict with the git paths of the changed files as 
+        keys and tuples (added lines, removed lines) as values, see 
+        Repository.diffstat(). If the folder does not exist in one of the
+        revisions, all its files count as added or removed.
+        '''
+        old_tree = self._get_object_from_commit(commitish)
+        if reference is None:
+            new_tree = self._pg2_tree
+        else:
+            new_tree = self._get_object_from_commit(reference)
+        for pg2_object in (old_tree, new_tree):
+            if pg2_object is not None and not isinstance(
+                    pg2_object, pygit2.Tree):
+                msg = 'Diffstat impossible between %s and %s '
+                raise GitDictError(msg % (old_tree, new_tree))
+        return self._repository._tree_diffstat(
+            old_tree, new_tree, self.git_path + '/')
+    
+    @traced('compact_diff')
+    def compact_diff(self, commitish, reference=None, context_lines=3,
+                     interhunk_lines=0):
+        ''' Return the changes as a compact, serializable diff.
+        
+        commitish:       value that refers to a commit, the old revision
+                         see utils.ensure_oid()
+        reference:       a commit with the new revision
+                         if reference is None, use the current folder
+        context_lines:   number of unchanged lines around a change
+        interhunk_lines: maximum number of unchanged lines between two 
+                         changes in one hunk
+        
+        Returns a diffcache.CompactDiff with git paths, see 
+        Repository.compact_diff(). If the folder does not exist in one of 
+        the revisions, all its files count as added or removed.
+        '''
+        old_tree = self._get_object_from_commit(commitish)
+        if reference is None:
+            new_tree = self._pg2_tree
+        else:
+            new_tree = self._get_object_from_commit(reference)
+        for pg2_object in (old_tree, new_tree):
+            if pg2_object is not None and not isinstance(
+                    pg2_object, pygit2.Tree):
+                msg = 'Diff impossible between %s and %s '
+                raise GitDictError(msg % (old_tree, new_tree))
+        return self._repository._compact_diff(
+            old_tree, new_tree, self.git_path + '/', context_lines, 
+            interhunk_lines)
+    
 
 # some things have to be added afterwards
 FolderBase.child_map = {'tree': Folder, 'blob': File }
\ No newline at end of file
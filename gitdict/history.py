@@ -0,0 +1,76 @@
+''' gitdict.History '''
+
+
+class History(object):
+    ''' Lazy, pageable list of commits that affected a git object
+
+    A History should not be initialized directly, but retrieved from a node:
+        history = repo['some_file.txt'].history
+
+    It behaves like the list of commits that was returned before:
+    for commit in history
+        iterate over all commits, newest first
+    len(history)
+        number of commits in the history
+    history[index]
+        commit at the index, a slice returns a list of commits
+
+    Calling the history returns only a page of it. The commits are walked
+    newest first and the walk stops as soon as the page is complete:
+    history(limit=None, offset=0, since=None, until=None, author=None,
+            after=None, follow=False, mode=None)
+        limit:  maximum number of commits to return
+        offset: number of matching commits to skip
+        since:  stop the walk at commits older than this point in time
+        until:  skip commits newer than this point in time
+        author: only commits with this author name or email
+        after:  pagination cursor, the last commit of the previous page
+        follow: continue the history of a file under its previous name
+        mode:   how merges are handled: None, 'first-parent' or 'full'
+    '''
+
+    def __init__(self, repository, git_path=None):
+        ''' Initialization of the history
+
+        repository: the repository
+        git_path:   path of the git object, None for the whole repository
+        '''
+        self._repository = repository
+        self._git_path = git_path
+
+    def __call__(self, limit=None, offset=0, since=None, until=None,
+                 author=None, after=None, follow=False, mode=None):
+        ''' Return a page of the history as a list, newest commit first '''
+        commits = self._repository.commit_history_for(
+            self._git_path, limit=limit, offset=offset, since=since,
+            until=until, author=author, after=after, follow=follow, 
+            mode=mode)
+        return list(commits)
+
+    def __iter__(self):
+        ''' Iterate over all commits in the history, newest first '''
+        return self._repository.commit_history_for(self._git_path)
+
+    def __len__(self):
+        ''' Return the number of commits in the history '''
+        return sum(1 for commit in self)
+
+    def __getitem__(self, index):
+        ''' Return a commit by its position, newest first
+
+        Only positive indexes and slices without a step are pushed down to
+        the commit walk, everything else needs the whole history.
+        '''
+        if isinstance(index, slice):
+            start, stop, step = index.start, index.stop, index.step
+            if step is None and (start or 0) >= 0 and (stop or 0) >= 0:
+                start = start or 0
+                limit = None if stop is None else max(stop - start, 0)
+                return self(limit=limit, offset=start)
+            return list(self)[index]
+        if index < 0:
+            return list(self)[index]
+        page = self(limit=1, offset=index)
+        if not page:
+            raise IndexError('history index out of range')
+        return page[0]
@@ -0,0 +1,84 @@
+''' Git LFS pointer files and the local object store '''
+
+import collections
+import os
+import re
+
+from .utils import GitDictError
+
+
+# the content of a large file stored by Git LFS
+Pointer = collections.namedtuple('Pointer', ['oid', 'size'])
+
+# a pointer file starts with the spec version and is always small
+POINTER_PREFIX = b'version https://git-lfs.github.com/spec/v1\n'
+MAX_POINTER_SIZE = 1024
+
+OID_PATTERN = re.compile(r'^sha256:([0-9a-f]{64})$')
+
+
+def parse_pointer(pg2_blob):
+    ''' Return a Pointer if the blob is a Git LFS pointer file, else None
+
+    pg2_blob:   a pygit2.Blob
+
+    The size of the blob is checked first, so the data of large blobs is
+    never read.
+    '''
+    if pg2_blob.size > MAX_POINTER_SIZE:
+        return None
+    data = pg2_blob.data
+    if not data.startswith(POINTER_PREFIX):
+        return None
+    values = {}
+    for line in data[len(POINTER_PREFIX):].decode('ascii', 'replace').split(
+            '\n'):
+        key, _, value = line.partition(' ')
+        values[key] = value
+    match = OID_PATTERN.match(values.get('oid', ''))
+    size = values.get('size', '')
+    if match is None or not size.isdigit():
+        return None
+    return Pointer(match.group(1), int(size))
+
+
+def objects_dir(pg2_repo):
+    ''' Return the folder of the local Git LFS object store
+
+    This is the lfs/objects folder in the git directory, or in the folder
+    configured as 'lfs.storage'.
+    '''
+    try:
+        storage = pg2_repo.config['lfs.storage']
+    except KeyError:
+        storage = 'lfs'
+    return os.path.join(pg2_repo.path, storage, 'objects')
+
+
+def object_path(objects_folder, pointer):
+    ''' Return the path of an object in the local store '''
+    oid = pointer.oid
+    return os.path.join(objects_folder, oid[0:2], oid[2:4], oid)
+
+
+def open_object(objects_folder, pointer):
+    ''' Return the object of a pointer as a binary file object
+
+    objects_folder: folder of the local object store, see objects_dir()
+    pointer:        the Pointer to the object
+
+    Only the local store is used, nothing is downloaded. Raises GitDictError
+    if the object is missing or its size does not match the pointer.
+    '''
+    path = object_path(objects_folder, pointer)
+    try:
+        file_object = open(path, 'rb')
+    except OSError:
+        msg = ('Git LFS object %s is not available locally, '
+               'use `git lfs fetch` to download it')
+        raise GitDictError(msg % pointer.oid)
+    if os.fstat(file_object.fileno()).st_size != pointer.size:
+        file_object.close()
+        msg = 'Git LFS object %s is incomplete, expected %d bytes'
+        raise GitDictError(msg % (pointer.oid, pointer.size))
+    return file_object
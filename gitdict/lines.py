@@ -0,0 +1,93 @@
+''' gitdict.Lines '''
+
+import array
+import collections.abc
+import itertools
+import operator
+
+
+def line_starts(data):
+    ''' Return an array with the byte offset of each line in binary data
+
+    The number of lines is the same as blame.count_lines(): a last line
+    without a newline counts as a line. The scan runs in C: the data is split
+    at the newlines and the line lengths are summed up by itertools.
+    '''
+    typecode = 'I' if len(data) < 2 ** 32 else 'Q'
+    starts = array.array(typecode)
+    if not data:
+        return starts
+    # the lines up to each newline, the rest after the last newline
+    parts = data.split(b'\n')
+    del parts[-1]
+    lengths = map(operator.add, map(len, parts), itertools.repeat(1))
+    starts.append(0)
+    starts.extend(itertools.accumulate(lengths))
+    del parts
+    if starts[-1] == len(data):
+        # the data ends with a newline, there is no line after it
+        starts.pop()
+    return starts
+
+
+class Lines(collections.abc.Sequence):
+    ''' Lines of a text file, only the accessed lines are decoded
+
+    Lines should not be initialized directly, but retrieved from a file:
+        lines = repo['some_file.txt'].lines
+
+    len(lines)
+        number of lines
+    lines[index]
+        line at the index, including the line ending
+    lines[start:stop]
+        list of lines, only this region of the file is decoded
+
+    The lines are split at b'\\n', this works for utf-8 and other encodings
+    that are compatible with ascii.
+    '''
+
+    def __init__(self, data, starts, encoding):
+        ''' Initialization of the lines
+
+        data:       binary content of the file
+        starts:     array of byte offsets of the lines, see line_starts()
+        encoding:   encoding to decode the lines
+        '''
+        self._data = data
+        self._starts = starts
+        self.encoding = encoding
+
+    def __len__(self):
+        ''' Return the number of lines '''
+        return len(self._starts)
+
+    def _end(self, index):
+        ''' Return the byte offset after a line '''
+        if index + 1 < len(self._starts):
+            return self._starts[index + 1]
+        return len(self._data)
+
+    def __getitem__(self, index):
+        ''' Return a line or a list of lines for a slice '''
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            first = self._starts[start]
+            region = self._data[first:self._end(stop - 1)]
+            lines = region.decode(self.encoding).split('\n')
+            last = lines.pop()
+            lines = [line + '\n' for line in lines]
+            if last:
+                # the last line of the file without a newline
+                lines.append(last)
+            return lines
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line index out of range')
+        line = self._data[self._starts[index]:self._end(index)]
+        return line.decode(self.encoding)
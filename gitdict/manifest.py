@@ -0,0 +1,288 @@
+''' gitdict.Manifest '''
+
+import collections
+import mmap
+import os
+import struct
+import tempfile
+
+import pygit2
+
+from .utils import GitDictError
+
+
+# a file in the manifest
+ManifestEntry = collections.namedtuple(
+    'ManifestEntry', ['path', 'id', 'filemode', 'size'])
+
+# file layout constants
+SIGNATURE = b'GDMF'
+VERSION = 1
+HASH_LENGTH = 20
+HEADER = struct.Struct('>4sBxxxQ20s')
+
+# how the paths are stored, like in tar archives, see archive.py
+ENCODING = 'utf-8'
+ERRORS = 'surrogateescape'
+
+
+class Manifest(object):
+    ''' Reader for a manifest file, a sorted listing of all files in a tree
+
+    A manifest should not be initialized directly, but retrieved from a
+    repository:
+        manifest = repo.open_manifest('path/to/manifest')
+
+    The file stores the paths, ids, file modes and sizes of all files in a
+    tree in columns, sorted by path. It is memory mapped and read in place,
+    a lookup is a binary search that touches only a few pages of the file.
+
+    manifest.tree_id
+        id of the tree that is listed
+    len(manifest)
+        number of files
+    for path in manifest
+        iterator of the paths, sorted
+    path in manifest
+        check if a file exists
+    manifest[path]
+        ManifestEntry(path, id, filemode, size) or raise KeyError
+    manifest.get(path, default=None)
+        ManifestEntry or default value
+    manifest.entries()
+        iterator of all ManifestEntry tuples, sorted by path
+    manifest.prefix(prefix)
+        iterator of the ManifestEntry tuples with paths starting with the
+        prefix, e.g. 'docs/' for all files in a folder
+    manifest.close()
+        release the memory map
+
+    Submodules are listed with the commit id and a size of 0.
+    '''
+
+    def __init__(self, path):
+        ''' Open and memory map a manifest file
+
+        path:   path to the manifest file
+
+        Raises a GitDictError, if the file could not be read or has an
+        unsupported format
+        '''
+        try:
+            with open(path, 'rb') as file_handle:
+                self._mmap = mmap.mmap(
+                    file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            raise GitDictError('could not open manifest at ' + path)
+        self.path = path
+        try:
+            self._read_header()
+        except (GitDictError, struct.error):
+            self.close()
+            raise GitDictError('unsupported manifest at ' + path)
+
+    def _read_header(self):
+        ''' Read the header and compute the offsets of the columns '''
+        signature, version, count, tree = HEADER.unpack_from(self._mmap, 0)
+        if signature != SIGNATURE or version != VERSION:
+            raise GitDictError('unsupported manifest format')
+        self._count = count
+        self.tree_id = pygit2.Oid(raw=tree)
+        self._offsets = HEADER.size
+        self._ids = self._offsets + 8 * (count + 1)
+        self._modes = self._ids + HASH_LENGTH * count
+        self._sizes = self._modes + 4 * count
+        self._paths = self._sizes + 8 * count
+        end = self._paths + self._path_offset(count)
+        if end != len(self._mmap):
+            raise GitDictError('truncated manifest')
+
+    def _path_offset(self, position):
+        ''' Return the offset of a path in the path column '''
+        offset = self._offsets + 8 * position
+        return struct.unpack_from('>Q', self._mmap, offset)[0]
+
+    def _raw_path(self, position):
+        ''' Return the encoded path at a position '''
+        start, end = struct.unpack_from(
+            '>QQ', self._mmap, self._offsets + 8 * position)
+        return self._mmap[self._paths + start:self._paths + end]
+
+    def _entry(self, position, raw_path=None):
+        ''' Return the ManifestEntry at a position '''
+        if raw_path is None:
+            raw_path = self._raw_path(position)
+        start = self._ids + HASH_LENGTH * position
+        oid = pygit2.Oid(raw=self._mmap[start:start + HASH_LENGTH])
+        mode = struct.unpack_from('>I', self._mmap, self._modes + 4 * position)
+        size = struct.unpack_from('>Q', self._mmap, self._sizes + 8 * position)
+        return ManifestEntry(
+            raw_path.decode(ENCODING, ERRORS), oid, mode[0], size[0])
+
+    def _bisect(self, raw_path):
+        ''' Return the first position with a path not lower than raw_path '''
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._raw_path(middle) < raw_path:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __len__(self):
+        ''' Return the number of files '''
+        return self._count
+
+    def __iter__(self):
+        ''' Iterator of the paths, sorted '''
+        for position in range(self._count):
+            yield self._raw_path(position).decode(ENCODING, ERRORS)
+
+    def __contains__(self, path):
+        ''' Check if a file exists '''
+        return self.get(path) is not None
+
+    def __getitem__(self, path):
+        ''' Return the ManifestEntry for a path or raise KeyError '''
+        entry = self.get(path)
+        if entry is None:
+            raise KeyError(path)
+        return entry
+
+    def get(self, path, default=None):
+        ''' Return the ManifestEntry for a path or the default value '''
+        raw_path = path.strip('/').encode(ENCODING, ERRORS)
+        position = self._bisect(raw_path)
+        if position < self._count and self._raw_path(position) == raw_path:
+            return self._entry(position, raw_path)
+        return default
+
+    def entries(self):
+        ''' Iterator of all ManifestEntry tuples, sorted by path '''
+        for position in range(self._count):
+            yield self._entry(position)
+
+    def prefix(self, prefix):
+        ''' Iterator of the ManifestEntry tuples with paths starting with the
+        prefix, sorted by path
+        '''
+        raw_prefix = prefix.encode(ENCODING, ERRORS)
+        for position in range(self._bisect(raw_prefix), self._count):
+            raw_path = self._raw_path(position)
+            if not raw_path.startswith(raw_prefix):
+                return
+            yield self._entry(position, raw_path)
+
+    def _raw_entries(self):
+        ''' Iterator of tuples (encoded path, raw id, filemode, size) '''
+        for position in range(self._count):
+            start = self._ids + HASH_LENGTH * position
+            mode = struct.unpack_from(
+                '>I', self._mmap, self._modes + 4 * position)
+            size = struct.unpack_from(
+                '>Q', self._mmap, self._sizes + 8 * position)
+            yield (self._raw_path(position),
+                   self._mmap[start:start + HASH_LENGTH], mode[0], size[0])
+
+    def close(self):
+        ''' Release the memory map of the file '''
+        self._mmap.close()
+
+
+def _tree_entries(pg2_repo, tree, sizes):
+    ''' Return the sorted raw entries of all files in a tree
+
+    sizes:  dict of blob sizes by id, shared by the entries
+    '''
+    entries = []
+    stack = [(tree, '')]
+    while stack:
+        tree, prefix = stack.pop()
+        for entry in tree:
+            path = prefix + entry.name
+            if entry.type == 'tree':
+                stack.append((pg2_repo[entry.id], path + '/'))
+            else:
+                size = _size(pg2_repo, entry.id, entry.filemode, sizes)
+                raw_path = path.encode(ENCODING, ERRORS)
+                entries.append((raw_path, entry.id.raw, entry.filemode, size))
+    entries.sort()
+    return entries
+
+
+def _size(pg2_repo, oid, filemode, sizes):
+    ''' Return the size of a blob, 0 for a submodule '''
+    if filemode == pygit2.GIT_FILEMODE_COMMIT:
+        return 0
+    size = sizes.get(oid)
+    if size is None:
+        size = sizes[oid] = pg2_repo[oid].size
+    return size
+
+
+def _patched_entries(pg2_repo, base, tree, sizes):
+    ''' Return the sorted raw entries of a tree, patched from a manifest
+
+    Only the files changed between the tree of the manifest and the new
+    tree are looked up, the other entries are copied from the manifest.
+    '''
+    diff = pg2_repo[base.tree_id].diff_to_tree(tree)
+    changes = {}
+    for delta in diff.deltas:
+        if delta.status != pygit2.GIT_DELTA_ADDED:
+            raw_path = delta.old_file.path.encode(ENCODING, ERRORS)
+            changes[raw_path] = None
+        if delta.status != pygit2.GIT_DELTA_DELETED:
+            new_file = delta.new_file
+            size = _size(pg2_repo, new_file.id, new_file.mode, sizes)
+            raw_path = new_file.path.encode(ENCODING, ERRORS)
+            changes[raw_path] = (
+                raw_path, new_file.id.raw, new_file.mode, size)
+    entries = [entry for entry in base._raw_entries()
+               if entry[0] not in changes]
+    entries.extend(entry for entry in changes.values() if entry is not None)
+    entries.sort()
+    return entries
+
+
+def write_manifest(pg2_repo, tree, path, base=None):
+    ''' Write a manifest file for all files in a tree
+
+    pg2_repo:   the pygit2.Repository
+    tree:       the pygit2.Tree to list
+    path:       path of the manifest file, an existing file is replaced
+    base:       optional Manifest of an older tree, only the changes are
+                looked up and the other entries are copied
+
+    The file is written to a temporary file first and then moved into
+    place, readers of the old file are not disturbed.
+    '''
+    sizes = {}
+    if base is not None and base.tree_id in pg2_repo:
+        entries = _patched_entries(pg2_repo, base, tree, sizes)
+    else:
+        entries = _tree_entries(pg2_repo, tree, sizes)
+    count = len(entries)
+    offsets = [0]
+    for entry in entries:
+        offsets.append(offsets[-1] + len(entry[0]))
+    content = [
+        HEADER.pack(SIGNATURE, VERSION, count, tree.id.raw),
+        struct.pack('>%dQ' % (count + 1), *offsets),
+        b''.join(entry[1] for entry in entries),
+        struct.pack('>%dI' % count, *(entry[2] for entry in entries)),
+        struct.pack('>%dQ' % count, *(entry[3] for entry in entries)),
+        b''.join(entry[0] for entry in entries),
+        ]
+    directory = os.path.dirname(os.path.abspath(path))
+    file_handle, temp_path = tempfile.mkstemp(
+        prefix='.manifest-', dir=directory)
+    try:
+        with os.fdopen(file_handle, 'wb') as temp_file:
+            temp_file.writelines(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
@@ -0,0 +1,105 @@
+''' Parallel map over the files of a git tree
+
+A function is applied to the content of every file in a tree by a pool of
+processes:
+
+map_blobs(pg2_repo, tree, func, pattern=None, processes=None,
+          chunk_size=None, prefix='')
+
+Only the blob ids are sent to the worker processes. Each worker opens the
+repository on its own and reads the blobs locally, the file contents are never
+pickled. Blobs that appear at several paths are processed only once. The
+results are yielded in completion order, not in tree order.
+'''
+
+import collections
+import concurrent.futures
+import fnmatch
+import os
+
+import pygit2
+
+from .lfs import objects_dir, open_object, parse_pointer
+
+
+# number of chunks per process, if the chunk size is not set
+CHUNKS_PER_PROCESS = 4
+
+# the repository opened by a worker process, see _init_worker()
+_worker = {}
+
+
+def map_blobs(pg2_repo, tree, func, pattern=None, processes=None,
+              chunk_size=None, prefix=''):
+    ''' Generator for (git path, func(data)) of all files in a tree
+
+    pg2_repo:   pygit2.Repository containing the tree
+    tree:       pygit2.Tree with the files
+    func:       function called with the binary content of a file, it must
+                be picklable, e.g. defined at module level
+    pattern:    only files with a git path matching this fnmatch pattern
+    processes:  number of worker processes, defaults to os.cpu_count()
+    chunk_size: number of blobs sent to a worker at once
+    prefix:     git path of the tree, e.g. 'docs/'
+
+    Git LFS pointer files are read from the local object store, like
+    File.data. An exception raised by func is raised again here, the
+    remaining work is cancelled.
+    '''
+    paths = collections.OrderedDict()
+    for git_path, blob_id in _blobs(pg2_repo, tree, prefix):
+        if pattern is None or fnmatch.fnmatchcase(git_path, pattern):
+            paths.setdefault(blob_id.raw, []).append(git_path)
+    if not paths:
+        return
+    processes = processes or os.cpu_count() or 1
+    blob_ids = list(paths)
+    if chunk_size is None:
+        chunks = processes * CHUNKS_PER_PROCESS
+        chunk_size = max(1, -(-len(blob_ids) // chunks))
+    initargs = (pg2_repo.path, objects_dir(pg2_repo))
+    with concurrent.futures.ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=initargs) as pool:
+        futures = [
+            pool.submit(_map_chunk, func, blob_ids[start:start + chunk_size])
+            for start in range(0, len(blob_ids), chunk_size)]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                for raw_id, result in future.result():
+                    for git_path in paths[raw_id]:
+                        yield git_path, result
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _blobs(pg2_repo, tree, prefix):
+    ''' Generator for (git path, blob id) of all files in a tree '''
+    for entry in tree:
+        if entry.type == 'tree':
+            yield from _blobs(
+                pg2_repo, pg2_repo[entry.id], prefix + entry.name + '/')
+        elif entry.type == 'blob':
+            yield prefix + entry.name, entry.id
+
+
+def _init_worker(repository_path, lfs_objects):
+    ''' Open the repository in a worker process '''
+    _worker['repository'] = pygit2.Repository(repository_path)
+    _worker['lfs_objects'] = lfs_objects
+
+
+def _map_chunk(func, raw_ids):
+    ''' Return a list of (raw blob id, func(data)) for a chunk of blobs '''
+    pg2_repo = _worker['repository']
+    results = []
+    for raw_id in raw_ids:
+        blob = pg2_repo[pygit2.Oid(raw=raw_id)]
+        pointer = parse_pointer(blob)
+        if pointer is None:
+            data = blob.data
+        else:
+            with open_object(_worker['lfs_objects'], pointer) as file_object:
+                data = file_object.read()
+        results.append((raw_id, func(data)))
+    return results
@@ -0,0 +1,187 @@
+''' gitdict.RepositoryRegistry '''
+
+import collections
+import os
+import threading
+
+from .repository import Repository
+
+
+class RepositoryRegistry(object):
+    ''' Many repositories, opened on first access and closed when idle
+
+    Adding a repository only records its configuration, no file is opened.
+    The repository is opened on first access and kept open for the next
+    accesses. If too many repositories are open, the least recently used
+    ones are dropped:
+
+    registry = RepositoryRegistry(max_open=64, max_files=512)
+    registry.add('docs', 'path/to/repo.git', branch='master', root='docs')
+    registry['docs']
+        the opened Repository, raises KeyError for an unknown name
+    'docs' in registry
+        check if a name was added
+    len(registry)
+        number of added repositories
+    for name in registry
+        iterator of the added names
+    registry.remove('docs')
+        forget a repository, it is dropped if no other name uses it
+    registry.open_count
+        number of open repositories
+    registry.stats()
+        dict with the numbers of added and open repositories, the estimated
+        open files, and the counts of opens, hits and evictions
+    registry.close()
+        drop all open repositories
+
+    Names with the same path, branch and root share one Repository object.
+    The open files of a repository are estimated as one for the repository
+    and one for each pack file, libgit2 keeps the pack files open.
+
+    A dropped repository is closed, see Repository.close(). Code that still
+    holds the Repository object, e.g. a history walk in another thread, can
+    go on using it, the files are opened again on the next access and
+    released when this code drops the object. The budget of open files is
+    a limit for the repositories in the registry, such repositories may
+    exceed it for a while. The registry is thread safe, the repositories
+    are opened outside of its lock.
+    '''
+
+    def __init__(self, max_open=64, max_files=None, **options):
+        ''' Initialization of the registry
+
+        max_open:   maximum number of open repositories
+        max_files:  maximum number of estimated open files, None for no limit
+        options:    keyword arguments for all repositories, e.g. shared_cache
+        '''
+        self.max_open = max_open
+        self.max_files = max_files
+        self.options = options
+        # name: key (path, branch, root)
+        self._configured = {}
+        # key: (repository, estimated open files), least recently used first
+        self._open = collections.OrderedDict()
+        self._files = 0
+        self._counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name, path, branch=None, root=None):
+        ''' Add a repository, it is not opened yet
+
+        name:   name to access the repository
+        path:   path to the git repository
+        branch: local git branch to work on, the git head if None
+        root:   path of a folder to use as the root, see Repository
+        '''
+        key = (os.path.abspath(path), branch, root.strip('/') if root else '')
+        with self._lock:
+            self._configured[name] = key
+
+    def remove(self, name):
+        ''' Forget a repository, it is closed if no other name uses it '''
+        with self._lock:
+            key = self._configured.pop(name)
+            if key not in self._configured.values():
+                item = self._open.pop(key, None)
+                if item is not None:
+                    self._drop(*item)
+
+    def __getitem__(self, name):
+        ''' Return the repository for a name, opened if needed '''
+        with self._lock:
+            key = self._configured[name]
+            repository = self._hit(key)
+            if repository is not None:
+                return repository
+        # a slow open does not block the other threads
+        path, branch, root = key
+        repository = Repository(
+            path, branch=branch, root=root or None, **self.options)
+        files = 1 + self._count_packs(repository)
+        with self._lock:
+            self._counters['opens'] += 1
+            existing = self._hit(key)
+            if existing is not None:
+                # opened by another thread meanwhile
+                repository.close()
+                return existing
+            self._open[key] = (repository, files)
+            self._files += files
+            self._evict()
+            return repository
+
+    def _hit(self, key):
+        ''' Return an open repository and count the hit, or None '''
+        item = self._open.get(key)
+        if item is None:
+            return None
+        self._counters['hits'] += 1
+        self._open.move_to_end(key)
+        return item[0]
+
+    def _count_packs(self, repository):
+        ''' Return the number of pack files of a repository '''
+        pack_dir = os.path.join(repository.path, 'objects', 'pack')
+        try:
+            names = os.listdir(pack_dir)
+        except OSError:
+            return 0
+        return sum(1 for name in names if name.endswith('.pack'))
+
+    def _evict(self):
+        ''' Drop the least recently used repositories above the limits '''
+        while len(self._open) > 1:
+            too_many = len(self._open) > self.max_open
+            too_large = (self.max_files is not None and
+                         self._files > self.max_files)
+            if not (too_many or too_large):
+                return
+            key, item = self._open.popitem(last=False)
+            self._counters['evictions'] += 1
+            self._drop(*item)
+
+    def _drop(self, repository, files):
+        ''' Forget and close an open repository
+
+        Other threads may still use the repository, it is opened again on
+        their next access.
+        '''
+        self._files -= files
+        repository.close()
+
+    def __contains__(self, name):
+        ''' Check if a name was added '''
+        return name in self._configured
+
+    def __len__(self):
+        ''' Return the number of added repositories '''
+        return len(self._configured)
+
+    def __iter__(self):
+        ''' Iterator of the added names '''
+        return iter(list(self._configured))
+
+    @property
+    def open_count(self):
+        ''' Return the number of open repositories '''
+        return len(self._open)
+
+    def stats(self):
+        ''' Return a dict with the numbers of repositories and accesses '''
+        with self._lock:
+            stats = {
+                'configured': len(self._configured),
+                'open': len(self._open),
+                'open_files': self._files,
+                }
+            for name in ('opens', 'hits', 'evictions'):
+                stats[name] = self._counters[name]
+            return stats
+
+    def close(self):
+        ''' Drop all open repositories '''
+        with self._lock:
+            while self._open:
+                key, item = self._open.popitem(last=False)
+                self._drop(*item)
@@ -0,0 +1,147 @@
+''' gitdict.renames '''
+
+import collections
+import os
+import threading
+
+import pygit2
+
+
+def similarity(old_data, new_data):
+    ''' Return the similarity of two binary contents in percent.
+
+    Like git, the similarity is the amount of data that is shared between
+    both contents relative to the larger one. The contents are compared
+    line by line, the order of the lines is not taken into account.
+    '''
+    if old_data == new_data:
+        return 100
+    size = max(len(old_data), len(new_data))
+    if not size:
+        return 100
+    old_lines = collections.Counter(old_data.splitlines(True))
+    new_lines = collections.Counter(new_data.splitlines(True))
+    shared = old_lines & new_lines
+    shared_size = sum(len(line) * count for line, count in shared.items())
+    return shared_size * 100 // size
+
+
+class SimilarityCache(object):
+    ''' Persistent cache for similarity scores of blob pairs
+
+    Blob ids are immutable, so a score computed once for a pair of blobs is
+    valid forever. The scores are appended to a file as fixed size records;
+    appends are atomic, so several processes can share the same file.
+
+    cache = SimilarityCache('path/to/cache/similarity')
+    cache.score(pg2_repo, old_id, new_id)
+        similarity of two blobs in percent, computed only once
+    (old_id, new_id) in cache
+        check if a score is known
+    '''
+
+    # raw old id, raw new id, score
+    record_size = 2 * 20 + 1
+
+    def __init__(self, path=None, stats=None):
+        ''' Initialization of the cache
+
+        path:   file to store the scores in, if None the scores are only
+                kept in memory
+        stats:  optional stats.Stats to count cache hits and misses
+        '''
+        self.path = path
+        self._stats = stats
+        self._scores = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        ''' Read all known scores from the file '''
+        scores = {}
+        if self.path is not None:
+            try:
+                with open(self.path, 'rb') as file_handle:
+                    data = file_handle.read()
+            except OSError:
+                data = b''
+            size = self.record_size
+            # an incomplete record at the end of the file is ignored
+            for offset in range(0, len(data) - size + 1, size):
+                record = data[offset:offset + size]
+                scores[(record[:20], record[20:40])] = record[40]
+        self._scores = scores
+
+    def __contains__(self, ids):
+        ''' Check if a score for a pair of blob ids is known '''
+        if self._scores is None:
+            self._load()
+        old_id, new_id = ids
+        return (old_id.raw, new_id.raw) in self._scores
+
+    def score(self, pg2_repo, old_id, new_id):
+        ''' Return the similarity of two blobs in percent
+
+        pg2_repo:   the pygit2.Repository containing the blobs
+        old_id:     pygit2.Oid of the first blob
+        new_id:     pygit2.Oid of the second blob
+        '''
+        if old_id == new_id:
+            return 100
+        if self._scores is None:
+            self._load()
+        key = (old_id.raw, new_id.raw)
+        score = self._scores.get(key)
+        if self._stats is not None:
+            hit = 'misses' if score is None else 'hits'
+            self._stats.count('similarity_cache_' + hit)
+        if score is None:
+            score = similarity(pg2_repo[old_id].data, pg2_repo[new_id].data)
+            self._store(key, score)
+        return score
+
+    def _store(self, key, score):
+        ''' Remember a score and append it to the file '''
+        with self._lock:
+            self._scores[key] = score
+            if self.path is None:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'ab') as file_handle:
+                    file_handle.write(key[0] + key[1] + bytes([score]))
+            except OSError:
+                # e.g. a read only folder, the scores stay in memory
+                self.path = None
+
+
+def find_rename(pg2_repo, cache, tree_id, parent_tree_id, entry, threshold):
+    ''' Return the path an object had in the parent tree or None
+
+    Should only be called for objects that don't exist in the parent tree.
+    Like `git log --follow`, only files are followed: a file was renamed, if
+    a file deleted in the same commit is at least 'threshold' percent
+    similar, the most similar one wins.
+
+    pg2_repo:       the pygit2.Repository
+    cache:          SimilarityCache for the similarity scores
+    tree_id:        id of the root tree that contains the object
+    parent_tree_id: id of the root tree of the parent commit
+    entry:          the tree entry of the object
+    threshold:      minimal similarity in percent for a rename
+    '''
+    if entry.type != 'blob':
+        return None
+    parent_tree = pg2_repo[parent_tree_id]
+    diff = parent_tree.diff_to_tree(pg2_repo[tree_id])
+    best_path, best_score = None, threshold - 1
+    for delta in diff.deltas:
+        if delta.status != pygit2.GIT_DELTA_DELETED:
+            continue
+        old_id = delta.old_file.id
+        score = cache.score(pg2_repo, old_id, entry.id)
+        if score > best_score:
+            best_path, best_score = delta.old_file.path, score
+            if score == 100:
+                break
+    return best_path
+
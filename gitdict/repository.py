@@ -1,9 +1,47 @@
 ''' gitdict.Repository '''
 
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import json
+import os
+import threading
+
 import pygit2
 
-from .utils import GitDictError, dict_like_get , ensure_oid
+from .utils import (
+    GitDictError, NULL_OID, dict_like_get, ensure_oid, ensure_timestamp)
 from .folder import FolderBase
+from .history import History
+from .committable import CommitTable
+from .commitgraph import (
+    CommitGraph, CommitInfo, commit_graph_path, write_commit_graph)
+from .renames import SimilarityCache, find_rename
+from .blame import Blame, count_lines
+from .lines import line_starts
+from .diffcache import DiffCache, EMPTY_DIFF, compact_diff, prefixed
+from .lfs import objects_dir, open_object
+from .manifest import Manifest, write_manifest
+from .stats import Stats, StatsRepository
+from .tracing import Tracer, traced
+from .transaction import Transaction
+
+
+# the ways to walk a history, see Repository.commit_history_for()
+HISTORY_MODES = (None, 'first-parent', 'full')
+
+# the changes to a file in the history, see Repository.activity_for()
+Activity = collections.namedtuple(
+    'Activity', ['git_path', 'commits', 'authors', 'last_change', 
+                 'added', 'removed'])
+
+# a revision of a file, see Repository.versions_for()
+Version = collections.namedtuple('Version', ['commit', 'blob_id', 'content'])
+
+# returned by Repository._changed_entry() if a commit did not change a path
+UNCHANGED = object()
+
 
 class Repository(FolderBase):
     ''' Simple representation of a git repository and "root folder" 
@@ -13,6 +51,10 @@ class Repository(FolderBase):
         file = Repository['some_file.txt']
         folder = Repository['some_folder']
     
+    Only a folder of the repository might be used as the root:
+        docs = Repository('path/to/repo', root='docs')
+        file = docs['index.md']
+    
     These methods have a different implemetation from the ones in the 
     Folder class.
     
@@ -40,6 +82,10 @@ class Repository(FolderBase):
     repo.walk()
         similar to os.walk() returns iterator of tuples 
         (parent_folder, [contained folders], [contained files])
+    repo.archive(format='tar', revision=None, prefix='')
+        generator of byte chunks of a tar, tar.gz or zip archive
+    repo.activity(since=None, lines=False)
+        commits, authors and last change of every file in one history walk
     
     interface like utils.NodeMixin:
     repo.git_path
@@ -47,7 +93,7 @@ class Repository(FolderBase):
     repo.last_commit
         last commit that affected the folder
     repo.history
-        list of commits that affected the folder (newest first)
+        commits in the repository (newest first), see history.History
     
     repo.is_bare
         check if this is a bare repository
@@ -55,18 +101,73 @@ class Repository(FolderBase):
         path to the repository
     repo.branch
         branch name that was opened
+    repo.root
+        path of the folder used as the root, '' for the whole repository
     repo.branches
         list all local branches in the git repository
     repo.default_encoding
         default encoding for text files
+    repo.shared_cache
+        sharedcache.SharedCache for histories and blames or None
+    repo.cache_dir
+        folder for persistent caches like the rename similarities or None
+    repo.commit_graph
+        commitgraph.CommitGraph used for history walks or None
+    repo.write_commit_graph()
+        write a commit-graph file for faster history walks
+    repo.commit_table
+        committable.CommitTable, all commits as columns for analytics
+    repo.export_manifest(path, revision=None)
+        write a manifest file listing all files, see manifest.Manifest
+    repo.open_manifest(path)
+        memory mapped manifest of the opened tree, exported if needed
+    repo.stats()
+        dict of counters and timings, e.g. object lookups and cache hits
+    repo.reset_stats()
+        set all counters and timings to zero
+    with repo.stats_scope() as scope:
+        collect the counters and timings of a block of code
+    repo.stats_sink
+        optional callable sink(name, value) for forwarding the values
+    repo.enable_tracing(hook=None, slow_threshold=None)
+        record spans of the operations and log slow ones, see tracing.Tracer
+    repo.disable_tracing()
+        stop recording spans
     repo.last_commit_for(git_path):
         last commit that affected the node located at git_path
-    repo.commit_history_for(git_path)
-        all commits that affected the node located at git_path
+    repo.commit_history_for(git_path, limit=None, offset=0, since=None, 
+                            until=None, author=None, after=None,
+                            follow=False, mode=None)
+        commits that affected the node located at git_path
+    repo.blame_for(git_path)
+        blame.Blame for the file located at git_path
+    repo.history_for_paths(git_paths, since=None)
+        dict of commit lists for many git paths, walking the commits once
+    repo.activity_for(git_path, since=None, lines=False)
+        list of Activity tuples for all files in a folder
+    repo.versions_for(git_path, limit=None, offset=0, follow=False)
+        iterator of Version tuples for the revisions of a file
     repo.diff(committish, reference=None)
         pygit2.diff object for the folder compared to the commit
         committish might be a pygit2.Commit or an pygit2.Oid like id
         if reference is also a committish, the diff is between the two commits 
+    repo.diffstat(committish, reference=None)
+        dict of git paths and (added, removed) line counts of the changes
+    repo.diffstats(commits, threads=None)
+        diffstats of many commits, compared to their first parent
+    repo.compact_diff(committish, reference=None, context_lines=3, 
+                      interhunk_lines=0)
+        diffcache.CompactDiff with the changed files, hunks and line counts,
+        cached by the ids of the compared trees
+    repo.unique_blobs(commits, batch_size=None)
+        every distinct file revision in the trees of many commits, once
+    repo.transaction(message, author, committer=None)
+        context manager for writing many files as one commit, see
+        transaction.Transaction
+    repo.refresh()
+        show the latest commit of the branch, e.g. after a push
+    repo.close()
+        release the open files and the caches of the repository
     
     with repo as r:
         syntactic sugar, context manager interface
@@ -79,18 +180,58 @@ class Repository(FolderBase):
     
     default_encoding = 'utf-8'
     
-    def __init__(self, repository_path, branch=None):
+    # number of paused commit walks kept for resuming history pages
+    history_cursor_size = 32
+    
+    # minimal similarity in percent for following a renamed file
+    rename_similarity = 50
+    
+    # number of file revisions with a cached blame
+    blame_cache_size = 256
+    
+    # bytes of compressed output kept for reuse while writing an archive
+    archive_cache_size = 16 * 1024 * 1024
+    
+    # number of missing paths remembered for item access
+    missing_cache_size = 4096
+    
+    # number of files with a cached line index
+    line_index_cache_size = 256
+    
+    # number of file revision pairs with cached line statistics
+    diffstat_cache_size = 4096
+    
+    # number of threads used by diffstats()
+    diffstats_threads = 4
+    
+    # estimated bytes of compact diffs kept for reuse, see compact_diff()
+    diff_cache_size = 16 * 1024 * 1024
+    
+    def __init__(self, repository_path, branch=None, shared_cache=None,
+                 root=None, cache_dir=None):
         ''' Initialization of the repository class 
         
         repository_path: path to git repository to use
         branch:          local git branch to work on 
                          if no branch is provided, the git head will be used
+        shared_cache:    optional sharedcache.SharedCache, the histories and
+                         blames computed by one process are shared with all
+                         other processes using the same cache
+        root:            path of a folder to use as the root, the git paths, 
+                         histories and diffs are relative to this folder
+        cache_dir:       optional folder to keep the similarity scores for
+                         following renames across processes and restarts, 
+                         the scores are only kept in memory if None
         
         raises GitDictError if the repository could not be opened or the branch
-        requested is not found.
+        or root folder requested is not found.
         '''
+        # counters and timings, see stats.Stats
+        self._stats = Stats()
+        # the pygit2 repository is opened again on first use after close()
+        self._handle_lock = threading.Lock()
         try:
-            self._pg2_repo = pygit2.Repository(repository_path)
+            self._pg2_handle = StatsRepository(repository_path, self._stats)
         except Exception:
             message = 'could not open repository at path ' + repository_path
             raise GitDictError(message)
@@ -100,22 +241,55 @@ class Repository(FolderBase):
             ref = self._pg2_repo.lookup_branch(branch, pygit2.GIT_BRANCH_LOCAL)
             if not ref:
                 raise GitDictError('could not find local branch ' + branch)
+        self.root = root.strip('/') if root else ''
         self.last_commit = self._pg2_repo[ref.target]
-        self._pg2_tree = self.last_commit.tree
+        pg2_tree = self._root_tree(self.last_commit)
+        if pg2_tree is None:
+            raise GitDictError('could not find root folder ' + self.root)
+        self._pg2_tree = pg2_tree
         # the shorthand name of the reference is used as a branch name
         # this will also point to a branch from git head.
         self.branch = ref.shorthand
+        # the full name of the reference, used to advance the branch
+        self._reference_name = ref.name
         self.path = self._pg2_repo.path
+        # guards the cursors, blame, missing paths and line index caches,
+        # they are shared by all threads using the repository
+        self._cache_lock = threading.Lock()
+        # paused commit walks, see commit_history_for()
+        self._history_cursors = collections.OrderedDict()
+        self.commit_graph = self._open_commit_graph()
+        # columns of all commits, built on first use
+        self._commit_table = None
+        # similarity scores for rename detection, loaded on first use
+        self._similarity_cache = None
+        # blame for file revisions, see blame_for()
+        self._blame_cache = collections.OrderedDict()
+        # tracing of operations, see enable_tracing()
+        self._tracer = None
+        self.shared_cache = shared_cache
+        self.cache_dir = cache_dir
+        # paths that were not found, keyed by (tree id, path)
+        self._missing_paths = collections.OrderedDict()
+        # line offsets of files, see _line_starts()
+        self._line_index_cache = collections.OrderedDict()
+        # added and removed lines by blob ids, see _line_stats()
+        self._diffstat_cache = collections.OrderedDict()
+        self._diffstat_lock = threading.Lock()
+        # folder of the local Git LFS objects, see _open_lfs_object()
+        self._lfs_objects = None
+        # compact diffs by object ids, created on first use
+        self._diff_cache = None
     
     # interface like utils.NodeMixin
     @property
     def history(self):
-        ''' Retrun a list of commits in the repository, newest first. '''
-        sorting = pygit2.GIT_SORT_TOPOLOGICAL
-        history = []
-        for commit in self._pg2_repo.walk(self.last_commit.id, sorting):
-            history.append(commit)
-        return history
+        ''' Return all commits in the repository, newest first.
+
+        The returned History can be iterated like a list or called to
+        retrieve only a page of commits, see history.History
+        '''
+        return History(self)
     
     @property
     def git_path(self):
@@ -126,6 +300,55 @@ class Repository(FolderBase):
         '''
         return ''
         
+    @property
+    def _repository(self):
+        ''' Return the repository itself.
+        
+        The nodes reach their repository as node._repository, this lets the
+        shared FolderBase methods treat the root folder the same way.
+        '''
+        return self
+    
+    @property
+    def _pg2_repo(self):
+        ''' Return the pygit2 repository, opened again after close() '''
+        pg2_repo = self._pg2_handle
+        if pg2_repo is None:
+            with self._handle_lock:
+                if self._pg2_handle is None:
+                    self._pg2_handle = StatsRepository(self.path, self._stats)
+                pg2_repo = self._pg2_handle
+        return pg2_repo
+    
+    @property
+    def last_commit(self):
+        ''' Return the pygit2.Commit the branch pointed to '''
+        commit = self._last_commit
+        if commit is None:
+            commit = self._last_commit = self._pg2_repo[self._last_commit_id]
+        return commit
+    
+    @last_commit.setter
+    def last_commit(self, commit):
+        ''' Set the pygit2.Commit the branch points to '''
+        self._last_commit_id = commit.id
+        self._last_commit = commit
+    
+    @property
+    def _pg2_tree(self):
+        ''' Return the pygit2.Tree of the root folder '''
+        pg2_tree = self._pg2_tree_object
+        if pg2_tree is None:
+            pg2_tree = self._pg2_repo[self._pg2_tree_id]
+            self._pg2_tree_object = pg2_tree
+        return pg2_tree
+    
+    @_pg2_tree.setter
+    def _pg2_tree(self, pg2_tree):
+        ''' Set the pygit2.Tree of the root folder '''
+        self._pg2_tree_id = pg2_tree.id
+        self._pg2_tree_object = pg2_tree
+        
     @property
     def is_bare(self):
         ''' Check if the repository in use is a bare repository. '''
@@ -137,63 +360,1033 @@ class Repository(FolderBase):
         flag = pygit2.GIT_BRANCH_LOCAL
         return [branch for branch in self._pg2_repo.listall_branches(flag)]
     
+    def refresh(self):
+        ''' Show the latest commit of the branch.
+        
+        A repository object shows the commit the branch pointed to when it
+        was opened. After new commits, e.g. from a push or a transaction, the
+        branch is looked up again. The caches keyed by object ids stay valid.
+        '''
+        ref = self._pg2_repo.lookup_reference(self._reference_name)
+        commit = self._pg2_repo[ref.resolve().target]
+        if commit.id == self.last_commit.id:
+            return
+        pg2_tree = self._root_tree(commit)
+        if pg2_tree is None:
+            raise GitDictError('could not find root folder ' + self.root)
+        self.last_commit = commit
+        self._pg2_tree = pg2_tree
+        # the paused walks started at the previous commit
+        with self._cache_lock:
+            self._history_cursors = collections.OrderedDict()
+        if self._commit_table is not None:
+            self._commit_table.extend(commit.id)
+    
+    def transaction(self, message, author, committer=None):
+        ''' Return a context manager for writing many files as one commit.
+        
+        message:    the commit message
+        author:     pygit2.Signature or a tuple (name, email)
+        committer:  pygit2.Signature or a tuple (name, email)
+                    if committer is None, the author is used
+        
+        author = ('Jane Doe', 'jane@example.com')
+        with repo.transaction('import', author) as tx:
+            tx['some/new_file.txt'] = 'some text'
+            del tx['some/old_file.txt']
+        
+        see transaction.Transaction
+        '''
+        return Transaction(self, message, author, committer)
+    
+    def _open_commit_graph(self):
+        ''' Return a CommitGraph for the repository or None.
+        
+        If there is no usable commit-graph file, None is returned and the 
+        history walks fall back to the object database.
+        '''
+        path = commit_graph_path(self._pg2_repo.path)
+        if not os.path.isfile(path):
+            return None
+        try:
+            return CommitGraph(path)
+        except GitDictError:
+            return None
+    
+    @property
+    def commit_table(self):
+        ''' Return a committable.CommitTable of all commits in the branch.
+        
+        The table is built on first use and only extended by the new 
+        commits, if the branch moved forward, see refresh().
+        '''
+        if self._commit_table is None:
+            self._commit_table = CommitTable(
+                self._pg2_repo, self.last_commit.id, self._stats)
+        return self._commit_table
+    
+    def write_commit_graph(self):
+        ''' Write a commit-graph file to speed up history walks.
+        
+        The file contains all commits reachable from any reference and is 
+        used right away by this repository object.
+        '''
+        if self.commit_graph is not None:
+            self.commit_graph.close()
+        write_commit_graph(self._pg2_repo)
+        self.commit_graph = self._open_commit_graph()
+    
+    def export_manifest(self, path, revision=None):
+        ''' Write a manifest file, listing all files with ids, modes and sizes.
+        
+        path:       path of the manifest file
+        revision:   list the files of this commit, a commitish
+                    if revision is None, the opened tree is used
+        
+        If the file at path is a manifest of another tree, it is patched: 
+        only the files changed between the two trees are looked up, instead
+        of walking the whole tree again. Returns a manifest.Manifest for the 
+        written file.
+        '''
+        if revision is None:
+            pg2_tree = self._pg2_tree
+        else:
+            commit = self._pg2_repo[ensure_oid(revision)]
+            if not isinstance(commit, pygit2.Commit):
+                raise GitDictError('Not a commit: ' + repr(commit))
+            pg2_tree = self._root_tree(commit)
+            if pg2_tree is None:
+                msg = 'No folder %s in commit %s'
+                raise GitDictError(msg % (self.root, commit.id))
+        base = None
+        if os.path.isfile(path):
+            try:
+                base = Manifest(path)
+            except GitDictError:
+                pass
+        try:
+            with self._stats.timer('export_manifest'):
+                write_manifest(self._pg2_repo, pg2_tree, path, base)
+        finally:
+            if base is not None:
+                base.close()
+        return Manifest(path)
+    
+    def open_manifest(self, path):
+        ''' Return a memory mapped manifest.Manifest of the opened tree.
+        
+        path:   path of the manifest file
+        
+        If the file is missing or lists another tree, e.g. after a new commit, 
+        it is exported or patched first, see export_manifest().
+        '''
+        try:
+            manifest = Manifest(path)
+        except GitDictError:
+            return self.export_manifest(path)
+        if manifest.tree_id != self._pg2_tree.id:
+            manifest.close()
+            return self.export_manifest(path)
+        return manifest
+    
+    def stats(self):
+        ''' Return a dict with the counters and timings of the repository.
+        
+        object_lookups:         objects looked up by id
+        bytes_read:             bytes of file content read
+        commits_visited:        commits visited in history walks
+        tree_lookups:           paths looked up in trees in history walks
+        *_hits, *_misses:       cache hits and misses
+        *_seconds:              cumulative time spent in an operation
+        
+        See stats_scope() for the values of a single block of code and 
+        stats_sink for forwarding the values to a metrics system.
+        '''
+        return self._stats.snapshot()
+    
+    def reset_stats(self):
+        ''' Set all counters and timings of the repository to zero. '''
+        self._stats.reset()
+    
+    def stats_scope(self):
+        ''' Context manager collecting the values counted in a block.
+        
+        with repo.stats_scope() as scope:
+            repo['some/file.txt'].last_commit
+        scope['commits_visited'] == 12
+        
+        Only the values counted by the current thread are collected.
+        '''
+        return self._stats.scope()
+    
+    @property
+    def stats_sink(self):
+        ''' Callable sink(name, value) called for every counted value. '''
+        return self._stats.sink
+    
+    @stats_sink.setter
+    def stats_sink(self, sink):
+        ''' Set a callable sink(name, value) or None to remove it. '''
+        self._stats.sink = sink
+    
+    def _is_missing(self, missing_key):
+        ''' Check if a path is known to be missing in a tree.
+        
+        missing_key:    tuple (tree id, path relative to the tree)
+        
+        The tree ids change with the content, so the entries never get stale.
+        '''
+        with self._cache_lock:
+            missing = self._missing_paths
+            if missing_key not in missing:
+                return False
+            missing.move_to_end(missing_key)
+        self._stats.count('missing_cache_hits')
+        return True
+    
+    def _remember_missing(self, missing_key):
+        ''' Remember a path that is missing in a tree, see _is_missing() '''
+        self._stats.count('missing_cache_misses')
+        with self._cache_lock:
+            missing = self._missing_paths
+            missing[missing_key] = True
+            while len(missing) > self.missing_cache_size:
+                missing.popitem(last=False)
+    
+    def enable_tracing(self, hook=None, slow_threshold=None):
+        ''' Record spans for operations and log slow operations.
+        
+        The item access, walk(), history, diff() and file data of the 
+        repository and its nodes are recorded as tracing.Span tuples with the
+        git path, the time spent and the commits visited, lookups and bytes
+        read during the call.
+        
+        hook:           callable hook(span), called for every span
+        slow_threshold: spans taking at least this many seconds are logged
+                        as a warning to the 'gitdict.slow' logger
+        
+        Returns the tracing.Tracer. Without tracing, the operations only
+        check that no tracer is set.
+        '''
+        self._tracer = Tracer(self._stats, hook, slow_threshold)
+        return self._tracer
+    
+    def disable_tracing(self):
+        ''' Stop recording spans and logging slow operations. '''
+        self._tracer = None
+    
     def last_commit_for(self, git_path):
         ''' Search the latest commit for a given git path in the repository. '''
         try:
-            history = self.commit_history_for(git_path)
+            history = self.commit_history_for(git_path, limit=1)
             return history.__next__()
         except StopIteration:
             raise GitDictError('No commit for: ' + git_path)
     
-    def commit_history_for(self, git_path):
-        ''' Retrun a list of commits that affected the git path.
+    def commit_history_for(self, git_path, limit=None, offset=0, since=None,
+                           until=None, author=None, after=None, follow=False,
+                           mode=None):
+        ''' Return an iterator of commits that affected the git path.
         
-        The list is in reverse chronological order.
+        The commits are in reverse chronological order. The commit walk is 
+        lazy and stops as soon as the requested page is complete.
         
         git_path:   path in the git repository to return the history for
+                    if git_path is None, all commits are returned, or all
+                    commits that changed the root folder
+        limit:      maximum number of commits to return
+        offset:     number of matching commits to skip
+        since:      stop the walk at commits older than this point in time
+                    a datetime or a unix timestamp, see utils.ensure_timestamp
+        until:      skip commits newer than this point in time
+        author:     only return commits with this author name or email
+        after:      pagination cursor, the last commit of the previous page
+                    a commitish, see utils.ensure_oid()
+        follow:     continue the history of a file under its previous name,
+                    if it was renamed, like `git log --follow`
+        mode:       how merges are handled
+                    None: all commits are walked, merge commits are skipped
+                    'first-parent': only the first parents are walked, a 
+                    merge is compared to its first parent, like 
+                    `git log --first-parent`
+                    'full': history simplification like `git log`, a merge 
+                    is included if it differs from all parents; if it is 
+                    the same as a parent, only this parent is walked
+        
+        If the walk for the previous page is still known, it is resumed
+        instead of walking the already seen commits again. With a shared 
+        cache, complete pages are looked up and stored there.
         
         With a lot of help from https://github.com/gollum/rugged_adapter/
         '''
-        sorting = pygit2.GIT_SORT_TIME | pygit2.GIT_SORT_REVERSE
-        history = []
-        walker = self._pg2_repo.walk(self.last_commit.id, sorting)
-        for commit in walker:
-            if len(commit.parents) > 1:
+        if mode not in HISTORY_MODES:
+            raise GitDictError('Unknown history mode: ' + repr(mode))
+        since = None if since is None else ensure_timestamp(since)
+        until = None if until is None else ensure_timestamp(until)
+        key = (git_path, since, until, author, follow, mode)
+        after = None if after is None else ensure_oid(after)
+        shared_key = page = None
+        if self.shared_cache is not None:
+            shared_key = self._shared_key(
+                'history', self.root, key, after, limit, offset,
+                follow and self.rename_similarity)
+            commit_ids = self.shared_cache.get(shared_key)
+            hit = 'hits' if commit_ids is not None else 'misses'
+            self._stats.count('shared_cache_' + hit)
+            if commit_ids is not None:
+                page = self._commits_from_bytes(commit_ids)
+        if page is None:
+            commits = None
+            if after is not None:
+                with self._cache_lock:
+                    commits = self._history_cursors.pop(key + (after,), None)
+                hit = 'hits' if commits is not None else 'misses'
+                self._stats.count('history_cursor_' + hit)
+            if commits is None:
+                commits = self._walk_history(
+                    git_path, since, until, author, after, follow, mode=mode)
+            page = self._history_page(commits, key, limit, offset)
+            if shared_key is not None:
+                page = self._share_history(shared_key, page, limit)
+        if self._tracer is not None:
+            page = self._tracer.traced_iter('history', git_path, page)
+        return self._stats.timed_iter('commit_history_for', page)
+    
+    def _shared_key(self, kind, *values):
+        ''' Return a key for the shared cache, valid for the current tip '''
+        values = json.dumps(values, default=str)
+        return '%s:%s:%s' % (kind, self.last_commit.id, values)
+    
+    def _commits_from_bytes(self, commit_ids):
+        ''' Generator for the commits of concatenated raw commit ids '''
+        for start in range(0, len(commit_ids), 20):
+            oid = pygit2.Oid(raw=commit_ids[start:start + 20])
+            yield self._pg2_repo[oid]
+    
+    def _share_history(self, shared_key, page, limit):
+        ''' Generator passing on a page of commits.
+        
+        The commit ids are stored in the shared cache, as soon as the page is
+        complete: when the limit is reached or the history is exhausted.
+        '''
+        commit_ids = []
+        stored = False
+        for commit in page:
+            commit_ids.append(commit.id.raw)
+            if len(commit_ids) == limit:
+                self.shared_cache.set(shared_key, b''.join(commit_ids))
+                stored = True
+            yield commit
+        if not stored:
+            self.shared_cache.set(shared_key, b''.join(commit_ids))
+    
+    def _walk_history(self, git_path, since, until, author, after=None,
+                      follow=False, with_paths=False, mode=None):
+        ''' Generator for all commits that match the history filters.
+        
+        git_path:   path in the git repository, None for all commits
+        since:      unix timestamp, the walk stops at older commits
+        until:      unix timestamp, newer commits are skipped
+        author:     author name or email to filter for
+        after:      skip all commits up to and including this commit id
+        follow:     continue the walk under the previous name of a file
+        with_paths: yield tuples (commit, git path in this commit, tree entry
+                    in this commit or None if the path was deleted)
+        mode:       None, 'first-parent' or 'full', see commit_history_for()
+        '''
+        if git_path is None and self.root:
+            # only the commits that changed the root folder
+            git_path = ''
+        if mode == 'first-parent':
+            commits = self._walk_first_parent()
+        elif mode == 'full' and git_path is not None:
+            def simplified_parents(info):
+                # git_path is read when called, it changes with 'follow'
+                return self._simplified_parents(info, git_path)
+            commits = self._walk_commits(simplified_parents)
+        else:
+            commits = self._walk_commits()
+        # visited commits and tree lookups are counted in batches, this is
+        # a hot loop
+        visited = tree_lookups = 0
+        for info in commits:
+            visited += 1
+            if since is not None and info.commit_time < since:
+                break
+            skipping = after is not None
+            if skipping and info.id == after:
+                after = None
+            if not follow:
+                # without renames, skipped or filtered commits need no 
+                # tree lookups at all
+                if skipping or not self._commit_matches(info, until, author):
+                    continue
+            if git_path is None:
+                self._stats.count('commits_visited', visited)
+                visited = 0
+                yield self._pg2_repo[info.id]
                 continue
-            if self._commit_touches_path(commit, git_path, walker):
-                history.append(commit)
-        return reversed(history)
+            parent_ids = info.parent_ids
+            if len(parent_ids) > 1:
+                if mode is None:
+                    continue
+                if mode == 'first-parent':
+                    parent_ids = parent_ids[:1]
+            # one lookup in the commit tree and one in each parent tree
+            tree_lookups += 1 + len(parent_ids)
+            entry = self._changed_entry(info, git_path, parent_ids)
+            if entry is UNCHANGED:
+                continue
+            if not skipping and (not follow or 
+                                 self._commit_matches(info, until, author)):
+                self._count_walk(visited, tree_lookups)
+                visited = tree_lookups = 0
+                commit = self._pg2_repo[info.id]
+                yield (commit, git_path, entry) if with_paths else commit
+            if follow:
+                git_path = self._renamed_from(info, git_path) or git_path
+        self._count_walk(visited, tree_lookups)
+        if after is not None:
+            raise GitDictError('Commit not in history: ' + str(after))
+    
+    def _count_walk(self, visited, tree_lookups):
+        ''' Add the counted commits and tree lookups of a walk to the stats '''
+        if visited:
+            self._stats.count('commits_visited', visited)
+        if tree_lookups:
+            self._stats.count('tree_lookups', tree_lookups)
+    
+    def _commit_matches(self, info, until, author):
+        ''' Check if a commit matches the until and author filters.
+        
+        info:       CommitInfo of the commit
+        until:      unix timestamp, newer commits don't match
+        author:     author name or email, other authors don't match
+        '''
+        if until is not None and info.commit_time > until:
+            return False
+        if author is not None:
+            commit = self._pg2_repo[info.id]
+            return author in (commit.author.name, commit.author.email)
+        return True
+    
+    def _renamed_from(self, info, git_path):
+        ''' Return the previous path of a file renamed in a commit or None.
+        
+        The (costly) rename detection is only done, if the file does not 
+        exist in the parent commit. The similarity scores are cached in 
+        memory, or in the cache_dir if given, see renames.SimilarityCache
+        
+        info:       CommitInfo of a commit that touched the git path
+        git_path:   the path of the file in the commit
+        '''
+        if len(info.parent_ids) != 1:
+            return None
+        parent_tree_id = self._commit_info(info.parent_ids[0]).tree_id
+        if self._tree_entry(parent_tree_id, git_path) is not None:
+            return None
+        entry = self._tree_entry(info.tree_id, git_path)
+        if entry is None:
+            return None
+        # only renames inside the root folder are followed
+        tree_id = self._root_tree_id(info.tree_id)
+        parent_tree_id = self._root_tree_id(parent_tree_id)
+        if parent_tree_id is None:
+            return None
+        if self._similarity_cache is None:
+            path = None
+            if self.cache_dir is not None:
+                path = os.path.join(self.cache_dir, 'similarity')
+            self._similarity_cache = SimilarityCache(path, self._stats)
+        return find_rename(self._pg2_repo, self._similarity_cache, 
+                           tree_id, parent_tree_id, entry,
+                           self.rename_similarity)
+    
+    def _walk_commits(self, parents=None):
+        ''' Generator for CommitInfo tuples of all commits, newest first.
+        
+        If a commit-graph file is available, the parents, trees and commit 
+        times are read from it and commit objects are only inflated for 
+        commits that are not stored in the graph. Otherwise libgit2 walks the
+        commits in the object database.
+        
+        parents:    optional callable parents(info), returns the ids of the
+                    parents to walk for a commit, e.g. to prune side branches
+        '''
+        if self.commit_graph is None and parents is None:
+            sorting = pygit2.GIT_SORT_TIME
+            for commit in self._pg2_repo.walk(self.last_commit.id, sorting):
+                yield CommitInfo(commit.id, commit.commit_time, 
+                                 commit.parent_ids, commit.tree_id)
+            return
+        # same order as GIT_SORT_TIME: newest first, ties in insertion order
+        counter = itertools.count()
+        info = self._commit_info(self.last_commit.id)
+        queue = [(-info.commit_time, next(counter), info)]
+        seen = {info.id}
+        while queue:
+            info = heapq.heappop(queue)[2]
+            yield info
+            parent_ids = info.parent_ids if parents is None else parents(info)
+            for parent_id in parent_ids:
+                if parent_id not in seen:
+                    seen.add(parent_id)
+                    parent = self._commit_info(parent_id)
+                    item = (-parent.commit_time, next(counter), parent)
+                    heapq.heappush(queue, item)
+    
+    def _walk_first_parent(self):
+        ''' Generator for CommitInfo tuples along the first parents.
+        
+        Without a commit-graph file, libgit2 walks the commits in
+        topological order, simplified to the first parents.
+        '''
+        if self.commit_graph is None:
+            sorting = pygit2.GIT_SORT_TOPOLOGICAL
+            walker = self._pg2_repo.walk(self.last_commit.id, sorting)
+            walker.simplify_first_parent()
+            for commit in walker:
+                yield CommitInfo(commit.id, commit.commit_time, 
+                                 commit.parent_ids, commit.tree_id)
+            return
+        info = self._commit_info(self.last_commit.id)
+        while True:
+            yield info
+            if not info.parent_ids:
+                return
+            info = self._commit_info(info.parent_ids[0])
+    
+    def _simplified_parents(self, info, git_path):
+        ''' Return the parents to walk for a commit, like `git log`.
+        
+        If a merge commit is TREESAME to a parent for the git path, only 
+        this parent is walked, the other branches did not contribute.
+        '''
+        if len(info.parent_ids) < 2:
+            return info.parent_ids
+        entry = self._tree_entry(info.tree_id, git_path)
+        for parent_id in info.parent_ids:
+            parent_tree_id = self._commit_info(parent_id).tree_id
+            parent_entry = self._tree_entry(parent_tree_id, git_path)
+            if entry is None and parent_entry is None:
+                return [parent_id]
+            if entry and parent_entry and entry.id == parent_entry.id:
+                return [parent_id]
+        return info.parent_ids
+    
+    def _commit_info(self, commit_id):
+        ''' Return a CommitInfo tuple for a commit id.
+        
+        The commit-graph file is used if available, the object database 
+        otherwise.
+        '''
+        # a local reference, close() may drop the graph meanwhile
+        commit_graph = self.commit_graph
+        if commit_graph is not None:
+            info = commit_graph.info(commit_id)
+            if info is not None:
+                return info
+        commit = self._pg2_repo[commit_id]
+        return CommitInfo(commit.id, commit.commit_time, commit.parent_ids,
+                          commit.tree_id)
+    
+    def _history_page(self, commits, key, limit, offset):
+        ''' Generator for a page of commits from a commit walk.
+        
+        If the page is complete, the walk is stored as a cursor to resume 
+        it for the next page.
+        
+        commits:    iterator of commits matching the history filters
+        key:        tuple of the history filters, used for the cursor
+        limit:      maximum number of commits to return
+        offset:     number of commits to skip
+        '''
+        commits = iter(commits)
+        for skipped in itertools.islice(commits, offset):
+            pass
+        last = None
+        for commit in itertools.islice(commits, limit):
+            last = commit
+            yield commit
+        if limit and last is not None:
+            with self._cache_lock:
+                cursors = self._history_cursors
+                cursors[key + (last.id,)] = commits
+                while len(cursors) > self.history_cursor_size:
+                    cursors.popitem(last=False)
 
-    def _commit_touches_path(self, commit, git_path, walker):
-        ''' Check if a commit introduced changes to a path.
+    def _changed_entry(self, info, git_path, parent_ids=None):
+        ''' Return the tree entry of a path, if a commit introduced changes.
         
         Uses commit trees to make that determination. This mimics the 
         history simplification rules that `git log` uses by default, where 
         a commit is omitted if it is TREESAME to any parent.
         
-        commit:   the commit that might have introduced a change
-        git_path: the path in the git repository to check
-        walker:   pygit2 object for iterating through the repository
+        info:       CommitInfo of the commit that might have introduced a 
+                    change
+        git_path:   the path in the git repository to check
+        parent_ids: the parents to compare to, all parents if None
+        
+        Returns UNCHANGED if the commit did not change the path, otherwise
+        the tree entry of the path in the commit, or None if it was deleted.
+        The entry is passed on, so it must not be looked up again.
         
         With a lot of help from https://github.com/gollum/rugged_adapter/
         '''
-        entry = dict_like_get(commit.tree, git_path)
-        if not commit.parents:
-            # This is the root commit, return true if it has path in its tree
-            return True if entry else False
-        treesame = False
-        for parent in commit.parents:
-            parent_entry =  dict_like_get(parent.tree, git_path)
-            # Only follow the first TREESAME parent for merge commits
-            if treesame:
-                walker.hide(parent.id)
-                walker.next()
+        if parent_ids is None:
+            parent_ids = info.parent_ids
+        if self.root and git_path:
+            # a commit that did not change the root folder is rejected 
+            # without looking up the deeper path
+            if self._changed_entry(info, '', parent_ids) is UNCHANGED:
+                return UNCHANGED
+        entry = self._tree_entry(info.tree_id, git_path)
+        if not parent_ids:
+            # This is the root commit, changed if it has path in its tree
+            return UNCHANGED if entry is None else entry
+        for parent_id in parent_ids:
+            parent_tree_id = self._commit_info(parent_id).tree_id
+            parent_entry = self._tree_entry(parent_tree_id, git_path)
             if entry is None and parent_entry is None:
-                treesame = True
-            elif entry and parent_entry and entry.id == parent_entry.id:
-                treesame = True
-        return not treesame
+                return UNCHANGED
+            if entry and parent_entry and entry.id == parent_entry.id:
+                return UNCHANGED
+        return entry
+    
+    def _tree_entry(self, tree_id, git_path):
+        ''' Return the tree entry for a git path in a commit tree or None 
+        
+        tree_id:    id of the tree of a commit
+        git_path:   path relative to the root folder, '' for the root folder
+        '''
+        if self.root:
+            git_path = self.root + '/' + git_path if git_path else self.root
+        return dict_like_get(self._pg2_repo[tree_id], git_path)
+    
+    def _root_tree_id(self, tree_id):
+        ''' Return the id of the root folder in a commit tree or None '''
+        if not self.root:
+            return tree_id
+        entry = self._tree_entry(tree_id, '')
+        if entry is None or entry.type != 'tree':
+            return None
+        return entry.id
+    
+    def _root_tree(self, commit):
+        ''' Return the pygit2.Tree of the root folder in a commit or None '''
+        tree_id = self._root_tree_id(commit.tree_id)
+        return None if tree_id is None else self._pg2_repo[tree_id]
     
+    def versions_for(self, git_path, limit=None, offset=0, follow=False):
+        ''' Return an iterator of the revisions of a file, newest first.
+        
+        git_path:   path of the file in the git repository
+        limit:      maximum number of versions to return
+        offset:     number of versions to skip
+        follow:     continue under the previous name of a renamed file
+        
+        Each version is a Version tuple (commit, blob_id, content). The 
+        commit introduced the revision with the id blob_id, content() 
+        returns the data of the revision. The data is only read if content()
+        is called, and only once for each blob id. Commits that did not
+        change the blob id, e.g. merges of the same change or a change of the
+        file mode, are skipped.
+        
+        The tree entry of each revision is taken from the history walk, the
+        path is not resolved again for each commit.
+        '''
+        versions = self._versions_for(git_path, limit, offset, follow)
+        if self._tracer is not None:
+            versions = self._tracer.traced_iter('versions', git_path, versions)
+        return self._stats.timed_iter('versions_for', versions)
+    
+    def _versions_for(self, git_path, limit, offset, follow):
+        ''' Generator for the Version tuples of a file '''
+        if limit == 0:
+            return
+        # data of the revisions that were read, by blob id
+        contents = {}
+        def reader(blob_id):
+            def content():
+                data = contents.get(blob_id)
+                if data is None:
+                    data = contents[blob_id] = self._pg2_repo[blob_id].data
+                    self._stats.count('bytes_read', len(data))
+                return data
+            return content
+        history = self._walk_history(
+            git_path, None, None, None, follow=follow, with_paths=True)
+        previous_id = None
+        count = 0
+        for commit, path, entry in history:
+            if entry is None or entry.type != 'blob':
+                # the file was deleted or replaced by a folder
+                previous_id = None
+                continue
+            if entry.id == previous_id:
+                continue
+            previous_id = entry.id
+            count += 1
+            if count <= offset:
+                continue
+            yield Version(commit, entry.id, reader(entry.id))
+            if limit is not None and count - offset >= limit:
+                return
+    
+    def blame_for(self, git_path):
+        ''' Return a blame.Blame for the file located at git_path.
+        
+        The blame of each revision of the file is cached by blob id and 
+        commit id. To blame a revision, the blame of the revision in the 
+        parent is reused and only the lines in the changed hunks are 
+        attributed to the new commit. A commit with the same content as one 
+        of its parents is passed to this parent, e.g. a merge of a side 
+        branch. Other merge commits are compared to each parent, only lines 
+        that are new compared to every parent are attributed to the merge. 
+        The history is followed across renames, moved or copied lines are 
+        not detected.
+        
+        Raises a GitDictError, if there is no history for a file at git_path
+        '''
+        with self._stats.timer('blame_for'):
+            return self._blame_for(git_path)
+    
+    def _blame_for(self, git_path):
+        ''' Return a blame.Blame for the file located at git_path. '''
+        info = self._commit_info(self.last_commit.id)
+        entry = self._tree_entry(info.tree_id, git_path)
+        if entry is None or entry.type != 'blob':
+            raise GitDictError('No file history for: ' + git_path)
+        blame = self._blame_revision(info, entry, git_path)
+        with self._cache_lock:
+            while len(self._blame_cache) > self.blame_cache_size:
+                self._blame_cache.popitem(last=False)
+        return blame
+    
+    def _blame_revision(self, info, entry, git_path):
+        ''' Return a blame.Blame for a file in a commit.
+        
+        info:       CommitInfo of the commit
+        entry:      tree entry of the file in the commit
+        git_path:   path of the file in the commit
+        
+        The other parents of a merge commit are blamed by recursive calls.
+        '''
+        # collect the revisions along the first parents until a cached blame
+        # is found, each with the path and the other parents of a merge
+        revisions = []
+        blame = None
+        visited = tree_lookups = 0
+        while True:
+            visited += 1
+            tree_lookups += len(info.parent_ids)
+            parents = []
+            for parent_id in info.parent_ids:
+                parent = self._commit_info(parent_id)
+                parents.append(
+                    (parent, self._tree_entry(parent.tree_id, git_path)))
+            unchanged = [
+                (parent, parent_entry) for parent, parent_entry in parents
+                if parent_entry is not None and parent_entry.id == entry.id]
+            if unchanged:
+                # the same content as in a parent, the lines come from there
+                info, entry = unchanged[0]
+                continue
+            key = (entry.id, info.id)
+            with self._cache_lock:
+                blame = self._blame_cache.get(key)
+            if blame is None and self.shared_cache is not None:
+                blame = self._shared_blame(key)
+            if blame is not None:
+                self._stats.count('blame_cache_hits')
+                with self._cache_lock:
+                    self._blame_cache[key] = blame
+                    self._blame_cache.move_to_end(key)
+                break
+            self._stats.count('blame_cache_misses')
+            merged = [
+                (parent, parent_entry) for parent, parent_entry in parents[1:]
+                if parent_entry is not None and parent_entry.type == 'blob']
+            revisions.append((key, git_path, merged))
+            if not parents:
+                break
+            parent, parent_entry = parents[0]
+            if parent_entry is None:
+                git_path = self._renamed_from(info, git_path)
+                if git_path is None:
+                    # the file was added here, older revisions don't count
+                    break
+                parent_entry = self._tree_entry(parent.tree_id, git_path)
+            if parent_entry.type != 'blob':
+                break
+            info, entry = parent, parent_entry
+        self._count_walk(visited, tree_lookups)
+        previous_blob = key[0] if blame is not None else None
+        for (blob_id, commit_id), git_path, merged in reversed(revisions):
+            # the blames of the revision in the first parent and in the 
+            # other parents of a merge
+            sources = []
+            if blame is not None:
+                sources.append((blame, previous_blob))
+            for parent, parent_entry in merged:
+                parent_blame = self._blame_revision(
+                    parent, parent_entry, git_path)
+                sources.append((parent_blame, parent_entry.id))
+            blame = self._blame_from_parents(blob_id, commit_id, sources)
+            with self._cache_lock:
+                self._blame_cache[(blob_id, commit_id)] = blame
+            previous_blob = blob_id
+        if revisions and self.shared_cache is not None:
+            shared_key = 'blame:%s:%s' % revisions[0][0]
+            self.shared_cache.set(shared_key, blame.to_bytes())
+        return blame
+    
+    def _blame_from_parents(self, blob_id, commit_id, sources):
+        ''' Return a blame.Blame for a revision from the parent revisions.
+        
+        blob_id:    pygit2.Oid of the blob of the revision
+        commit_id:  pygit2.Oid of the commit that changed the file
+        sources:    list of tuples (blame, blob id) of the file in the 
+                    parents, empty for a new file
+        
+        A line is attributed to the commit only if it is new compared to 
+        every parent, otherwise it keeps the attribution of the first parent
+        with this line.
+        '''
+        pg2_blob = self._pg2_repo[blob_id]
+        data = pg2_blob.data
+        self._stats.count('bytes_read', len(data))
+        line_count = count_lines(data)
+        blames = []
+        for parent_blame, parent_blob_id in sources:
+            parent_blob = self._pg2_repo[parent_blob_id]
+            if parent_blob.is_binary or pg2_blob.is_binary:
+                # a binary diff has no hunks, no line is passed on
+                continue
+            patch = parent_blob.diff(pg2_blob)
+            blames.append(parent_blame.apply(patch, commit_id, line_count))
+        if not blames:
+            return Blame.for_new_file(commit_id, line_count)
+        if len(blames) == 1:
+            return blames[0]
+        return Blame.merge(blames, commit_id)
+    
+    def _shared_blame(self, key):
+        ''' Return a blame from the shared cache or None.
+        
+        key:    tuple (blob id, commit id) of the file revision
+        '''
+        data = self.shared_cache.get('blame:%s:%s' % key)
+        if data is None:
+            self._stats.count('shared_cache_misses')
+            return None
+        self._stats.count('shared_cache_hits')
+        return Blame.from_bytes(data)
+    
+    def _open_lfs_object(self, pointer):
+        ''' Return the local Git LFS object for a lfs.Pointer as file object
+        
+        The location of the object store is read from the git config on 
+        first use. Raises GitDictError if the object is not available.
+        '''
+        if self._lfs_objects is None:
+            self._lfs_objects = objects_dir(self._pg2_repo)
+        return open_object(self._lfs_objects, pointer)
+    
+    def _line_starts(self, blob_id, data):
+        ''' Return the array of line offsets for a blob, see lines.Lines
+        
+        blob_id:    pygit2.Oid of the blob, the offsets are cached by it
+        data:       the content of the blob
+        '''
+        with self._cache_lock:
+            cache = self._line_index_cache
+            starts = cache.get(blob_id)
+            if starts is not None:
+                cache.move_to_end(blob_id)
+        if starts is not None:
+            self._stats.count('line_index_cache_hits')
+            return starts
+        self._stats.count('line_index_cache_misses')
+        starts = line_starts(data)
+        with self._cache_lock:
+            cache = self._line_index_cache
+            cache[blob_id] = starts
+            while len(cache) > self.line_index_cache_size:
+                cache.popitem(last=False)
+        return starts
+    
+    def history_for_paths(self, git_paths, since=None):
+        ''' Return the commit histories for many git paths at once.
+        
+        The commits are walked only once. Each commit is compared to its 
+        parent only in the subtrees that lead to one of the requested paths,
+        unchanged subtrees are skipped by comparing their ids.
+        
+        git_paths:  iterable of paths in the git repository
+        since:      stop the walk at commits older than this point in time
+                    a datetime or a unix timestamp, see utils.ensure_timestamp
+        
+        Returns an OrderedDict with the git paths as keys and lists of commits
+        that affected the path as values, newest commit first. Like in 
+        commit_history_for(), merge commits are not included.
+        '''
+        git_paths = list(git_paths)
+        histories = collections.OrderedDict((path, []) for path in git_paths)
+        with self._stats.timer('history_for_paths'):
+            for git_path, commit in self._walk_paths(git_paths, since):
+                histories[git_path].append(commit)
+        return histories
+    
+    def _walk_paths(self, git_paths, since=None):
+        ''' Generator for (git path, commit) tuples, newest commit first.
+        
+        git_paths:  list of paths in the git repository
+        since:      stop the walk at commits older than this point in time
+        '''
+        since = None if since is None else ensure_timestamp(since)
+        path_tree = {}
+        for git_path in git_paths:
+            node = path_tree
+            full_path = '/'.join((self.root, git_path.strip('/')))
+            for name in full_path.strip('/').split('/'):
+                node = node.setdefault(name, {})
+            node[None] = git_path
+        for info in self._walk_commits():
+            self._stats.count('commits_visited')
+            if since is not None and info.commit_time < since:
+                return
+            if len(info.parent_ids) > 1:
+                continue
+            tree = self._pg2_repo[info.tree_id]
+            parent_tree = None
+            if info.parent_ids:
+                parent_info = self._commit_info(info.parent_ids[0])
+                parent_tree = self._pg2_repo[parent_info.tree_id]
+            changed = self._changed_paths(tree, parent_tree, path_tree)
+            if changed:
+                commit = self._pg2_repo[info.id]
+                for git_path in changed:
+                    yield git_path, commit
+    
+    def _changed_paths(self, tree, parent_tree, path_tree):
+        ''' Return the requested git paths that differ between two trees.
+        
+        tree:        pygit2.Tree or None if the tree does not exist
+        parent_tree: pygit2.Tree or None if the tree does not exist
+        path_tree:   nested dicts of path names, a None key marks a 
+                     requested git path
+        '''
+        if tree is not None and parent_tree is not None:
+            if tree.id == parent_tree.id:
+                return []
+        changed = []
+        for name, sub_paths in path_tree.items():
+            if name is None:
+                continue
+            entry = dict_like_get(tree, name) if tree is not None else None
+            parent_entry = None
+            if parent_tree is not None:
+                parent_entry = dict_like_get(parent_tree, name)
+            if entry is None and parent_entry is None:
+                continue
+            if entry and parent_entry and entry.id == parent_entry.id:
+                continue
+            if None in sub_paths:
+                changed.append(sub_paths[None])
+            if any(sub_name is not None for sub_name in sub_paths):
+                sub_tree = self._tree_for_entry(entry)
+                parent_sub_tree = self._tree_for_entry(parent_entry)
+                if sub_tree is not None or parent_sub_tree is not None:
+                    changed.extend(self._changed_paths(
+                        sub_tree, parent_sub_tree, sub_paths))
+        return changed
+    
+    def activity_for(self, git_path, since=None, lines=False):
+        ''' Return the activity of every file in a folder, most active first.
+        
+        The commits are walked only once. Each commit is compared to its 
+        parent only inside the folder: if the folder is unchanged, the commit
+        is skipped without a diff. Like in commit_history_for(), merge 
+        commits are not included.
+        
+        git_path:   path of the folder, '' for the root folder
+        since:      stop the walk at commits older than this point in time
+                    a datetime or a unix timestamp, see utils.ensure_timestamp
+        lines:      also sum up the added and removed lines, see diffstat()
+        
+        Returns a list of Activity tuples (git_path, commits, authors,
+        last_change, added, removed), sorted by the number of commits: the
+        number of commits and of distinct author emails, the commit time of
+        the last change and the line counts, or 0 if lines is False. Deleted
+        files are included, renamed files count as deleted and added.
+        '''
+        since = None if since is None else ensure_timestamp(since)
+        git_path = git_path.strip('/')
+        prefix = git_path + '/' if git_path else ''
+        # git path: [commits, author emails, last change, added, removed]
+        records = {}
+        visited = 0
+        with self._stats.timer('activity_for'):
+            for info in self._walk_commits():
+                visited += 1
+                if since is not None and info.commit_time < since:
+                    break
+                if len(info.parent_ids) > 1:
+                    continue
+                tree_id = self._folder_tree_id(info.tree_id, git_path)
+                parent_tree_id = None
+                if info.parent_ids:
+                    parent_info = self._commit_info(info.parent_ids[0])
+                    parent_tree_id = self._folder_tree_id(
+                        parent_info.tree_id, git_path)
+                if tree_id == parent_tree_id:
+                    continue
+                new_tree = old_tree = None
+                if tree_id is not None:
+                    new_tree = self._pg2_repo[tree_id]
+                if parent_tree_id is not None:
+                    old_tree = self._pg2_repo[parent_tree_id]
+                if lines:
+                    changes = self._tree_diffstat(old_tree, new_tree).items()
+                else:
+                    changes = (
+                        (delta.new_file.path or delta.old_file.path, (0, 0))
+                        for delta in self._tree_deltas(old_tree, new_tree))
+                email = self._pg2_repo[info.id].author.email
+                for path, (added, removed) in changes:
+                    record = records.get(path)
+                    if record is None:
+                        record = records[path] = [0, set(), 0, 0, 0]
+                    record[0] += 1
+                    record[1].add(email)
+                    record[2] = max(record[2], info.commit_time)
+                    record[3] += added
+                    record[4] += removed
+            self._stats.count('commits_visited', visited)
+        activity = [
+            Activity(prefix + path, commits, len(emails), last, added, removed)
+            for path, (commits, emails, last, added, removed) 
+            in records.items()]
+        activity.sort(key=lambda item: (-item.commits, item.git_path))
+        return activity
+    
+    def _folder_tree_id(self, tree_id, git_path):
+        ''' Return the id of a folder in a commit tree or None '''
+        if not git_path:
+            return self._root_tree_id(tree_id)
+        entry = self._tree_entry(tree_id, git_path)
+        if entry is None or entry.type != 'tree':
+            return None
+        return entry.id
+    
+    def _tree_for_entry(self, tree_entry):
+        ''' Return the pygit2.Tree for a tree entry or None for other types '''
+        if tree_entry is None or tree_entry.type != 'tree':
+            return None
+        return self._pg2_repo[tree_entry.id]
+    
+    @traced('diff')
     def diff(self, commitish, reference=None):
         ''' Get a pygit2.diff for the root folder in an other commmit.
         
@@ -212,13 +1405,319 @@ class Repository(FolderBase):
             reference_id = ensure_oid(reference)
             pg2_ref_commit = self._pg2_repo[reference_id]
         try:
-            return pg2_ref_commit.tree.diff_to_tree(commit.tree)
+            ref_tree = self._root_tree(pg2_ref_commit)
+            return ref_tree.diff_to_tree(self._root_tree(commit))
         except (TypeError, AttributeError):
             # this might happen, either commitish or reference do not point
             # to a commit
             msg = 'Diff impossible between %s and %s '
             raise GitDictError(msg % (commit, pg2_ref_commit))
             
+    @traced('diffstat')
+    def diffstat(self, commitish, reference=None):
+        ''' Return the added and removed lines of the changes per file.
+        
+        commitish:  value that refers to a commit, the old revision
+                    see utils.ensure_oid()
+        reference:  a commit with the new revision
+                    if reference is None, use the last commit
+        
+        Returns an OrderedDict with the git paths of the changed files as 
+        keys and tuples (added lines, removed lines) as values. Binary files
+        are reported with (0, 0), renamed files as removed and added.
+        '''
+        old_commit = self._pg2_repo[ensure_oid(commitish)]
+        new_commit = self.last_commit
+        if reference is not None:
+            new_commit = self._pg2_repo[ensure_oid(reference)]
+        try:
+            return self._tree_diffstat(
+                self._root_tree(old_commit), self._root_tree(new_commit))
+        except AttributeError:
+            # this might happen, either commitish or reference do not point
+            # to a commit
+            msg = 'Diffstat impossible between %s and %s '
+            raise GitDictError(msg % (old_commit, new_commit))
+    
+    @traced('compact_diff')
+    def compact_diff(self, commitish, reference=None, context_lines=3,
+                     interhunk_lines=0):
+        ''' Return the changes as a compact, serializable diff.
+        
+        commitish:       value that refers to a commit, the old revision
+                         see utils.ensure_oid()
+        reference:       a commit with the new revision
+                         if reference is None, use the last commit
+        context_lines:   number of unchanged lines around a change
+        interhunk_lines: maximum number of unchanged lines between two 
+                         changes in one hunk
+        
+        Returns a diffcache.CompactDiff with the changed files, their hunks
+        and line counts. The diffs are cached by the ids of the compared 
+        trees or files and the options, the cache is shared by all folders
+        and files, see diff_cache_size.
+        '''
+        old_commit = self._pg2_repo[ensure_oid(commitish)]
+        new_commit = self.last_commit
+        if reference is not None:
+            new_commit = self._pg2_repo[ensure_oid(reference)]
+        try:
+            old_tree = self._root_tree(old_commit)
+            new_tree = self._root_tree(new_commit)
+        except AttributeError:
+            # this might happen, either commitish or reference do not point
+            # to a commit
+            msg = 'Diff impossible between %s and %s '
+            raise GitDictError(msg % (old_commit, new_commit))
+        return self._compact_diff(
+            old_tree, new_tree, '', context_lines, interhunk_lines)
+    
+    def _compact_diff(self, old_object, new_object, prefix, context_lines,
+                      interhunk_lines):
+        ''' Return a CompactDiff of two trees or two blobs, cached by ids
+        
+        old_object: pygit2.Tree or pygit2.Blob of the old revision or None
+        new_object: object of the same type for the new revision or None
+        prefix:     prefix for the paths, e.g. the git path of a folder
+        
+        Raises a GitDictError if the objects are not both trees or blobs.
+        '''
+        objects = [obj for obj in (old_object, new_object) if obj is not None]
+        kinds = {type(obj) for obj in objects}
+        if len(kinds) > 1 or not kinds <= {pygit2.Tree, pygit2.Blob}:
+            msg = 'Diff impossible between %s and %s '
+            raise GitDictError(msg % (old_object, new_object))
+        if not objects or old_object == new_object:
+            return EMPTY_DIFF
+        if self._diff_cache is None:
+            self._diff_cache = DiffCache(self.diff_cache_size, self._stats)
+        old_id = NULL_OID if old_object is None else old_object.id
+        new_id = NULL_OID if new_object is None else new_object.id
+        key = (old_id, new_id, context_lines, interhunk_lines)
+        diff = self._diff_cache.get(key)
+        if diff is None:
+            options = {'context_lines': context_lines, 
+                       'interhunk_lines': interhunk_lines}
+            if pygit2.Blob in kinds:
+                # the paths are empty, the prefix is the path of the file
+                patches = [pygit2.Patch.create_from(
+                    old_object, new_object, old_as_path='', new_as_path='',
+                    **options)]
+            else:
+                patches = self._tree_diff(old_object, new_object, **options)
+            diff, size = compact_diff(patches)
+            self._diff_cache.put(key, diff, size)
+        return prefixed(diff, prefix)
+    
+    def diffstats(self, commits, threads=None):
+        ''' Return the diffstats of many commits, see diffstat().
+        
+        Each commit is compared to its first parent, a root commit to an
+        empty tree. The commits are processed by a thread pool, the line
+        statistics of each pair of file revisions are cached.
+        
+        commits:    iterable of commitish, e.g. a page of the history, or a 
+                    range 'old..new' of commit ids: all commits reachable 
+                    from new but not from old
+        threads:    number of threads, defaults to diffstats_threads
+        
+        Returns an OrderedDict with the commit ids as keys and the diffstats
+        as values.
+        '''
+        if isinstance(commits, str):
+            commits = self._commit_range(commits)
+        commit_ids = [ensure_oid(commit) for commit in commits]
+        threads = threads or self.diffstats_threads
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            results = executor.map(self._commit_diffstat, commit_ids)
+            return collections.OrderedDict(zip(commit_ids, results))
+    
+    def _commit_range(self, commit_range):
+        ''' Return the commit ids in a range 'old..new', newest first '''
+        try:
+            old, new = commit_range.split('..')
+        except ValueError:
+            raise GitDictError('Not a commit range: ' + repr(commit_range))
+        new = ensure_oid(new) if new else self.last_commit.id
+        walker = self._pg2_repo.walk(new, pygit2.GIT_SORT_TIME)
+        if old:
+            walker.hide(ensure_oid(old))
+        return [commit.id for commit in walker]
+    
+    def _commit_diffstat(self, commit_id):
+        ''' Return the diffstat of a commit compared to its first parent '''
+        commit = self._pg2_repo[commit_id]
+        parent_tree = None
+        if commit.parent_ids:
+            parent_tree = self._root_tree(self._pg2_repo[commit.parent_ids[0]])
+        return self._tree_diffstat(parent_tree, self._root_tree(commit))
+    
+    def _tree_diffstat(self, old_tree, new_tree, prefix=''):
+        ''' Return the line statistics for the changes between two trees.
+        
+        old_tree:   pygit2.Tree of the old revision, None for an empty tree
+        new_tree:   pygit2.Tree of the new revision, None for an empty tree
+        prefix:     prefix for the paths, e.g. the git path of a folder
+        
+        Only the tree entries are compared, the line statistics of the 
+        changed files are computed by _line_stats() without a text patch.
+        '''
+        stats = collections.OrderedDict()
+        submodule = pygit2.GIT_FILEMODE_COMMIT
+        for delta in self._tree_deltas(old_tree, new_tree):
+            path = delta.new_file.path or delta.old_file.path
+            old_mode, new_mode = delta.old_file.mode, delta.new_file.mode
+            if submodule in (old_mode, new_mode):
+                # like git, a submodule counts as one line with its commit
+                stats[prefix + path] = (
+                    int(new_mode == submodule), int(old_mode == submodule))
+                continue
+            stats[prefix + path] = self._line_stats(
+                delta.old_file.id, delta.new_file.id)
+        return stats
+    
+    def _tree_deltas(self, old_tree, new_tree):
+        ''' Return the pygit2.DiffDelta objects of the changes between trees.
+        
+        old_tree:   pygit2.Tree of the old revision, None for an empty tree
+        new_tree:   pygit2.Tree of the new revision, None for an empty tree
+        '''
+        if old_tree is None and new_tree is None:
+            return []
+        return self._tree_diff(old_tree, new_tree).deltas
+    
+    def _tree_diff(self, old_tree, new_tree, **options):
+        ''' Return the pygit2.Diff between two trees, one may be None
+        
+        options:    keyword arguments for pygit2.Tree.diff_to_tree()
+        '''
+        if old_tree is None:
+            return new_tree.diff_to_tree(swap=True, **options)
+        if new_tree is None:
+            return old_tree.diff_to_tree(**options)
+        return old_tree.diff_to_tree(new_tree, **options)
+    
+    def _line_stats(self, old_id, new_id):
+        ''' Return a tuple (added lines, removed lines) for two blob ids.
+        
+        An id of zeros stands for a file that does not exist. The results 
+        are cached by the pair of ids, binary files have (0, 0).
+        '''
+        key = (old_id, new_id)
+        cache = self._diffstat_cache
+        with self._diffstat_lock:
+            line_stats = cache.get(key)
+            if line_stats is not None:
+                cache.move_to_end(key)
+        if line_stats is not None:
+            self._stats.count('diffstat_cache_hits')
+            return line_stats
+        self._stats.count('diffstat_cache_misses')
+        old_blob = None if old_id == NULL_OID else self._pg2_repo[old_id]
+        new_blob = None if new_id == NULL_OID else self._pg2_repo[new_id]
+        blobs = [blob for blob in (old_blob, new_blob) if blob is not None]
+        self._stats.count('bytes_read', sum(blob.size for blob in blobs))
+        if any(blob.is_binary for blob in blobs):
+            line_stats = (0, 0)
+        elif old_blob is None:
+            line_stats = (count_lines(new_blob.data), 0)
+        elif new_blob is None:
+            line_stats = (0, count_lines(old_blob.data))
+        else:
+            context, added, removed = old_blob.diff(new_blob).line_stats
+            line_stats = (added, removed)
+        with self._diffstat_lock:
+            cache[key] = line_stats
+            while len(cache) > self.diffstat_cache_size:
+                cache.popitem(last=False)
+        return line_stats
+    
+    def unique_blobs(self, commits, batch_size=None):
+        ''' Generator for every distinct blob in the trees of many commits.
+        
+        The trees are walked with a set of seen object ids: a subtree that
+        was already visited in an earlier commit or at another path is 
+        skipped with all its content, each blob is reported only once.
+        
+        commits:    iterable of commitish, e.g. the history or branch tips, 
+                    or a range 'old..new' of commit ids: all commits 
+                    reachable from new but not from old
+        batch_size: if set, lists of up to batch_size items are yielded
+        
+        Yields tuples (blob id, git path, pygit2.Commit) with the first path
+        and commit the blob was found in. The commits are read lazily, one 
+        at a time. Submodules are not included.
+        '''
+        if isinstance(commits, str):
+            commits = self._commit_range(commits)
+        blobs = self._unique_blobs(commits)
+        if not batch_size:
+            return blobs
+        return self._batches(blobs, batch_size)
+    
+    def _unique_blobs(self, commits):
+        ''' Generator for the unique blobs, see unique_blobs() '''
+        seen = set()
+        for commitish in commits:
+            commit = self._pg2_repo[ensure_oid(commitish)]
+            tree_id = self._root_tree_id(commit.tree_id)
+            if tree_id is None or tree_id in seen:
+                continue
+            seen.add(tree_id)
+            # depth first, the entries of a folder before its subfolders
+            stack = [(self._pg2_repo[tree_id], '')]
+            while stack:
+                tree, prefix = stack.pop()
+                subtrees = []
+                for entry in tree:
+                    if entry.id in seen:
+                        continue
+                    if entry.type == 'blob':
+                        seen.add(entry.id)
+                        yield entry.id, prefix + entry.name, commit
+                    elif entry.type == 'tree':
+                        seen.add(entry.id)
+                        subtree = self._pg2_repo[entry.id]
+                        subtrees.append((subtree, prefix + entry.name + '/'))
+                stack.extend(reversed(subtrees))
+    
+    def _batches(self, iterator, batch_size):
+        ''' Generator for lists of up to batch_size items of an iterator '''
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+    
+    def close(self):
+        ''' Release the open files and the caches of the repository.
+        
+        The repository can still be used afterwards, the git files are 
+        opened again on the next access. The commit-graph file is not used 
+        anymore.
+        
+        Other threads may still use the repository: the pygit2 handle and 
+        the commit graph are dropped, not closed under their feet. They 
+        release their files as soon as the last running walk or node drops 
+        them. The caches are replaced by empty ones.
+        '''
+        with self._handle_lock:
+            self._pg2_handle = None
+        # the commit and the tree keep the pygit2 handle open
+        self._last_commit = None
+        self._pg2_tree_object = None
+        self.commit_graph = None
+        with self._cache_lock:
+            self._history_cursors = collections.OrderedDict()
+            self._blame_cache = collections.OrderedDict()
+            self._missing_paths = collections.OrderedDict()
+            self._line_index_cache = collections.OrderedDict()
+        with self._diffstat_lock:
+            self._diffstat_cache = collections.OrderedDict()
+        self._diff_cache = None
+        self._similarity_cache = None
+        self._commit_table = None
+    
     def _child_factory(self, tree_entry):
         ''' Create a gitdict object from a pygit2 tree entry. '''
         child_class = self.child_map[tree_entry.type]
@@ -0,0 +1,179 @@
+''' gitdict.SharedCache '''
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedCache(object):
+    ''' Size limited key value store, shared between processes
+
+    The cache is a SQLite database in WAL mode, so any number of processes
+    can read it while one of them writes. It is meant for metadata computed
+    from immutable git objects, like the history of a path at a commit: the
+    keys contain the object ids, so the values never have to be invalidated.
+
+    cache = SharedCache('/var/cache/gitdict.sqlite', max_bytes=64 MiB)
+    repo = Repository('path/to/repo', shared_cache=cache)
+
+    cache.get(key)
+        bytes stored for a text key or None
+    cache.set(key, value)
+        store bytes for a text key
+    len(cache)
+        number of stored entries
+    cache.size
+        total bytes of the stored values
+    cache.clear()
+        remove all entries
+    cache.close()
+        close the database connection of the current thread
+
+    If the values exceed max_bytes, the least recently used entries are
+    removed. The last use is only updated if it is older than
+    'touch_interval' seconds, to keep the reads free of writes.
+
+    A cache object may be created before the worker processes are forked,
+    each process and thread opens its own connection on first use. Errors of
+    the database are not raised, get() returns None and set() does nothing.
+    '''
+
+    # seconds between updates of the last use of an entry
+    touch_interval = 60
+
+    # seconds to wait for a lock held by another process
+    timeout = 5
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        ''' Initialization of the cache
+
+        path:       path to the database file, created if needed
+        max_bytes:  maximum total size of the stored values
+        '''
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        # create the database right away, to report errors early
+        self._connection()
+
+    def _connection(self):
+        ''' Return the database connection of this process and thread '''
+        local = self._local
+        if getattr(local, 'pid', None) == os.getpid():
+            return local.connection
+        connection = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'size INTEGER NOT NULL, used REAL NOT NULL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_used ON cache (used)')
+        # the total size of the values, kept up to date on every change
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS meta ('
+            'name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        connection.execute(
+            "INSERT OR IGNORE INTO meta (name, value) VALUES ('size', 0)")
+        local.connection = connection
+        local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        ''' Return the bytes stored for a key or None '''
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                'SELECT value, used FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            value, used = row
+            now = time.time()
+            if used < now - self.touch_interval:
+                connection.execute(
+                    'UPDATE cache SET used = ? WHERE key = ?', (now, key))
+            return bytes(value)
+        except sqlite3.Error:
+            return None
+
+    def set(self, key, value):
+        ''' Store bytes for a key, evicts old entries if needed '''
+        if len(value) > self.max_bytes:
+            return
+        try:
+            connection = self._connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    'SELECT size FROM cache WHERE key = ?', (key,)).fetchone()
+                connection.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, size, used) '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, value, len(value), time.time()))
+                added = len(value) - (row[0] if row else 0)
+                self._add_size(connection, added)
+                self._evict(connection)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, connection):
+        ''' Remove the least recently used entries above the size limit '''
+        total = self._size(connection)
+        if total <= self.max_bytes:
+            return
+        # make some room, so that not every insert has to evict
+        excess = total - self.max_bytes * 0.9
+        keys = []
+        removed = 0
+        rows = connection.execute('SELECT key, size FROM cache ORDER BY used')
+        for key, size in rows:
+            if removed >= excess:
+                break
+            keys.append((key,))
+            removed += size
+        rows.close()
+        connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+        self._add_size(connection, -removed)
+
+    def _size(self, connection):
+        ''' Return the total size of the values '''
+        return connection.execute(
+            "SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    def _add_size(self, connection, added):
+        ''' Change the total size of the values '''
+        connection.execute(
+            "UPDATE meta SET value = value + ? WHERE name = 'size'", (added,))
+
+    def __len__(self):
+        ''' Return the number of stored entries '''
+        connection = self._connection()
+        return connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    @property
+    def size(self):
+        ''' Return the total bytes of the stored values '''
+        return self._size(self._connection())
+
+    def clear(self):
+        ''' Remove all entries '''
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('DELETE FROM cache')
+        connection.execute("UPDATE meta SET value = 0 WHERE name = 'size'")
+        connection.execute('COMMIT')
+
+    def close(self):
+        ''' Close the database connection of the current thread '''
+        local = self._local
+        if getattr(local, 'pid', None) == os.getpid():
+            local.connection.close()
+        local.__dict__.clear()
@@ -0,0 +1,174 @@
+''' gitdict.Stats '''
+
+import collections
+import contextlib
+import threading
+import time
+import weakref
+
+import pygit2
+
+
+class Stats(object):
+    ''' Counters and cumulative timings of repository operations
+
+    Every repository has its own Stats object, the values are collected per
+    thread without locking and summed up on request. The values of a thread
+    that has ended are kept in a common total:
+
+    stats.count(name, value=1)
+        add a value to a counter
+    with stats.timer(name):
+        add the time spent in the block to the counter 'name_seconds'
+    stats.snapshot()
+        dict with the sums of all counters of all threads
+    stats.reset()
+        set all counters to zero
+    with stats.scope() as scope:
+        collections.Counter, filled with only the values counted in the
+        block by the current thread when the block is left
+    stats.sink
+        optional callable sink(name, value), called for every count, e.g.
+        to forward the values to a metrics system
+    '''
+
+    def __init__(self, sink=None):
+        ''' Initialization of the stats
+
+        sink:   callable sink(name, value), called for every count
+        '''
+        self.sink = sink
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # id of the counters: counters of a running thread
+        self._all_counters = {}
+        # the values of threads that have ended
+        self._finished = collections.Counter()
+
+    def _thread_counters(self):
+        ''' Return the counters of the current thread '''
+        local = self._local
+        try:
+            return local.counters
+        except AttributeError:
+            counters = collections.Counter()
+            with self._lock:
+                self._all_counters[id(counters)] = counters
+            # the thread local data is dropped when the thread ends
+            local.owner = _ThreadOwner()
+            weakref.finalize(local.owner, self._retire, id(counters))
+            local.counters = counters
+            return counters
+
+    def _retire(self, key):
+        ''' Move the counters of a thread that has ended to the total '''
+        with self._lock:
+            counters = self._all_counters.pop(key, None)
+            if counters is not None:
+                self._finished.update(counters)
+
+    def count(self, name, value=1):
+        ''' Add a value to a counter '''
+        try:
+            counters = self._local.counters
+        except AttributeError:
+            counters = self._thread_counters()
+        counters[name] += value
+        if self.sink is not None:
+            self.sink(name, value)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        ''' Context manager, adds the elapsed time to 'name_seconds' '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.count(name + '_seconds', time.perf_counter() - start)
+
+    def timed_iter(self, name, iterator):
+        ''' Generator, adds the time spent inside the iterator to a timer
+
+        Only the time needed to produce the items is counted, not the time
+        the consumer spends between the items.
+        '''
+        iterator = iter(iterator)
+        perf_counter = time.perf_counter
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.count(name + '_seconds', perf_counter() - start)
+                return
+            self.count(name + '_seconds', perf_counter() - start)
+            yield item
+
+    def snapshot(self):
+        ''' Return a dict with the counters summed up over all threads '''
+        with self._lock:
+            total = collections.Counter(self._finished)
+            for counters in self._all_counters.values():
+                total.update(_copy(counters))
+        return dict(total)
+
+    def reset(self):
+        ''' Set all counters of all threads to zero '''
+        with self._lock:
+            self._finished.clear()
+            for counters in self._all_counters.values():
+                counters.clear()
+
+    @contextlib.contextmanager
+    def scope(self):
+        ''' Context manager, collects the values counted in the block
+
+        Only values counted by the current thread are collected, scopes can
+        be nested. The returned counter is filled when the block is left.
+        '''
+        counters = self._thread_counters()
+        before = collections.Counter(counters)
+        scope = collections.Counter()
+        try:
+            yield scope
+        finally:
+            for name, value in counters.items():
+                difference = value - before.get(name, 0)
+                if difference:
+                    scope[name] = difference
+
+
+class _ThreadOwner(object):
+    ''' Marker in the thread local data, collected when the thread ends '''
+
+
+def _copy(counters):
+    ''' Return a dict copy of counters that another thread may change '''
+    while True:
+        try:
+            return dict(counters)
+        except RuntimeError:
+            # a new key was added by the owning thread meanwhile
+            continue
+
+
+class StatsRepository(pygit2.Repository):
+    ''' pygit2.Repository that counts object lookups by key '''
+
+    def __init__(self, path, stats):
+        ''' Initialization of the repository
+
+        path:   path to the git repository
+        stats:  the Stats to count the object lookups in
+        '''
+        super(StatsRepository, self).__init__(path)
+        self.stats = stats
+
+    def __getitem__(self, key):
+        ''' Look up an object by id and count the lookup '''
+        self.stats.count('object_lookups')
+        # same as pygit2.Repository.__getitem__, without the extra call
+        value = self.git_object_lookup_prefix(key)
+        if value is None:
+            raise KeyError(key)
+        return value
@@ -0,0 +1,134 @@
+''' gitdict.Tracer '''
+
+import collections
+import contextlib
+import functools
+import logging
+import time
+
+
+# logger for the slow operation log
+slow_log = logging.getLogger('gitdict.slow')
+
+# the counters of the stats that are recorded for each span
+SPAN_COUNTERS = (
+    'commits_visited', 'tree_lookups', 'object_lookups', 'bytes_read')
+
+# one traced call of a repository or node operation
+Span = collections.namedtuple(
+    'Span', ('operation', 'git_path', 'seconds') + SPAN_COUNTERS)
+
+
+class Tracer(object):
+    ''' Records spans for repository and node operations
+
+    A Tracer should not be initialized directly, but enabled on a repository:
+        repo.enable_tracing(hook=print, slow_threshold=0.5)
+
+    Each traced call is recorded as a Span with the name of the operation,
+    the git path, the time spent and the commits visited, tree and object
+    lookups and bytes read during the call, taken from the stats of the
+    repository:
+
+    hook
+        optional callable hook(span), called for every span
+    slow_threshold
+        spans taking at least this many seconds are written to the
+        'gitdict.slow' logger as a warning, None disables the slow log
+
+    For generators like walk() or the history, only the time spent in the
+    generator is recorded, not the time the consumer needs between the items.
+    The span is finished when the generator is exhausted or closed.
+
+    Nested operations, e.g. the history walk of last_commit, are recorded as
+    spans of their own.
+    '''
+
+    def __init__(self, stats, hook=None, slow_threshold=None):
+        ''' Initialization of the tracer
+
+        stats:          the stats.Stats of the repository
+        hook:           callable hook(span), called for every span
+        slow_threshold: minimal duration in seconds for the slow log
+        '''
+        self._stats = stats
+        self.hook = hook
+        self.slow_threshold = slow_threshold
+
+    def _counters(self):
+        ''' Return the values of the span counters of the current thread '''
+        counters = self._stats._thread_counters()
+        return [counters[name] for name in SPAN_COUNTERS]
+
+    def _finish(self, operation, git_path, seconds, before):
+        ''' Create and emit a span with the counters since 'before' '''
+        after = self._counters()
+        values = [new - old for new, old in zip(after, before)]
+        self.emit(Span(operation, git_path, seconds, *values))
+
+    def emit(self, span):
+        ''' Pass a span to the hook and the slow log '''
+        if self.hook is not None:
+            self.hook(span)
+        threshold = self.slow_threshold
+        if threshold is not None and span.seconds >= threshold:
+            details = ', '.join(
+                '%s=%d' % (name, getattr(span, name))
+                for name in SPAN_COUNTERS)
+            slow_log.warning('slow %s of %r: %.3f s (%s)', span.operation,
+                             span.git_path, span.seconds, details)
+
+    @contextlib.contextmanager
+    def span(self, operation, git_path):
+        ''' Context manager, records the block as a span '''
+        before = self._counters()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._finish(operation, git_path, seconds, before)
+
+    def traced_iter(self, operation, git_path, iterator):
+        ''' Generator, records the time spent inside the iterator as a span
+
+        The counters are only collected while the iterator produces an item.
+        '''
+        iterator = iter(iterator)
+        perf_counter = time.perf_counter
+        seconds = 0
+        totals = [0] * len(SPAN_COUNTERS)
+        try:
+            while True:
+                before = self._counters()
+                start = perf_counter()
+                try:
+                    item = next(iterator)
+                finally:
+                    seconds += perf_counter() - start
+                    after = self._counters()
+                    for index, (new, old) in enumerate(zip(after, before)):
+                        totals[index] += new - old
+                yield item
+        except StopIteration:
+            pass
+        finally:
+            self.emit(Span(operation, git_path, seconds, *totals))
+
+
+def traced(operation):
+    ''' Decorator, records calls of a node method as spans
+
+    The repository of the node is looked up as 'self._repository', if it has
+    no tracer enabled, the method is called directly.
+    '''
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = self._repository._tracer
+            if tracer is None:
+                return method(self, *args, **kwargs)
+            with tracer.span(operation, self.git_path):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,221 @@
+''' gitdict.Transaction '''
+
+import pygit2
+
+from .utils import GitDictError
+
+
+# marker for a deleted path in the staged changes
+DELETED = object()
+
+
+class NewFolder(dict):
+    ''' Staged changes of a folder that replaces a deleted path or a file
+
+    The entries of the folder in the last commit are not kept.
+    '''
+
+
+class Transaction(object):
+    ''' Many changes to files, written as one commit
+
+    A Transaction should not be initialized directly, but retrieved from a
+    repository and used as a context manager:
+        author = ('Jane Doe', 'jane@example.com')
+        with repo.transaction('import files', author) as tx:
+            tx['docs/index.txt'] = 'some text'
+            tx['bin/run.sh'] = b'#!/bin/sh'
+            del tx['docs/obsolete.txt']
+
+    The changes are staged in memory. When the block is left without an
+    exception, the blobs are written, only the folders on the paths of the
+    changes are rebuilt (unchanged subtrees keep their ids) and one commit is
+    created that advances the branch. The repository then shows the new
+    commit. If an exception is raised in the block, nothing is written.
+
+    tx[git_path] = data
+        stage a file, text is encoded with repo.default_encoding
+    tx.write(git_path, data, filemode=pygit2.GIT_FILEMODE_BLOB)
+        stage a file with a file mode, e.g. GIT_FILEMODE_BLOB_EXECUTABLE
+    del tx[git_path]
+        stage the removal of a file or folder, raises KeyError if the path
+        does not exist
+    git_path in tx
+        check if a path exists, including the staged changes
+    tx.commit_id
+        id of the created commit after the block, None if there were no
+        changes
+
+    The working directory and the index of a non bare repository are not
+    changed, like pushing to the branch would not change them.
+    '''
+
+    def __init__(self, repository, message, author, committer=None):
+        ''' Initialization of the transaction
+
+        repository: the repository
+        message:    the commit message
+        author:     pygit2.Signature or a tuple (name, email)
+        committer:  pygit2.Signature or a tuple (name, email)
+                    if committer is None, the author is used
+        '''
+        self._repository = repository
+        self.message = message
+        self.author = self._signature(author)
+        self.committer = self._signature(committer) if committer else None
+        # nested dicts of names, the leaves are (data, filemode) or DELETED
+        self._changes = {}
+        self.commit_id = None
+
+    def _signature(self, signature):
+        ''' Return a pygit2.Signature for a signature or (name, email) '''
+        if isinstance(signature, pygit2.Signature):
+            return signature
+        try:
+            name, email = signature
+            return pygit2.Signature(name, email)
+        except (TypeError, ValueError):
+            raise GitDictError('Not a signature: ' + repr(signature))
+
+    def _split(self, git_path):
+        ''' Return the names of a git path '''
+        names = [name for name in git_path.split('/') if name]
+        if not names:
+            raise GitDictError('Not a file path: ' + repr(git_path))
+        return names
+
+    def _stage(self, names, change):
+        ''' Stage a change for a path, replaces changes below the path '''
+        node = self._changes
+        for name in names[:-1]:
+            child = node.get(name)
+            if child is None:
+                child = node[name] = {}
+            elif not isinstance(child, dict):
+                # a staged file or deletion is replaced by a folder
+                child = node[name] = NewFolder()
+            node = child
+        node[names[-1]] = change
+
+    def __contains__(self, git_path):
+        ''' Check if a path exists, including the staged changes '''
+        names = self._split(git_path)
+        node = self._changes
+        for index, name in enumerate(names):
+            if name not in node:
+                if isinstance(node, NewFolder):
+                    return False
+                return '/'.join(names) in self._repository
+            node = node[name]
+            if node is DELETED:
+                return False
+            if not isinstance(node, dict):
+                # a staged file, the path must be the file itself
+                return index == len(names) - 1
+        return True
+
+    def __setitem__(self, git_path, data):
+        ''' Stage a file with a data or text content '''
+        self.write(git_path, data)
+
+    def write(self, git_path, data, filemode=pygit2.GIT_FILEMODE_BLOB):
+        ''' Stage a file with a file mode
+
+        git_path:   path of the file, missing folders are created
+        data:       bytes or text, encoded with repo.default_encoding
+        filemode:   pygit2.GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE
+                    or GIT_FILEMODE_LINK
+        '''
+        if isinstance(data, str):
+            data = data.encode(self._repository.default_encoding)
+        if not isinstance(data, bytes):
+            raise GitDictError('Not a file content: ' + repr(type(data)))
+        self._stage(self._split(git_path), (data, filemode))
+
+    def __delitem__(self, git_path):
+        ''' Stage the removal of a file or folder '''
+        if git_path not in self:
+            raise KeyError(git_path)
+        self._stage(self._split(git_path), DELETED)
+
+    def __enter__(self):
+        ''' Context manager interface: return the transaction '''
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        ''' Context manager interface: commit if there was no exception '''
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def commit(self):
+        ''' Write the staged changes as one commit and advance the branch
+
+        Returns the id of the new commit or None if nothing was changed.
+        Raises a GitDictError if the branch was moved by someone else in the
+        meantime.
+        '''
+        repository = self._repository
+        pg2_repo = repository._pg2_repo
+        parent = repository.last_commit
+        changes = self._changes
+        if repository.root:
+            # the paths are relative to the root folder of the repository
+            for name in reversed(repository.root.split('/')):
+                changes = {name: changes}
+        tree_id = self._write_tree(parent.tree, changes)
+        self._changes = {}
+        if tree_id is None:
+            # everything was deleted
+            tree_id = pg2_repo.TreeBuilder().write()
+        if tree_id == parent.tree_id:
+            return None
+        committer = self.committer or self.author
+        try:
+            self.commit_id = pg2_repo.create_commit(
+                repository._reference_name, self.author, committer,
+                self.message, tree_id, [parent.id])
+        except pygit2.GitError as error:
+            # libgit2 checks that the branch still points to the parent
+            raise GitDictError('Could not commit: ' + str(error))
+        repository.refresh()
+        return self.commit_id
+
+    def _write_tree(self, pg2_tree, changes):
+        ''' Write a tree with changes, returns its id or None if empty
+
+        pg2_tree:   the pygit2.Tree before the changes or None
+        changes:    nested dict of the changes below this tree
+
+        Only the subtrees with changes are written, the entries of all other
+        subtrees are kept as they are.
+        '''
+        pg2_repo = self._repository._pg2_repo
+        if pg2_tree is None:
+            builder = pg2_repo.TreeBuilder()
+        else:
+            builder = pg2_repo.TreeBuilder(pg2_tree)
+        for name, change in changes.items():
+            entry = builder.get(name)
+            if change is DELETED:
+                if entry is not None:
+                    builder.remove(name)
+            elif isinstance(change, dict):
+                sub_tree = None
+                if (entry is not None and entry.type == 'tree'
+                        and not isinstance(change, NewFolder)):
+                    sub_tree = pg2_repo[entry.id]
+                sub_tree_id = self._write_tree(sub_tree, change)
+                if sub_tree_id is None:
+                    if entry is not None:
+                        builder.remove(name)
+                else:
+                    builder.insert(name, sub_tree_id,
+                                   pygit2.GIT_FILEMODE_TREE)
+            else:
+                data, filemode = change
+                blob_id = pg2_repo.create_blob(data)
+                builder.insert(name, blob_id, filemode)
+        if not len(builder):
+            return None
+        return builder.write()
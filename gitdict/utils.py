@@ -1,6 +1,13 @@
 import os
+import datetime
 import pygit2
 
+from .history import History
+
+
+# id of a file that does not exist in a diff
+NULL_OID = pygit2.Oid(raw=bytes(20))
+
 
 def ensure_oid(something):
     ''' Return an pygit2.Oid for an unknown variable type.
@@ -23,6 +30,24 @@ def ensure_oid(something):
     raise GitDictError('Unconvertable Oid: ' + repr(something))
 
 
+def ensure_timestamp(something):
+    ''' Return a unix timestamp for a point in time.
+
+    something:  a datetime.datetime, datetime.date or a number of seconds
+                since the epoch; naive datetimes are treated as local time
+
+    Raises a GitDictError, if conversion fails
+    '''
+    if isinstance(something, datetime.datetime):
+        return int(something.timestamp())
+    if isinstance(something, datetime.date):
+        something = datetime.datetime.combine(something, datetime.time())
+        return int(something.timestamp())
+    if isinstance(something, (int, float)) and not isinstance(something, bool):
+        return int(something)
+    raise GitDictError('Unconvertable timestamp: ' + repr(something))
+
+
 def dict_like_get(dict_like, key, default=None):
     ''' Return a dict entry or None.
     
@@ -32,7 +57,7 @@ def dict_like_get(dict_like, key, default=None):
     key:    the key to query the pygit2.Tree
     defaut: default value to return, if the key is not found
     
-    Mostly used in Repository._commit_touches_path()    
+    Mostly used in Repository._changed_entry()    
     '''
     try:
         return dict_like[key]
@@ -56,7 +81,7 @@ class NodeMixin(object):
     file_or_folder.last_commit
         last commit that affected the file or folder
     file_or_folder.history
-        list of commits that affected the file or folder (newest first)
+        commits that affected the object (newest first), see history.History
     '''
 
     @property
@@ -71,9 +96,12 @@ class NodeMixin(object):
 
     @property
     def history(self):
-        ''' Retrun a list of commits that affected the object, newest first. '''
-        
-        return self._repository.commit_history_for(self.git_path)
+        ''' Return the commits that affected the object, newest first.
+
+        The returned History can be iterated like a list or called to
+        retrieve only a page of commits, see history.History
+        '''
+        return History(self._repository, self.git_path)
         
     def _get_object_from_commit(self, commitish):
         ''' Retrieve an object with the same git path from an other commit. 
@@ -87,7 +115,7 @@ class NodeMixin(object):
         commit = self._repository._pg2_repo[commit_id]
         if not isinstance(commit, pygit2.Commit):
             raise GitDictError('Not a commit: ' + repr(commit))
-        entry = dict_like_get(commit.tree, self.git_path)
+        entry = self._repository._tree_entry(commit.tree_id, self.git_path)
         return self._repository._pg2_repo[entry.id] if entry else None
 
         
@@ -84,7 +84,7 @@ setup(
 
     # You can just specify the packages manually here if your project is
     # simple. Or you can use find_packages().
-    packages=find_packages(exclude=['tests', 'docs']),
+    packages=find_packages(exclude=['tests', 'docs', 'benchmarks']),
 
     # Alternatively, if you want to distribute just a my_module.py, uncomment
     # this:
@@ -104,6 +104,7 @@ setup(
     # $ pip install -e .[dev,test]
     extras_require={
         'test': ['pytest'],
+        'numpy': ['numpy'],
     },
 
 )
@@ -15,4 +15,12 @@ def gitrepo(request):
     tar_file.extractall(temp_dir.name)
     return temp_dir.name
 
-    
\ No newline at end of file
+
+@pytest.fixture
+def writable(tmpdir):
+    # a fresh copy of the test repository for tests that change it
+    own_path = os.path.dirname(__file__)
+    tar_path = os.path.join(own_path, 'pygit.git.tar.gz')
+    with tarfile.open(tar_path) as tar_file:
+        tar_file.extractall(str(tmpdir))
+    return str(tmpdir)
@@ -0,0 +1,125 @@
+import pytest
+import io
+import tarfile
+import zipfile
+
+import pygit2
+import gitdict
+import gitdict.archive
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+@pytest.fixture
+def duplicates(tmpdir):
+    ''' repository with the same large blob in two identical folders '''
+    pg2_repo = pygit2.init_repository(str(tmpdir), bare=True)
+    large = pg2_repo.create_blob(b'some repeated line\n' * 1000)
+    script = pg2_repo.create_blob(b'#!/bin/sh\n')
+    link = pg2_repo.create_blob(b'large.txt')
+    builder = pg2_repo.TreeBuilder()
+    builder.insert('large.txt', large, pygit2.GIT_FILEMODE_BLOB)
+    builder.insert('run.sh', script, pygit2.GIT_FILEMODE_BLOB_EXECUTABLE)
+    builder.insert('link.txt', link, pygit2.GIT_FILEMODE_LINK)
+    folder = builder.write()
+    builder = pg2_repo.TreeBuilder()
+    builder.insert('a', folder, pygit2.GIT_FILEMODE_TREE)
+    builder.insert('b', folder, pygit2.GIT_FILEMODE_TREE)
+    signature = pygit2.Signature(
+        'A U Thor', 'author@example.com', 1500000000, 0)
+    pg2_repo.create_commit('refs/heads/master', signature, signature,
+                           'initial', builder.write(), [])
+    return str(tmpdir)
+
+def test_archive_tar(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    chunks = list(repo['docs'].archive('tar', prefix='p/'))
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    data = b''.join(chunks)
+    assert len(data) % 10240 == 0
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        names = tar.getnames()
+        assert names[0] == 'p/Makefile'
+        assert 'p/recipes' in names
+        member = tar.getmember('p/recipes/git-show.rst')
+        assert member.mode == 0o644
+        assert member.mtime == repo.last_commit.commit_time
+        content = tar.extractfile(member).read()
+    assert content == repo['docs/recipes/git-show.rst'].data
+
+def test_archive_tar_gz_and_zip_content(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    expected = repo['docs/recipes/git-show.rst'].data
+    data = b''.join(repo['docs'].archive('tar.gz'))
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as tar:
+        assert tar.extractfile('recipes/git-show.rst').read() == expected
+    data = b''.join(repo['docs'].archive('zip'))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read('recipes/git-show.rst') == expected
+        assert 'recipes/' in archive.namelist()
+
+def test_archive_revision(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    # the recipes were added in the next commit
+    data = b''.join(repo['docs'].archive(
+        'tar', revision='5dfabbd825c3ca0714214f859ec620181d5240c9'))
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        names = tar.getnames()
+    assert 'recipes' not in names
+    assert 'index.rst' in names
+
+def test_archive_errors(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    with pytest.raises(gitdict.GitDictError):
+        repo.archive('rar')
+    # root commit without docs folder
+    with pytest.raises(gitdict.GitDictError):
+        repo['docs'].archive(
+            revision='4940678d9f7d1e71a3a77383a9a84b2c40c41daa')
+    # a tree instead of a commit
+    with pytest.raises(gitdict.GitDictError):
+        repo.archive(revision='bfd1938cd1ee3c37b1cc3170c95821deac9ae0ce')
+
+def test_archive_modes_and_links(duplicates):
+    repo = gitdict.Repository(duplicates)
+    data = b''.join(repo.archive('tar'))
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert tar.getmember('a/run.sh').mode == 0o755
+        assert tar.getmember('a/link.txt').issym()
+        assert tar.getmember('a/link.txt').linkname == 'large.txt'
+        assert tar.getmember('b').isdir()
+    data = b''.join(repo.archive('zip'))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.getinfo('a/run.sh').external_attr >> 16 == 0o100755
+        assert archive.getinfo('a/link.txt').external_attr >> 16 == 0o120777
+        assert archive.read('a/link.txt') == b'large.txt'
+
+def test_archive_reuses_compressed_blobs(duplicates):
+    repo = gitdict.Repository(duplicates)
+    large = repo['a/large.txt'].data
+    data = b''.join(repo.archive('tar.gz'))
+    # the repeated blob is a gzip member of its own, reused for 'b/large.txt'
+    member = gitdict.archive._gzip_member(large + bytes(-len(large) % 512))
+    assert data.count(member) == 2
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as tar:
+        assert tar.extractfile('a/large.txt').read() == large
+        assert tar.extractfile('b/large.txt').read() == large
+    data = b''.join(repo.archive('zip'))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read('b/large.txt') == large
+        info = archive.getinfo('b/large.txt')
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+
+def test_archive_reads_repeated_blobs_once_for_zip(duplicates):
+    repo = gitdict.Repository(duplicates)
+    repo.reset_stats()
+    b''.join(repo.archive('zip'))
+    # large.txt (19000), run.sh (10) and link.txt (9) are read only once
+    assert repo.stats()['bytes_read'] == 19000 + 10 + 9
@@ -0,0 +1,126 @@
+import pytest
+import array
+
+import pygit2
+import gitdict
+
+from . import gitrepo, writable
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_count_lines():
+    assert gitdict.blame.count_lines(b'') == 0
+    assert gitdict.blame.count_lines(b'a') == 1
+    assert gitdict.blame.count_lines(b'a\n') == 1
+    assert gitdict.blame.count_lines(b'a\nb') == 2
+
+def test_blame_for_new_file():
+    commit_id = pygit2.Oid(hex='1' * 40)
+    blame = gitdict.Blame.for_new_file(commit_id, 3)
+    assert len(blame) == 3
+    assert list(blame) == [(commit_id, 1), (commit_id, 2), (commit_id, 3)]
+    assert blame[1] == (commit_id, 2)
+    assert isinstance(blame.commit_indexes, array.array)
+
+def test_file_blame(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['docs/recipes/git-show.rst']
+    blame = gf.blame()
+    assert isinstance(blame, gitdict.Blame)
+    assert len(blame) == 95
+    commits = [commit_id.hex[:7] for commit_id, line in blame]
+    assert commits[:33] == ['38bd4c0'] * 33
+    assert commits[33] == '2b2beb8'
+    assert commits[-7:] == ['38bd4c0'] * 7
+    commit_id = pygit2.Oid(hex='2b2beb80943fd2a7521c537bc7696c60cc28220d')
+    assert blame[33] == (commit_id, 34)
+    expected = {'38bd4c0', '2b2beb8', 'c87d28c', '69f5398', '1cb62ab'}
+    assert set(commits) == expected
+
+def test_file_blame_is_cached(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['docs/recipes/git-show.rst']
+    blame = gf.blame()
+    # one blame for each of the five revisions of the file
+    assert len(repo._blame_cache) == 5
+    assert gf.blame() is blame
+
+def test_file_blame_reuses_previous_revision(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['docs/recipes/git-show.rst']
+    previous = gf.blame()
+    newest = (gf._pg2_blob.id, gf.last_commit.id)
+    del repo._blame_cache[newest]
+    older = dict(repo._blame_cache)
+    blame = gf.blame()
+    assert blame is not previous
+    assert list(blame) == list(previous)
+    assert len(repo._blame_cache) == 5
+    for key, value in older.items():
+        assert repo._blame_cache[key] is value
+
+def test_file_blame_follows_renames(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    blame = repo['src/blob.h'].blame()
+    commits = set(commit_id.hex[:7] for commit_id, line in blame)
+    assert 'bc0c0e1' in commits
+
+def test_file_blame_follows_parents(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    blame = repo['test/test_tree.py'].blame()
+    commits = [commit_id.hex[:7] for commit_id, line in blame]
+    # changed on a side branch, a time sorted walk picks another revision
+    assert commits[71:75] == ['398e717', '398e717', '689412d', '398e717']
+
+def test_file_blame_merge_with_changes_on_both_sides(writable):
+    pg2_repo = pygit2.Repository(writable)
+    master = pg2_repo.lookup_reference('refs/heads/master')
+    def commit(content, parents, time):
+        builder = pg2_repo.TreeBuilder()
+        builder.insert('merged.txt', pg2_repo.create_blob(content),
+                       pygit2.GIT_FILEMODE_BLOB)
+        signature = pygit2.Signature('A U Thor', 'author@example.com', time)
+        return pg2_repo.create_commit(
+            None, signature, signature, 'commit', builder.write(), parents)
+    base = commit(b'a\nb\nc\n', [master.target], 1600000000)
+    left = commit(b'A\nb\nc\n', [base], 1600000100)
+    right = commit(b'a\nb\nC\n', [base], 1600000200)
+    merge = commit(b'A\nb\nC\nd\n', [left, right], 1600000300)
+    master.set_target(merge)
+    repo = gitdict.Repository(writable)
+    blame = repo['merged.txt'].blame()
+    assert list(blame) == [(left, 1), (base, 2), (right, 3), (merge, 4)]
+    assert set(blame.commit_ids) == {base, left, right, merge}
+
+def test_blame_apply_adds_used_commits_only(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    pg2_repo = repo._pg2_repo
+    old_blob = pg2_repo[pg2_repo.create_blob(b'a\nb\n')]
+    new_blob = pg2_repo[pg2_repo.create_blob(b'a\n')]
+    first = pygit2.Oid(hex='1' * 40)
+    second = pygit2.Oid(hex='2' * 40)
+    blame = gitdict.Blame.for_new_file(first, 2)
+    blame = blame.apply(old_blob.diff(new_blob), second, 1)
+    assert list(blame) == [(first, 1)]
+    assert blame.commit_ids == [first]
+
+def test_blame_patch_mismatch(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    pg2_repo = repo._pg2_repo
+    old_blob = pg2_repo[pg2_repo.create_blob(b'a\nb\n')]
+    new_blob = pg2_repo[pg2_repo.create_blob(b'a\nc\n')]
+    commit_id = pygit2.Oid(hex='1' * 40)
+    blame = gitdict.Blame.for_new_file(commit_id, 2)
+    patch = old_blob.diff(new_blob)
+    assert len(blame.apply(patch, commit_id, 2)) == 2
+    with pytest.raises(gitdict.GitDictError):
+        blame.apply(patch, commit_id, 3)
+
+def test_blame_for_unknown_path(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    with pytest.raises(gitdict.GitDictError):
+        repo.blame_for('unknown-path')
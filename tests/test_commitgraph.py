@@ -0,0 +1,71 @@
+import pytest
+import os
+
+import pygit2
+import gitdict
+import gitdict.commitgraph
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_repository_without_commit_graph(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    assert repo.commit_graph is None
+
+def test_write_commit_graph(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    history = list(repo.commit_history_for('docs/recipes'))
+    repo.write_commit_graph()
+    path = os.path.join(gitrepo, 'objects', 'info', 'commit-graph')
+    assert os.path.isfile(path)
+    assert isinstance(repo.commit_graph, gitdict.commitgraph.CommitGraph)
+    assert list(repo.commit_history_for('docs/recipes')) == history
+    # a new repository object picks up the commit graph
+    repo = gitdict.Repository(gitrepo)
+    assert repo.commit_graph is not None
+    assert list(repo.commit_history_for('docs/recipes')) == history
+
+def test_commit_graph_info(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.write_commit_graph()
+    graph = repo.commit_graph
+    assert len(graph) == 1257
+    for commit in repo.history(limit=100):
+        assert commit.id in graph
+        info = graph.info(commit.id)
+        assert info.id == commit.id
+        assert info.commit_time == commit.commit_time
+        assert info.parent_ids == commit.parent_ids
+        assert info.tree_id == commit.tree_id
+
+def test_commit_graph_generation(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.write_commit_graph()
+    graph = repo.commit_graph
+    root = repo.history[-1]
+    assert graph.generation(root.id) == 1
+    commit = repo.last_commit
+    parent_generations = [graph.generation(p) for p in commit.parent_ids]
+    assert graph.generation(commit.id) == max(parent_generations) + 1
+
+def test_commit_graph_unknown_commit(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.write_commit_graph()
+    unknown = pygit2.Oid(hex='0' * 40)
+    assert unknown not in repo.commit_graph
+    assert repo.commit_graph.info(unknown) is None
+    assert repo.commit_graph.generation(unknown) is None
+
+def test_commit_graph_invalid_file(gitrepo):
+    path = os.path.join(gitrepo, 'invalid-commit-graph')
+    with open(path, 'wb') as file_handle:
+        file_handle.write(b'this is not a commit graph')
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.commitgraph.CommitGraph(path)
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.commitgraph.CommitGraph(path + '-missing')
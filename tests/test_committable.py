@@ -0,0 +1,107 @@
+import pytest
+import collections
+import os
+import tarfile
+
+import pygit2
+import gitdict
+import gitdict.committable
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+@pytest.fixture(params=['python', 'numpy'])
+def columns(request, monkeypatch):
+    ''' run the queries with and without numpy '''
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(gitdict.committable, 'numpy', None)
+    return request.param
+
+def all_commits(repo):
+    sorting = pygit2.GIT_SORT_TIME
+    return list(repo._pg2_repo.walk(repo.last_commit.id, sorting))
+
+def test_commit_table_columns(gitrepo, columns):
+    repo = gitdict.Repository(gitrepo)
+    table = repo.commit_table
+    assert table is repo.commit_table
+    commits = all_commits(repo)
+    assert len(table) == len(commits)
+    assert len(table.ids) == 20 * len(commits)
+    for commit in commits[:50]:
+        row = table.row(commit.id)
+        assert table.commit_id(row) == commit.id
+        assert table.times[row] == commit.commit_time
+        author = table.authors[table.author_ids[row]]
+        assert author == (commit.author.name, commit.author.email)
+        parents = [table.commit_id(parent) for parent in table.parents(row)]
+        assert parents == commit.parent_ids
+        assert all(parent < row for parent in table.parents(row))
+    assert table.row(pygit2.Oid(hex='0' * 40)) is None
+    assert len(table.authors) == len(
+        {(c.author.name, c.author.email) for c in commits})
+
+def test_commit_table_select(gitrepo, columns):
+    repo = gitdict.Repository(gitrepo)
+    table = repo.commit_table
+    commits = all_commits(repo)
+    since = commits[100].commit_time
+    until = commits[20].commit_time
+    rows = table.select(since=since, until=until)
+    expected = {commit.id for commit in commits
+                if since <= commit.commit_time <= until}
+    assert {table.commit_id(row) for row in rows} == expected
+    times = [table.times[row] for row in rows]
+    assert times == sorted(times, reverse=True)
+    author = commits[0].author
+    rows = table.select(author=author.email)
+    expected = {commit.id for commit in commits
+                if author.email in (commit.author.name, commit.author.email)}
+    assert {commit.id for commit in table.commits(rows)} == expected
+    assert table.select(author='nobody@example.com') == []
+
+def test_commit_table_counts(gitrepo, columns):
+    repo = gitdict.Repository(gitrepo)
+    table = repo.commit_table
+    commits = all_commits(repo)
+    expected = collections.Counter(
+        (commit.author.name, commit.author.email) for commit in commits)
+    assert table.count_by_author() == expected
+    week = gitdict.committable.WEEK
+    by_week = table.count_by_period()
+    assert sum(by_week.values()) == len(commits)
+    assert list(by_week) == sorted(by_week)
+    expected = collections.Counter(
+        commit.commit_time // week * week for commit in commits)
+    assert dict(by_week) == dict(expected)
+    rows = table.select(since=commits[9].commit_time)
+    assert sum(table.count_by_author(rows).values()) == len(rows)
+    assert sum(table.count_by_period(3600, rows).values()) == len(rows)
+
+def test_commit_table_extended_on_refresh(tmpdir):
+    own_path = os.path.dirname(__file__)
+    tar_path = os.path.join(own_path, 'pygit.git.tar.gz')
+    with tarfile.open(tar_path) as tar_file:
+        tar_file.extractall(str(tmpdir))
+    repo = gitdict.Repository(str(tmpdir))
+    table = repo.commit_table
+    count = len(table)
+    author = ('A U Thor', 'author@example.com')
+    # the transaction refreshes the repository
+    with repo.stats_scope() as scope:
+        with repo.transaction('new', author) as tx:
+            tx['new.txt'] = 'text'
+    assert scope['commits_visited'] == 1
+    assert repo.commit_table is table
+    assert len(table) == count + 1
+    row = table.row(tx.commit_id)
+    assert row == count
+    assert table.authors[table.author_ids[row]] == author
+    assert table.select(author='A U Thor') == [row]
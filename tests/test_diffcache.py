@@ -0,0 +1,125 @@
+import pytest
+import json
+import pickle
+
+import gitdict
+import gitdict.diffcache
+import gitdict.stats
+
+from . import gitrepo
+
+
+# docs without recipes, and the commit adding the recipes
+OLD_COMMIT = '5dfabbd825c3ca0714214f859ec620181d5240c9'
+NEW_COMMIT = '38bd4c065d864c4302dc089a17e16c0c03cdd2f9'
+SHOW_RECIPE = 'docs/recipes/git-show.rst'
+SHOW_COMMITS = ('c87d28c9a807be3203c22f928d9e6bc3810d1aa5',
+                '1cb62ab578c63c48927a82dec2bb3fbb04d0c4b7')
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_repository_compact_diff(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    diff = repo.compact_diff(OLD_COMMIT, NEW_COMMIT)
+    assert isinstance(diff, gitdict.diffcache.CompactDiff)
+    diffstat = repo.diffstat(OLD_COMMIT, NEW_COMMIT)
+    assert [file_diff.new_path for file_diff in diff.files] == list(diffstat)
+    for file_diff in diff.files:
+        assert (file_diff.added, file_diff.removed) == \
+            diffstat[file_diff.new_path]
+    assert diff.added == sum(added for added, removed in diffstat.values())
+    assert diff.removed == sum(removed for added, removed in diffstat.values())
+    by_path = {file_diff.new_path: file_diff for file_diff in diff.files}
+    assert by_path['docs/examples.rst'].status == 'D'
+    assert by_path['docs/index.rst'].status == 'M'
+    show = by_path[SHOW_RECIPE]
+    assert show.status == 'A'
+    assert not show.binary
+    hunk = show.hunks[0]
+    assert (hunk.old_start, hunk.old_lines) == (0, 0)
+    assert hunk.new_lines == len(hunk.lines) == show.added
+    text = ''.join(content for origin, content in hunk.lines)
+    blob = repo._pg2_repo[NEW_COMMIT].tree[SHOW_RECIPE]
+    assert text == repo._pg2_repo[blob.id].data.decode()
+    assert {origin for origin, content in hunk.lines} == {'+'}
+
+def test_compact_diff_is_serializable(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    diff = repo['docs'].compact_diff(OLD_COMMIT, NEW_COMMIT)
+    assert pickle.loads(pickle.dumps(diff)) == diff
+    data = json.loads(json.dumps(diff))
+    assert data[0][0][0] == diff.files[0].old_path
+
+def test_compact_diff_cache_is_shared(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    with repo.stats_scope() as scope:
+        diff = repo['docs'].compact_diff(OLD_COMMIT, NEW_COMMIT)
+        assert repo['docs'].compact_diff(OLD_COMMIT, NEW_COMMIT) == diff
+    assert scope['diff_cache_misses'] == 1
+    assert scope['diff_cache_hits'] == 1
+    # the same trees from a repository with the docs folder as root
+    docs = gitdict.Repository(gitrepo, root='docs')
+    docs._diff_cache = repo._diff_cache
+    with repo.stats_scope() as scope:
+        root_diff = docs.compact_diff(OLD_COMMIT, NEW_COMMIT)
+    assert 'diff_cache_misses' not in scope
+    assert [file_diff.new_path for file_diff in root_diff.files] == [
+        file_diff.new_path[len('docs/'):] for file_diff in diff.files]
+    # other options are another diff
+    with repo.stats_scope() as scope:
+        short = repo['docs'].compact_diff(
+            OLD_COMMIT, NEW_COMMIT, context_lines=0)
+    assert scope['diff_cache_misses'] == 1
+    index = [file_diff for file_diff in short.files
+             if file_diff.new_path == 'docs/index.rst'][0]
+    assert all(origin != ' ' for hunk in index.hunks
+               for origin, content in hunk.lines)
+
+def test_file_compact_diff(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    show = repo[SHOW_RECIPE]
+    old, new = SHOW_COMMITS
+    diff = show.compact_diff(old, new)
+    assert len(diff.files) == 1
+    file_diff = diff.files[0]
+    assert file_diff.old_path == file_diff.new_path == SHOW_RECIPE
+    assert file_diff.status == 'M'
+    assert show.diffstat(old, new) == {
+        SHOW_RECIPE: (file_diff.added, file_diff.removed)}
+    assert show.compact_diff(new) == show.compact_diff(new, repo.last_commit)
+    added = show.compact_diff(OLD_COMMIT, new)
+    assert added.files[0].status == 'A'
+    assert added.added == len(show._get_object_from_commit(new).data.decode(
+        ).splitlines())
+    assert show.compact_diff(new, new) == gitdict.diffcache.CompactDiff(
+        (), 0, 0)
+    with pytest.raises(gitdict.GitDictError):
+        repo['docs'].compact_diff(OLD_COMMIT, show._pg2_blob.id)
+
+def test_diff_cache_budget():
+    stats = gitdict.stats.Stats()
+    cache = gitdict.diffcache.DiffCache(100, stats)
+    diff = gitdict.diffcache.EMPTY_DIFF
+    cache.put('a', diff, 40)
+    cache.put('b', diff, 40)
+    assert cache.get('a') is diff
+    cache.put('c', diff, 40)
+    # 'b' was used least recently
+    assert cache.get('b') is None
+    assert cache.get('a') is diff
+    assert len(cache) == 2
+    assert cache.bytes == 80
+    cache.put('large', diff, 101)
+    assert cache.get('large') is None
+    cache.put('a', diff, 60)
+    assert cache.bytes == 100
+    counters = stats.snapshot()
+    assert counters['diff_cache_evictions'] == 1
+    assert counters['diff_cache_hits'] == 2
+    assert counters['diff_cache_misses'] == 2
+    cache.clear()
+    assert len(cache) == cache.bytes == 0
@@ -0,0 +1,92 @@
+import pytest
+
+import pygit2
+import gitdict
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_repository_diffstat(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    parent = repo.last_commit.parents[0]
+    stats = repo.diffstat(parent)
+    assert stats == {
+        'src/signature.c': (1, 1), 
+        'test/test_signature.py': (3, 3)}
+    # same as the numbers of the patch
+    diff = parent.tree.diff_to_tree(repo.last_commit.tree)
+    for patch in diff:
+        context, added, removed = patch.line_stats
+        assert stats[patch.delta.new_file.path] == (added, removed)
+
+def test_repository_diffstat_reference(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    # the recipes were added in the second commit
+    added = repo.diffstat('5dfabbd825c3ca0714214f859ec620181d5240c9',
+                          '38bd4c065d864c4302dc089a17e16c0c03cdd2f9')
+    removed = repo.diffstat('38bd4c065d864c4302dc089a17e16c0c03cdd2f9',
+                            '5dfabbd825c3ca0714214f859ec620181d5240c9')
+    assert added['docs/recipes/git-show.rst'] == (49, 0)
+    assert removed['docs/recipes/git-show.rst'] == (0, 49)
+
+def test_repository_diffstat_raises_error(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    with pytest.raises(gitdict.GitDictError):
+        repo.diffstat(repo.last_commit.tree_id)
+
+def test_folder_diffstat(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    parent = repo.last_commit.parents[0]
+    assert repo['src'].diffstat(parent) == {'src/signature.c': (1, 1)}
+    assert repo['docs'].diffstat(parent) == {}
+
+def test_folder_diffstat_added_folder(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    # the recipes were added in the next commit
+    stats = folder.diffstat('5dfabbd825c3ca0714214f859ec620181d5240c9',
+                            '38bd4c065d864c4302dc089a17e16c0c03cdd2f9')
+    assert 'docs/recipes/git-show.rst' in stats
+    assert all(removed == 0 for added, removed in stats.values())
+
+def test_file_diffstat(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    parent = repo.last_commit.parents[0]
+    assert repo['src/signature.c'].diffstat(parent) == {
+        'src/signature.c': (1, 1)}
+    assert repo['README.rst'].diffstat(parent) == {}
+    with pytest.raises(gitdict.GitDictError):
+        repo['src/signature.c'].diffstat(repo.last_commit.tree_id)
+
+def test_diffstats(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    commits = repo.history(limit=10)
+    stats = repo.diffstats(commits, threads=3)
+    assert list(stats) == [commit.id for commit in commits]
+    for commit in commits:
+        if len(commit.parents) == 1:
+            assert stats[commit.id] == repo.diffstat(
+                commit.parents[0], commit)
+    assert repo.stats()['diffstat_cache_hits'] > 0
+
+def test_diffstats_range(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    commits = repo.history(limit=3)
+    commit_range = '%s..%s' % (commits[2].id, commits[0].id)
+    stats = repo.diffstats(commit_range)
+    assert list(stats) == [commits[0].id, commits[1].id]
+    assert len(repo.diffstats('%s..' % commits[2].id)) == 2
+    with pytest.raises(gitdict.GitDictError):
+        repo.diffstats('not a range')
+
+def test_diffstats_root_commit(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    root = '4940678d9f7d1e71a3a77383a9a84b2c40c41daa'
+    stats = repo.diffstats([root])[pygit2.Oid(hex=root)]
+    assert stats
+    assert all(removed == 0 for added, removed in stats.values())
@@ -3,8 +3,9 @@ import os
 
 import pygit2
 import gitdict
+import gitdict.lines
 
-from . import gitrepo
+from . import gitrepo, writable
 
 
 def example():
@@ -106,4 +107,84 @@ def test_file_iterator(gitrepo):
         '.. code-block:: bash']
     expected = [l+'\n' for l in lines]
     result = [line for line in gf]
-    assert result[:9] == expected
\ No newline at end of file
+    assert result[:9] == expected
+
+
+def test_file_lines(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['docs/recipes/git-show.rst']
+    expected = list(gf)
+    lines = gf.lines
+    assert len(lines) == len(expected) == gf.line_count
+    assert lines[1] == 'git-show\n'
+    assert lines[-1] == expected[-1]
+    assert lines[5:9] == expected[5:9]
+    assert lines[::3] == expected[::3]
+    assert lines[:] == expected
+    assert lines[100:] == []
+    with pytest.raises(IndexError):
+        lines[len(expected)]
+
+def test_file_line_index_is_cached(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['docs/recipes/git-show.rst']
+    gf.lines
+    repo['docs/recipes/git-show.rst'].lines
+    stats = repo.stats()
+    assert stats['line_index_cache_misses'] == 1
+    assert stats['line_index_cache_hits'] == 1
+    repo.reset_stats()
+    assert gf.line_count == len(gf.lines)
+    assert 'bytes_read' in repo.stats()
+
+
+def test_file_versions(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['docs/recipes/git-show.rst']
+    with repo.stats_scope() as scope:
+        versions = list(gf.versions())
+    assert [version.commit for version in versions] == list(gf.history)
+    assert versions[0].blob_id == gf._pg2_blob.id
+    for commit, blob_id, content in versions:
+        assert gf._get_object_from_commit(commit).id == blob_id
+    # the content is not read by the walk
+    assert 'bytes_read' not in scope
+    assert versions[0].content() == gf.data
+    assert versions[-1].content() == gf._get_object_from_commit(
+        versions[-1].commit).data
+    def ids(versions):
+        return [(version.commit.id, version.blob_id) for version in versions]
+    assert ids(gf.versions(limit=2, offset=1)) == ids(versions[1:3])
+    assert ids(gf.versions(offset=4)) == ids(versions[4:])
+    assert list(gf.versions(limit=0)) == []
+
+
+def test_file_versions_read_each_blob_once(writable):
+    repo = gitdict.Repository(writable)
+    changes = [('first', 'first'), ('second', 'second'), ('first', 'first'),
+               ('delete', None), ('restore', 'first')]
+    for seconds, (message, text) in enumerate(changes):
+        # one commit per second, the history is sorted by time
+        author = pygit2.Signature(
+            'A U Thor', 'author@example.com', 1500000000 + seconds, 0)
+        with repo.transaction(message, author) as tx:
+            if text is None:
+                del tx['notes.txt']
+            else:
+                tx['notes.txt'] = text
+    versions = list(repo.versions_for('notes.txt'))
+    messages = [version.commit.message for version in versions]
+    assert messages == ['restore', 'first', 'second', 'first']
+    with repo.stats_scope() as scope:
+        assert [version.content() for version in versions] == [
+            b'first', b'first', b'second', b'first']
+    assert scope['bytes_read'] == len('first') + len('second')
+
+def test_line_starts():
+    line_starts = gitdict.lines.line_starts
+    assert list(line_starts(b'')) == []
+    assert list(line_starts(b'a')) == [0]
+    assert list(line_starts(b'a\n')) == [0]
+    assert list(line_starts(b'a\n\nbc')) == [0, 2, 3]
+    lines = gitdict.lines.Lines(b'a\n\nbc', line_starts(b'a\n\nbc'), 'utf-8')
+    assert lines[:] == ['a\n', '\n', 'bc']
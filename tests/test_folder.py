@@ -89,6 +89,31 @@ def test_folder_get_default_on_unknown_child(gitrepo):
     assert not isinstance(child, gitdict.File)
     assert child == 'default_value'
 
+def test_folder_remembers_missing_paths(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs']
+    with pytest.raises(KeyError):
+        folder['recipes/unknown.php']
+    assert (folder._pg2_tree.id, 'recipes/unknown.php') in repo._missing_paths
+    with pytest.raises(KeyError):
+        folder['recipes/unknown.php']
+    assert 'recipes/unknown.php' not in folder
+    assert folder.get('recipes/unknown.php') is None
+    stats = repo.stats()
+    assert stats['missing_cache_misses'] == 1
+    assert stats['missing_cache_hits'] == 3
+    # other trees don't share the entries
+    assert 'unknown.php' not in folder['recipes']
+    assert repo.stats()['missing_cache_misses'] == 2
+
+def test_folder_missing_paths_are_bounded(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.missing_cache_size = 10
+    for i in range(20):
+        assert 'unknown-%d' % i not in repo
+    assert len(repo._missing_paths) == 10
+    assert (repo._pg2_tree.id, 'unknown-19') in repo._missing_paths
+
 def test_folder_keys(gitrepo):
     repo = gitdict.Repository(gitrepo)
     folder = repo['docs']
@@ -223,4 +248,88 @@ def test_folder_walk(gitrepo):
         'docs/recipes.rst', 'docs/references.rst', 'docs/remotes.rst', 
         'docs/repository.rst', 'docs/revparse.rst', 'docs/settings.rst', 
         'docs/submodule.rst', 'docs/working-copy.rst']
-    assert paths == expected
\ No newline at end of file
+    assert paths == expected
+
+
+def test_folder_activity(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs']
+    activity = folder.activity()
+    assert [item.commits for item in activity] == sorted(
+        (item.commits for item in activity), reverse=True)
+    by_path = {item.git_path: item for item in activity}
+    for parent, folders, files in folder.walk():
+        for file in files:
+            history = list(file.history)
+            item = by_path[file.git_path]
+            assert item.commits == len(history)
+            assert item.authors == len({c.author.email for c in history})
+            assert item.last_change == history[0].commit_time
+            assert item.added == item.removed == 0
+    assert all(path.startswith('docs/') for path in by_path)
+
+def test_folder_activity_lines_and_since(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    git_path = 'docs/recipes/git-show.rst'
+    history = list(repo[git_path].history)
+    item = {a.git_path: a for a in repo['docs'].activity(lines=True)}[git_path]
+    stats = repo.diffstats(history)
+    assert item.added == sum(s[git_path][0] for s in stats.values())
+    assert item.removed == sum(s[git_path][1] for s in stats.values())
+    assert item.added > 0
+    since = history[1].commit_time
+    recent = repo['docs/recipes'].activity(since=since)
+    item = {a.git_path: a for a in recent}[git_path]
+    assert item.commits == len([c for c in history if c.commit_time >= since])
+    activity = repo.activity(since=since)
+    assert {a.git_path for a in recent} <= {a.git_path for a in activity}
+
+def count_lines(data):
+    ''' for folder.map(), functions must be picklable '''
+    return data.count(b'\n')
+
+def random_token(data):
+    return os.urandom(8)
+
+def fail_on_empty(data):
+    if not data:
+        raise ValueError('empty file')
+    return len(data)
+
+def test_folder_map(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs']
+    expected = {}
+    for parent, folders, files in folder.walk():
+        for file in files:
+            expected[file.git_path] = file.data.count(b'\n')
+    results = list(folder.map(count_lines, processes=2, chunk_size=3))
+    assert len(results) == len(expected)
+    assert dict(results) == expected
+    results = dict(folder.map(count_lines, pattern='*.rst', processes=2))
+    assert results == {path: count for path, count in expected.items()
+                       if path.endswith('.rst')}
+    assert list(folder.map(count_lines, pattern='*.none')) == []
+    results = dict(repo.map(count_lines, pattern='docs/recipes/*'))
+    assert results == {path: count for path, count in expected.items()
+                       if path.startswith('docs/recipes/')}
+
+def test_folder_map_reads_each_blob_once(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    blob_ids = {}
+    for parent, folders, files in repo.walk():
+        for file in files:
+            blob_ids[file.git_path] = file._pg2_blob.id
+    tokens = dict(repo.map(random_token, processes=2))
+    assert tokens.keys() == blob_ids.keys()
+    # paths with the same content share the result of one call
+    assert len(set(tokens.values())) == len(set(blob_ids.values()))
+    for git_path, token in tokens.items():
+        for other_path, other_token in tokens.items():
+            same_blob = blob_ids[git_path] == blob_ids[other_path]
+            assert same_blob == (token == other_token)
+
+def test_folder_map_raises_errors(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    with pytest.raises(ValueError):
+        list(repo.map(fail_on_empty, processes=2))
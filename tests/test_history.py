@@ -0,0 +1,171 @@
+import pytest
+import datetime
+import os
+
+import pygit2
+import gitdict
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def messages(commits):
+    return [commit.message.splitlines()[0] for commit in commits]
+
+def test_history_is_history_object(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    assert isinstance(folder.history, gitdict.History)
+    assert isinstance(repo.history, gitdict.History)
+    assert len(folder.history) == 13
+
+def test_history_limit_and_offset(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    full = list(folder.history)
+    assert folder.history(limit=3) == full[:3]
+    assert folder.history(limit=3, offset=4) == full[4:7]
+    assert folder.history(offset=10) == full[10:]
+    assert folder.history(limit=5, offset=20) == []
+
+def test_history_index_and_slice(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    full = list(folder.history)
+    assert folder.history[0] == full[0]
+    assert folder.history[5] == full[5]
+    assert folder.history[-1] == full[-1]
+    assert folder.history[2:6] == full[2:6]
+    assert folder.history[::2] == full[::2]
+    with pytest.raises(IndexError):
+        folder.history[13]
+
+def test_history_cursor_resumes_walk(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    full = list(folder.history)
+    first = folder.history(limit=5)
+    assert len(repo._history_cursors) == 1
+    second = folder.history(limit=5, after=first[-1])
+    assert len(repo._history_cursors) == 1
+    third = folder.history(limit=5, after=second[-1].id)
+    assert first + second + third == full
+
+def test_history_cursor_without_stored_walk(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    full = list(folder.history)
+    page = folder.history(limit=4, after=str(full[3].id))
+    assert page == full[4:8]
+
+def test_history_cursor_unknown_commit(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    unknown = '0' * 40
+    with pytest.raises(gitdict.GitDictError):
+        folder.history(limit=4, after=unknown)
+
+def test_history_since_and_until(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    since = datetime.datetime.fromtimestamp(1423728504)
+    expected = [
+        'Fix indent error',
+        'Add a recipe for git clone --mirror',
+        'Cherry-pick recipe: clean up after picking',
+        'Add git-cherry-pick recipes',
+        'git-show recipe: Add the easy Python 3 way',
+        'Clarify comments in git-show recipe',
+        'Correct git-show recipe' ]
+    assert messages(folder.history(since=since)) == expected
+    page = folder.history(since=1423728504, until=1429690485)
+    assert messages(page) == expected[3:]
+
+def test_history_author(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    page = folder.history(author='cmn@dwim.me')
+    expected = [
+        'Add a recipe for git clone --mirror',
+        'docs: adjust to recent changes' ]
+    assert messages(page) == expected
+    page = folder.history(author='Carlos Martín Nieto', limit=1)
+    assert messages(page) == expected[:1]
+
+def test_repository_history_page(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    page = repo.history(limit=10)
+    assert len(page) == 10
+    assert page[0] == repo.last_commit
+    assert repo.history(limit=5, after=page[4]) == page[5:]
+
+def test_history_mode_first_parent(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    expected = [
+        'Fix indent error',
+        "Merge remote-tracking branch 'rmoehn/cherry-pick-cleanup'",
+        'Add a recipe for git clone --mirror',
+        'Add git-cherry-pick recipes',
+        "Merge remote-tracking branch 'rmoehn/master'",
+        "Merge remote-tracking branch 'rmoehn/master'",
+        'docs: clarify git-init recipe',
+        'docs: adjust to recent changes',
+        'Doc fixes: change head.oid to head.target in examples',
+        "Merge remote-tracking branch 'jim/master'" ]
+    assert messages(folder.history(mode='first-parent')) == expected
+    page = folder.history(mode='first-parent', limit=4)
+    assert folder.history(mode='first-parent', after=page[-1]) == \
+        folder.history(mode='first-parent')[4:]
+
+def test_history_mode_first_parent_with_commit_graph(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    expected = list(repo.commit_history_for('README.rst', mode='first-parent'))
+    repo.write_commit_graph()
+    repo = gitdict.Repository(gitrepo)
+    assert repo.commit_graph is not None
+    history = repo.commit_history_for('README.rst', mode='first-parent')
+    assert list(history) == expected
+    repo.commit_graph.close()
+    os.remove(os.path.join(gitrepo, 'objects', 'info', 'commit-graph'))
+
+def test_history_mode_full(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    folder = repo['docs/recipes']
+    expected = [
+        'Fix indent error',
+        "Merge remote-tracking branch 'rmoehn/cherry-pick-cleanup'",
+        'Add a recipe for git clone --mirror',
+        'Cherry-pick recipe: clean up after picking',
+        'Add git-cherry-pick recipes',
+        'git-show recipe: Add the easy Python 3 way',
+        'Clarify comments in git-show recipe',
+        'Correct git-show recipe',
+        'Update git-show recipe',
+        'Remove obsolete git-branch recipe',
+        'docs: clarify git-init recipe',
+        'docs: adjust to recent changes',
+        'Doc fixes: change head.oid to head.target in examples',
+        'restructured recipes' ]
+    assert messages(folder.history(mode='full')) == expected
+    # the default mode skips all merges
+    assert messages(folder.history()) == [
+        message for message in expected if not message.startswith('Merge')]
+
+def test_history_mode_full_with_commit_graph(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    expected = list(repo.commit_history_for('src', mode='full'))
+    repo.write_commit_graph()
+    repo = gitdict.Repository(gitrepo)
+    assert list(repo.commit_history_for('src', mode='full')) == expected
+    repo.commit_graph.close()
+    os.remove(os.path.join(gitrepo, 'objects', 'info', 'commit-graph'))
+
+def test_history_unknown_mode(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    with pytest.raises(gitdict.GitDictError):
+        repo['docs'].history(mode='simplify-merges')
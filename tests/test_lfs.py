@@ -0,0 +1,92 @@
+import pytest
+import hashlib
+import os
+
+import gitdict
+import gitdict.lfs
+
+from . import writable
+
+
+AUTHOR = ('A U Thor', 'author@example.com')
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def pointer_for(content):
+    ''' the pointer file and oid for some content '''
+    oid = hashlib.sha256(content).hexdigest()
+    pointer = (
+        'version https://git-lfs.github.com/spec/v1\n'
+        'oid sha256:%s\n'
+        'size %d\n') % (oid, len(content))
+    return pointer.encode('ascii'), oid
+
+def store_object(objects_folder, oid, content):
+    ''' write an object to the local store, like `git lfs fetch` '''
+    folder = os.path.join(objects_folder, oid[0:2], oid[2:4])
+    os.makedirs(folder)
+    with open(os.path.join(folder, oid), 'wb') as file_handle:
+        file_handle.write(content)
+
+def test_lfs_pointer_file(writable):
+    content = b'0123456789' * 100000
+    pointer, oid = pointer_for(content)
+    repo = gitdict.Repository(writable)
+    with repo.transaction('add large file', AUTHOR) as tx:
+        tx['assets/large.bin'] = pointer
+    store_object(os.path.join(writable, 'lfs', 'objects'), oid, content)
+    large = repo['assets/large.bin']
+    assert large.lfs_pointer == gitdict.lfs.Pointer(oid, len(content))
+    assert large.size == len(content)
+    assert large.data == content
+    with large.open() as file_object:
+        assert file_object.read(10) == b'0123456789'
+        file_object.seek(-5, os.SEEK_END)
+        assert file_object.read() == b'56789'
+
+def test_lfs_storage_config(writable, tmpdir):
+    content = b'some content'
+    pointer, oid = pointer_for(content)
+    repo = gitdict.Repository(writable)
+    with repo.transaction('add large file', AUTHOR) as tx:
+        tx['large.bin'] = pointer
+    storage = str(tmpdir.join('storage'))
+    repo._pg2_repo.config['lfs.storage'] = storage
+    store_object(os.path.join(storage, 'objects'), oid, content)
+    repo = gitdict.Repository(writable)
+    assert repo['large.bin'].data == content
+
+def test_lfs_object_missing(writable):
+    content = b'some content'
+    pointer, oid = pointer_for(content)
+    repo = gitdict.Repository(writable)
+    with repo.transaction('add large files', AUTHOR) as tx:
+        tx['missing.bin'] = pointer
+        tx['incomplete.bin'] = pointer_for(content + b'!')[0]
+    missing = repo['missing.bin']
+    assert missing.size == len(content)
+    with pytest.raises(gitdict.GitDictError):
+        missing.data
+    with pytest.raises(gitdict.GitDictError):
+        missing.open()
+    oid = repo['incomplete.bin'].lfs_pointer.oid
+    store_object(os.path.join(writable, 'lfs', 'objects'), oid, content)
+    with pytest.raises(gitdict.GitDictError):
+        repo['incomplete.bin'].data
+
+def test_no_lfs_pointer(writable):
+    repo = gitdict.Repository(writable)
+    pointer, oid = pointer_for(b'content')
+    with repo.transaction('add files', AUTHOR) as tx:
+        tx['broken.bin'] = pointer.replace(b'sha256:', b'md5:')
+        tx['text.txt'] = b'version https://git-lfs.github.com/spec/v1\n'
+    for git_path in ('broken.bin', 'text.txt', 'docs/recipes/git-show.rst'):
+        regular = repo[git_path]
+        assert regular.lfs_pointer is None
+        assert regular.size == len(regular.data)
+        with regular.open() as file_object:
+            assert file_object.read() == regular.data
@@ -0,0 +1,100 @@
+import pytest
+import os
+
+import pygit2
+import gitdict
+import gitdict.manifest
+
+from . import gitrepo
+
+
+OLD_COMMIT = '38bd4c065d864c4302dc089a17e16c0c03cdd2f9'
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def expected_entries(repo, pg2_tree, prefix=''):
+    ''' the files of a tree, walked the slow way '''
+    entries = []
+    for entry in pg2_tree:
+        path = prefix + entry.name
+        if entry.type == 'tree':
+            sub_tree = repo._pg2_repo[entry.id]
+            entries.extend(expected_entries(repo, sub_tree, path + '/'))
+        else:
+            size = repo._pg2_repo[entry.id].size
+            entries.append((path, entry.id, entry.filemode, size))
+    return sorted(entries, key=lambda entry: entry[0].encode('utf-8'))
+
+def test_export_manifest(gitrepo, tmpdir):
+    repo = gitdict.Repository(gitrepo)
+    path = str(tmpdir.join('manifest'))
+    manifest = repo.export_manifest(path)
+    assert isinstance(manifest, gitdict.manifest.Manifest)
+    assert manifest.tree_id == repo._pg2_tree.id
+    expected = expected_entries(repo, repo._pg2_tree)
+    assert len(manifest) == len(expected)
+    assert list(manifest.entries()) == expected
+    assert list(manifest) == [entry[0] for entry in expected]
+    manifest.close()
+
+def test_manifest_lookups(gitrepo, tmpdir):
+    repo = gitdict.Repository(gitrepo)
+    manifest = repo.export_manifest(str(tmpdir.join('manifest')))
+    entry = manifest['docs/recipes/git-show.rst']
+    assert entry.path == 'docs/recipes/git-show.rst'
+    assert entry.id == repo['docs/recipes/git-show.rst']._pg2_blob.id
+    assert entry.filemode == pygit2.GIT_FILEMODE_BLOB
+    assert entry.size == len(repo['docs/recipes/git-show.rst'].data)
+    assert 'docs/recipes/git-show.rst' in manifest
+    assert 'docs/recipes' not in manifest
+    assert manifest.get('no/such/file') is None
+    with pytest.raises(KeyError):
+        manifest['no/such/file']
+    paths = [entry.path for entry in manifest.prefix('docs/recipes/')]
+    assert paths == sorted('docs/recipes/' + name
+                           for name in repo['docs/recipes'].keys())
+    assert list(manifest.prefix('no/such/')) == []
+    manifest.close()
+
+def test_open_manifest_patches_stale_file(gitrepo, tmpdir):
+    path = str(tmpdir.join('manifest'))
+    repo = gitdict.Repository(gitrepo)
+    old = repo.export_manifest(path, revision=OLD_COMMIT)
+    assert old.tree_id == repo._pg2_repo[OLD_COMMIT].tree_id
+    old.close()
+    with repo.stats_scope() as scope:
+        manifest = repo.open_manifest(path)
+    assert manifest.tree_id == repo._pg2_tree.id
+    assert list(manifest.entries()) == expected_entries(repo, repo._pg2_tree)
+    # the tree of the old commit was not walked again
+    full_walk = len(expected_entries(repo, repo._pg2_tree))
+    assert scope['object_lookups'] < full_walk
+    manifest.close()
+    # an up to date manifest is just opened
+    with repo.stats_scope() as scope:
+        manifest = repo.open_manifest(path)
+    assert scope['object_lookups'] == 0
+    manifest.close()
+
+def test_manifest_root_folder(gitrepo, tmpdir):
+    repo = gitdict.Repository(gitrepo, root='docs')
+    manifest = repo.open_manifest(str(tmpdir.join('manifest')))
+    assert manifest.tree_id == repo._pg2_tree.id
+    assert 'recipes/git-show.rst' in manifest
+    manifest.close()
+
+def test_manifest_errors(gitrepo, tmpdir):
+    path = tmpdir.join('manifest')
+    path.write_binary(b'not a manifest')
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.manifest.Manifest(str(path))
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.manifest.Manifest(str(tmpdir.join('missing')))
+    # a broken file is replaced
+    repo = gitdict.Repository(gitrepo)
+    manifest = repo.open_manifest(str(path))
+    assert manifest.tree_id == repo._pg2_tree.id
+    manifest.close()
@@ -0,0 +1,173 @@
+import pytest
+import threading
+
+import gitdict
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_registry_opens_lazily(gitrepo):
+    registry = gitdict.RepositoryRegistry()
+    registry.add('master', gitrepo)
+    registry.add('missing', '/no/such/repository')
+    assert len(registry) == 2
+    assert 'master' in registry
+    assert sorted(registry) == ['master', 'missing']
+    assert registry.open_count == 0
+    repo = registry['master']
+    assert isinstance(repo, gitdict.Repository)
+    assert registry['master'] is repo
+    assert registry.open_count == 1
+    with pytest.raises(gitdict.GitDictError):
+        registry['missing']
+    with pytest.raises(KeyError):
+        registry['unknown']
+    stats = registry.stats()
+    assert stats['configured'] == 2
+    assert stats['open'] == 1
+    assert stats['opens'] == 1
+    assert stats['hits'] == 1
+    assert stats['open_files'] >= 1
+
+def test_registry_shares_handles(gitrepo):
+    registry = gitdict.RepositoryRegistry()
+    registry.add('one', gitrepo)
+    registry.add('two', gitrepo + '/')
+    registry.add('pages', gitrepo, branch='gh-pages')
+    registry.add('docs', gitrepo, root='docs')
+    assert registry['one'] is registry['two']
+    assert registry['pages'] is not registry['one']
+    assert registry['pages'].branch == 'gh-pages'
+    assert registry['docs'].root == 'docs'
+    assert registry.open_count == 3
+    registry.remove('one')
+    assert registry.open_count == 3
+    registry.remove('two')
+    assert registry.open_count == 2
+    registry.close()
+    assert registry.open_count == 0
+    assert registry.stats()['open_files'] == 0
+
+def test_registry_evicts_least_recently_used(gitrepo):
+    registry = gitdict.RepositoryRegistry(max_open=2)
+    registry.add('master', gitrepo)
+    registry.add('pages', gitrepo, branch='gh-pages')
+    registry.add('docs', gitrepo, root='docs')
+    master = registry['master']
+    registry['pages']
+    registry['master']
+    registry['docs']
+    assert registry.open_count == 2
+    assert registry.stats()['evictions'] == 1
+    # 'pages' was evicted, 'master' was used more recently
+    assert registry['master'] is master
+    assert registry.stats()['opens'] == 3
+    registry['pages']
+    assert registry.stats()['opens'] == 4
+
+def test_registry_file_budget(gitrepo):
+    registry = gitdict.RepositoryRegistry(max_files=1)
+    registry.add('master', gitrepo)
+    registry.add('pages', gitrepo, branch='gh-pages')
+    registry['master']
+    registry['pages']
+    # the last opened repository is always kept
+    assert registry.open_count == 1
+    assert registry.stats()['evictions'] == 1
+
+def test_closed_repository_is_still_usable(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    history = list(repo['docs/recipes'].history)
+    repo.write_commit_graph()
+    assert repo.commit_graph is not None
+    repo.close()
+    assert repo.commit_graph is None
+    assert list(repo['docs/recipes'].history) == history
+    assert repo['docs/recipes/git-show.rst'].data
+
+def test_eviction_while_walking_history(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.write_commit_graph()
+    expected = list(repo['docs'].history)
+    registry = gitdict.RepositoryRegistry(max_open=1)
+    registry.add('master', gitrepo)
+    registry.add('pages', gitrepo, branch='gh-pages')
+    started = threading.Event()
+    evicted = threading.Event()
+    walked = []
+    def walk():
+        history = iter(registry['master']['docs'].history)
+        walked.append(next(history))
+        started.set()
+        evicted.wait(10)
+        walked.extend(history)
+    thread = threading.Thread(target=walk)
+    thread.start()
+    started.wait(10)
+    master = registry['master']
+    registry['pages']
+    assert registry.stats()['evictions'] == 1
+    evicted.set()
+    thread.join(10)
+    assert walked == expected
+    # the evicted repository was closed, but is still usable
+    assert master.commit_graph is None
+    assert list(master['docs'].history) == expected
+
+def test_eviction_releases_the_handle(gitrepo):
+    registry = gitdict.RepositoryRegistry(max_open=1)
+    registry.add('master', gitrepo)
+    registry.add('pages', gitrepo, branch='gh-pages')
+    master = registry['master']
+    master['docs'].last_commit
+    registry['pages']
+    assert master._pg2_handle is None
+    assert master._last_commit is None
+    assert master.last_commit.id == master._last_commit_id
+    assert master._pg2_handle is not None
+
+def test_registry_opens_outside_of_the_lock(gitrepo, monkeypatch):
+    registry = gitdict.RepositoryRegistry()
+    registry.add('master', gitrepo)
+    registry.add('pages', gitrepo, branch='gh-pages')
+    pages = registry['pages']
+    opening = threading.Event()
+    proceed = threading.Event()
+    def slow_repository(*args, **kwargs):
+        opening.set()
+        proceed.wait(10)
+        return gitdict.Repository(*args, **kwargs)
+    monkeypatch.setattr(gitdict.registry, 'Repository', slow_repository)
+    opened = []
+    threads = [
+        threading.Thread(target=lambda: opened.append(registry['master']))
+        for i in range(2)]
+    for thread in threads:
+        thread.start()
+    opening.wait(10)
+    # a hit is not blocked by the slow open
+    assert registry['pages'] is pages
+    proceed.set()
+    for thread in threads:
+        thread.join(10)
+    # only one of the opened repositories is kept
+    assert opened[0] is opened[1] is registry['master']
+    assert registry.open_count == 2
+
+def test_close_while_walking_history(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.write_commit_graph()
+    expected = list(repo['docs'].history)
+    history = iter(repo['docs'].history)
+    page = repo['docs'].history(limit=3)
+    walked = [next(history)]
+    repo.close()
+    walked.extend(history)
+    assert walked == expected
+    # the paused walk is gone, the next page is walked again
+    assert repo['docs'].history(limit=3, after=page[-1]) == expected[3:6]
@@ -0,0 +1,87 @@
+import pytest
+import os
+
+import pygit2
+import gitdict
+import gitdict.renames
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_similarity():
+    similarity = gitdict.renames.similarity
+    assert similarity(b'', b'') == 100
+    assert similarity(b'a\nb\n', b'a\nb\n') == 100
+    assert similarity(b'a\nb\n', b'b\na\n') == 100
+    assert similarity(b'a\nb\n', b'a\nc\n') == 50
+    assert similarity(b'a\nb\n', b'c\nd\n') == 0
+    assert similarity(b'aaa\nb\n', b'aaa\n') == 66
+
+def test_follow_renamed_file(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['src/blob.h']
+    assert len(gf.history) == 3
+    history = gf.history(follow=True)
+    expected = [
+        'Update copyright years',
+        'Update copyright year',
+        'Move header files to src/',
+        'Update copyright',
+        'Add Blob.size']
+    assert [c.message.splitlines()[0] for c in history] == expected
+
+def test_follow_pages(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    gf = repo['pygit2/_run.py']
+    full = gf.history(follow=True)
+    assert len(full) == 16
+    first = gf.history(limit=5, follow=True)
+    second = gf.history(limit=5, follow=True, after=first[-1])
+    assert first + second == full[:10]
+    repo._history_cursors.clear()
+    second = gf.history(limit=5, follow=True, after=first[-1])
+    assert first + second == full[:10]
+
+def test_follow_keeps_similarity_scores_in_memory(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo['pygit2/_run.py'].history(follow=True)
+    assert repo._similarity_cache.path is None
+    assert repo._similarity_cache._scores
+    assert not os.path.exists(os.path.join(gitrepo, 'gitdict'))
+
+def test_follow_stores_similarity_scores(gitrepo, tmpdir):
+    repo = gitdict.Repository(gitrepo, cache_dir=str(tmpdir))
+    repo['pygit2/_run.py'].history(follow=True)
+    path = str(tmpdir.join('similarity'))
+    size = gitdict.renames.SimilarityCache.record_size
+    assert os.path.getsize(path) % size == 0
+    cache = gitdict.renames.SimilarityCache(path)
+    pg2_repo = repo._pg2_repo
+    old_id = pg2_repo.revparse_single('203335b^:pygit2/libgit2_build.py').id
+    new_id = pg2_repo.revparse_single('203335b:pygit2/_run.py').id
+    assert (old_id, new_id) in cache
+    assert cache.score(pg2_repo, old_id, new_id) >= 50
+
+def test_similarity_cache_not_writable(gitrepo, tmpdir):
+    # a file instead of a folder, the cache folder can not be created
+    blocker = tmpdir.join('blocker')
+    blocker.write('')
+    repo = gitdict.Repository(gitrepo, cache_dir=str(blocker))
+    assert len(repo['pygit2/_run.py'].history(follow=True)) == 16
+    assert repo._similarity_cache.path is None
+
+def test_similarity_cache_in_memory(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    cache = gitdict.renames.SimilarityCache()
+    old_id = repo['README.rst']._pg2_blob.id
+    new_id = repo['COPYING']._pg2_blob.id
+    assert (old_id, new_id) not in cache
+    score = cache.score(repo._pg2_repo, old_id, new_id)
+    assert 0 <= score < 50
+    assert (old_id, new_id) in cache
+    assert cache.score(repo._pg2_repo, old_id, old_id) == 100
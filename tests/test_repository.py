@@ -88,4 +88,103 @@ def test_repository_diff_between_commits(gitrepo):
 def test_repository_diff_raises_error(gitrepo):
     repo = gitdict.Repository(gitrepo)
     with pytest.raises(gitdict.GitDictError):
-        assert repo.diff(repo._pg2_tree)
\ No newline at end of file
+        assert repo.diff(repo._pg2_tree)
+
+
+def test_repository_history_for_paths(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    paths = [
+        'docs/recipes', 'docs/recipes/git-show.rst', 'README.rst',
+        'pygit2/__init__.py', 'unknown-path', 'docs']
+    histories = repo.history_for_paths(paths)
+    assert list(histories.keys()) == paths
+    for path in paths:
+        assert histories[path] == list(repo.commit_history_for(path))
+    assert histories['unknown-path'] == []
+
+def test_repository_history_for_paths_since(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    histories = repo.history_for_paths(['docs/recipes'], since=1423728504)
+    expected = list(repo.commit_history_for('docs/recipes', since=1423728504))
+    assert histories['docs/recipes'] == expected
+    assert len(expected) == 7
+
+def test_repository_unique_blobs(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    commits = [commit.id for commit in repo.history(limit=20)]
+    expected = set()
+    for commit_id in commits:
+        tree = repo._pg2_repo[commit_id].tree
+        stack = [tree]
+        while stack:
+            for entry in stack.pop():
+                if entry.type == 'tree':
+                    stack.append(repo._pg2_repo[entry.id])
+                elif entry.type == 'blob':
+                    expected.add(entry.id)
+    found = list(repo.unique_blobs(commits))
+    blob_ids = [blob_id for blob_id, git_path, commit in found]
+    assert len(blob_ids) == len(set(blob_ids))
+    assert set(blob_ids) == expected
+    blob_id, git_path, commit = found[0]
+    assert commit.id == commits[0]
+    assert commit.tree[git_path].id == blob_id
+
+def test_repository_unique_blobs_range_and_batches(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    commits = [commit.id for commit in repo.history(limit=5)]
+    # the range also contains the commits of a merged branch
+    commit_range = '%s..%s' % (commits[-1], commits[0])
+    expected = list(repo.unique_blobs(commits[:-1]))
+    found = list(repo.unique_blobs(commit_range))
+    assert found[:len(expected)] == expected
+    batches = list(repo.unique_blobs(commits[:-1], batch_size=100))
+    assert all(len(batch) == 100 for batch in batches[:-1])
+    assert [item for batch in batches for item in batch] == expected
+
+def test_repository_root_folder(gitrepo):
+    full = gitdict.Repository(gitrepo)
+    repo = gitdict.Repository(gitrepo, root='/docs/')
+    assert repo.root == 'docs'
+    assert repo.git_path == ''
+    assert repo._pg2_tree.id == full['docs']._pg2_tree.id
+    assert list(repo.keys()) == list(full['docs'].keys())
+    file = repo['recipes/git-show.rst']
+    assert file.git_path == 'recipes/git-show.rst'
+    assert file.data == full['docs/recipes/git-show.rst'].data
+    assert 'src' not in repo
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.Repository(gitrepo, root='no/such/folder')
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.Repository(gitrepo, root='README.rst')
+
+def test_repository_root_folder_history(gitrepo):
+    full = gitdict.Repository(gitrepo)
+    repo = gitdict.Repository(gitrepo, root='docs')
+    expected = [commit.id for commit in full.commit_history_for('docs')]
+    assert [commit.id for commit in repo.history] == expected
+    git_path = 'recipes/git-show.rst'
+    expected = [commit.id for commit in 
+                full.commit_history_for('docs/' + git_path)]
+    assert [commit.id for commit in repo[git_path].history] == expected
+    assert repo[git_path].last_commit.id == expected[0]
+    histories = repo.history_for_paths([git_path])
+    assert [commit.id for commit in histories[git_path]] == expected
+    assert repo[git_path].blame().commit_ids == (
+        full['docs/' + git_path].blame().commit_ids)
+
+def test_repository_root_folder_diffs(gitrepo):
+    full = gitdict.Repository(gitrepo)
+    repo = gitdict.Repository(gitrepo, root='docs')
+    old = '5dfabbd825c3ca0714214f859ec620181d5240c9'
+    stats = repo.diffstat(old)
+    expected = full.diffstat(old)
+    assert stats == {git_path[len('docs/'):]: value 
+                     for git_path, value in expected.items()
+                     if git_path.startswith('docs/')}
+    assert 'recipes/git-show.rst' in stats
+    diff = repo.diff(old)
+    paths = [patch.delta.new_file.path for patch in diff]
+    assert 'recipes/git-show.rst' in paths
+    chunks = repo.archive('tar', revision=old)
+    assert b''.join(chunks) == b''.join(full['docs'].archive('tar', old))
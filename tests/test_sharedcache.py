@@ -0,0 +1,83 @@
+import pytest
+import multiprocessing
+import os
+
+import gitdict
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_shared_cache_get_and_set(tmpdir):
+    cache = gitdict.SharedCache(str(tmpdir.join('cache.sqlite')))
+    assert cache.get('a') is None
+    cache.set('a', b'spam')
+    cache.set('b', b'ham')
+    assert cache.get('a') == b'spam'
+    assert len(cache) == 2
+    assert cache.size == 7
+    cache.set('a', b'eggs and spam')
+    assert cache.get('a') == b'eggs and spam'
+    assert cache.size == 16
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
+    cache.close()
+
+def test_shared_cache_eviction(tmpdir):
+    cache = gitdict.SharedCache(str(tmpdir.join('cache.sqlite')), 100)
+    for i in range(10):
+        cache.set('key-%d' % i, bytes(20))
+    assert cache.size <= 100
+    assert cache.get('key-0') is None
+    assert cache.get('key-9') == bytes(20)
+    # values larger than the cache are not stored
+    cache.set('large', bytes(101))
+    assert cache.get('large') is None
+
+def _write_to_cache(path):
+    cache = gitdict.SharedCache(path)
+    cache.set('from-child', str(os.getpid()).encode())
+
+def test_shared_cache_between_processes(tmpdir):
+    path = str(tmpdir.join('cache.sqlite'))
+    cache = gitdict.SharedCache(path)
+    cache.get('from-child')
+    process = multiprocessing.Process(target=_write_to_cache, args=(path,))
+    process.start()
+    process.join()
+    assert cache.get('from-child') == str(process.pid).encode()
+
+def test_repository_shares_histories(gitrepo, tmpdir):
+    cache = gitdict.SharedCache(str(tmpdir.join('cache.sqlite')))
+    warm = gitdict.Repository(gitrepo, shared_cache=cache)
+    expected = warm['docs'].last_commit
+    page = warm['docs'].history(limit=5)
+    assert warm.stats()['shared_cache_misses'] == 2
+    cold = gitdict.Repository(gitrepo, shared_cache=cache)
+    assert cold['docs'].last_commit.id == expected.id
+    assert [c.id for c in cold['docs'].history(limit=5)] == [
+        c.id for c in page]
+    stats = cold.stats()
+    assert stats['shared_cache_hits'] == 2
+    assert 'commits_visited' not in stats
+
+def test_repository_shares_blames(gitrepo, tmpdir):
+    cache = gitdict.SharedCache(str(tmpdir.join('cache.sqlite')))
+    warm = gitdict.Repository(gitrepo, shared_cache=cache)
+    expected = warm['docs/recipes/git-show.rst'].blame()
+    cold = gitdict.Repository(gitrepo, shared_cache=cache)
+    blame = cold['docs/recipes/git-show.rst'].blame()
+    assert list(blame) == list(expected)
+    assert cold.stats()['blame_cache_hits'] == 1
+
+def test_blame_to_and_from_bytes(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    blame = repo['docs/recipes/git-show.rst'].blame()
+    copy = gitdict.Blame.from_bytes(blame.to_bytes())
+    assert list(copy) == list(blame)
+    assert copy.commit_ids == blame.commit_ids
@@ -0,0 +1,135 @@
+import pytest
+import threading
+
+import pygit2
+import gitdict
+import gitdict.stats
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_stats_count_and_reset():
+    stats = gitdict.stats.Stats()
+    stats.count('a')
+    stats.count('a', 2)
+    stats.count('b', 0.5)
+    assert stats.snapshot() == {'a': 3, 'b': 0.5}
+    stats.reset()
+    assert stats.snapshot() == {}
+
+def test_stats_summed_over_threads():
+    stats = gitdict.stats.Stats()
+    def work():
+        for i in range(100):
+            stats.count('a')
+    threads = [threading.Thread(target=work) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats.snapshot() == {'a': 400}
+
+def test_stats_of_ended_threads():
+    stats = gitdict.stats.Stats()
+    def work():
+        stats.count('a')
+    for i in range(50):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    # the counters of ended threads are folded into one total
+    assert len(stats._all_counters) == 0
+    stats.count('a')
+    assert stats.snapshot() == {'a': 51}
+    stats.reset()
+    assert stats.snapshot() == {}
+
+def test_stats_snapshot_while_counting():
+    stats = gitdict.stats.Stats()
+    done = threading.Event()
+    def work():
+        # always new keys, the counters of the thread grow
+        for i in range(20000):
+            stats.count(i)
+        done.set()
+    thread = threading.Thread(target=work)
+    thread.start()
+    while not done.is_set():
+        stats.snapshot()
+    thread.join()
+    assert len(stats.snapshot()) == 20000
+
+def test_stats_scope():
+    stats = gitdict.stats.Stats()
+    stats.count('a')
+    with stats.scope() as outer:
+        stats.count('a')
+        with stats.scope() as inner:
+            stats.count('b')
+    stats.count('a')
+    assert outer == {'a': 1, 'b': 1}
+    assert inner == {'b': 1}
+    assert stats.snapshot() == {'a': 3, 'b': 1}
+
+def test_stats_timer_and_timed_iter():
+    stats = gitdict.stats.Stats()
+    with stats.timer('block'):
+        pass
+    items = list(stats.timed_iter('items', range(3)))
+    assert items == [0, 1, 2]
+    snapshot = stats.snapshot()
+    assert snapshot['block_seconds'] >= 0
+    assert snapshot['items_seconds'] >= 0
+
+def test_stats_sink():
+    received = []
+    stats = gitdict.stats.Stats(sink=lambda n, v: received.append((n, v)))
+    stats.count('a', 5)
+    assert received == [('a', 5)]
+
+def test_repository_stats(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    assert isinstance(repo._pg2_repo, pygit2.Repository)
+    repo.reset_stats()
+    repo['docs/recipes/git-show.rst'].last_commit
+    stats = repo.stats()
+    assert stats['object_lookups'] > 0
+    assert stats['commits_visited'] > 0
+    assert stats['tree_lookups'] > 0
+    assert stats['commit_history_for_seconds'] > 0
+    repo.reset_stats()
+    assert repo.stats() == {}
+
+def test_repository_stats_bytes_and_caches(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    repo.reset_stats()
+    gf = repo['.gitattributes']
+    gf.data
+    gf.text
+    assert repo.stats()['bytes_read'] == 32
+    gf = repo['docs/recipes/git-show.rst']
+    gf.blame()
+    gf.blame()
+    stats = repo.stats()
+    assert stats['blame_cache_misses'] == 5
+    assert stats['blame_cache_hits'] == 1
+    page = gf.history(limit=2)
+    gf.history(limit=2, after=page[-1])
+    assert repo.stats()['history_cursor_hits'] == 1
+
+def test_repository_stats_scope_and_sink(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    received = []
+    repo.stats_sink = lambda name, value: received.append((name, value))
+    assert repo.stats_sink is not None
+    with repo.stats_scope() as scope:
+        repo['docs'].last_commit
+    repo.stats_sink = None
+    assert scope['commits_visited'] > 0
+    visited = sum(v for name, v in received if name == 'commits_visited')
+    assert visited == scope['commits_visited']
@@ -0,0 +1,95 @@
+import pytest
+import logging
+
+import gitdict
+import gitdict.tracing
+
+from . import gitrepo
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_tracing_disabled_by_default(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    assert repo._tracer is None
+    assert repo['docs/recipes/git-show.rst'].data
+
+def test_tracing_getitem_and_data(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    spans = []
+    repo.enable_tracing(hook=spans.append)
+    gf = repo['docs/recipes/git-show.rst']
+    gf.data
+    assert [s.operation for s in spans] == ['getitem', 'data']
+    getitem, data = spans
+    assert getitem.git_path == 'docs/recipes/git-show.rst'
+    assert getitem.object_lookups == 3
+    assert getitem.bytes_read == 0
+    assert data.git_path == 'docs/recipes/git-show.rst'
+    assert data.bytes_read == len(gf._pg2_blob.data)
+    assert data.seconds >= 0
+
+def test_tracing_history_and_walk(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    spans = []
+    repo.enable_tracing(hook=spans.append)
+    repo['docs'].last_commit
+    history = [s for s in spans if s.operation == 'history']
+    assert len(history) == 1
+    assert history[0].git_path == 'docs'
+    assert history[0].commits_visited > 0
+    assert history[0].tree_lookups > 0
+    spans.clear()
+    for folder, folders, files in repo['docs'].walk():
+        pass
+    walk = [s for s in spans if s.operation == 'walk']
+    assert len(walk) == 1
+    assert walk[0].git_path == 'docs'
+    assert walk[0].object_lookups > 0
+
+def test_tracing_diff(gitrepo):
+    repo = gitdict.Repository(gitrepo)
+    commit = repo.history[1]
+    spans = []
+    repo.enable_tracing(hook=spans.append)
+    repo.diff(commit)
+    assert spans[-1].operation == 'diff'
+    assert spans[-1].git_path == ''
+
+def test_tracing_slow_log(gitrepo, caplog):
+    repo = gitdict.Repository(gitrepo)
+    repo.enable_tracing(slow_threshold=0)
+    with caplog.at_level(logging.WARNING, logger='gitdict.slow'):
+        repo['docs'].last_commit
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("slow history of 'docs'") for m in messages)
+    assert any('commits_visited=' in m for m in messages)
+    caplog.clear()
+    repo.disable_tracing()
+    with caplog.at_level(logging.WARNING, logger='gitdict.slow'):
+        repo['docs'].last_commit
+    assert caplog.records == []
+
+def test_tracing_slow_threshold(gitrepo, caplog):
+    repo = gitdict.Repository(gitrepo)
+    repo.enable_tracing(slow_threshold=3600)
+    with caplog.at_level(logging.WARNING, logger='gitdict.slow'):
+        repo['docs'].last_commit
+    assert caplog.records == []
+
+def test_traced_iter_counts_only_inside_iterator():
+    stats = gitdict.stats.Stats()
+    spans = []
+    tracer = gitdict.tracing.Tracer(stats, hook=spans.append)
+    def produce():
+        for i in range(3):
+            stats.count('commits_visited')
+            yield i
+    for item in tracer.traced_iter('test', 'path', produce()):
+        stats.count('commits_visited', 10)
+    assert len(spans) == 1
+    assert spans[0].commits_visited == 3
+    assert spans[0].git_path == 'path'
@@ -0,0 +1,138 @@
+import pytest
+
+import pygit2
+import gitdict
+
+from . import gitrepo, writable
+
+
+AUTHOR = ('A U Thor', 'author@example.com')
+
+
+def example():
+    with pytest.raises(Exception):
+        assert 1==2
+    assert 0
+
+def test_transaction_writes_one_commit(writable):
+    repo = gitdict.Repository(writable)
+    parent = repo.last_commit
+    with repo.transaction('add and remove', AUTHOR) as tx:
+        tx['docs/new/notes.txt'] = 'some text'
+        tx['run.sh'] = b'#!/bin/sh\n'
+        del tx['docs/recipes']
+    assert tx.commit_id == repo.last_commit.id
+    assert repo.last_commit.parent_ids == [parent.id]
+    assert repo.last_commit.message == 'add and remove'
+    assert repo.last_commit.author.name == 'A U Thor'
+    assert repo['docs/new/notes.txt'].text == 'some text'
+    assert repo['run.sh'].data == b'#!/bin/sh\n'
+    assert 'docs/recipes' not in repo
+    # a new repository object sees the advanced branch
+    assert gitdict.Repository(writable).last_commit.id == tx.commit_id
+
+def test_transaction_reuses_unchanged_trees(writable):
+    repo = gitdict.Repository(writable)
+    old_tree = repo.last_commit.tree
+    with repo.transaction('one file', AUTHOR) as tx:
+        tx['docs/new.txt'] = 'text'
+    new_tree = repo.last_commit.tree
+    assert new_tree['src'].id == old_tree['src'].id
+    assert new_tree['docs'].id != old_tree['docs'].id
+    old_docs = repo._pg2_repo[old_tree['docs'].id]
+    new_docs = repo._pg2_repo[new_tree['docs'].id]
+    assert new_docs['recipes'].id == old_docs['recipes'].id
+
+def test_transaction_file_mode_and_replacing(writable):
+    repo = gitdict.Repository(writable)
+    with repo.transaction('modes', AUTHOR) as tx:
+        tx.write('bin/run.sh', b'#!/bin/sh\n',
+                 pygit2.GIT_FILEMODE_BLOB_EXECUTABLE)
+        tx['README.rst'] = 'replaced'
+        tx['docs'] = 'a file instead of a folder'
+    tree = repo.last_commit.tree
+    assert tree['bin/run.sh'].filemode == pygit2.GIT_FILEMODE_BLOB_EXECUTABLE
+    assert repo['README.rst'].text == 'replaced'
+    assert isinstance(repo['docs'], gitdict.File)
+
+def test_transaction_staged_paths(writable):
+    repo = gitdict.Repository(writable)
+    with repo.transaction('staged', AUTHOR) as tx:
+        assert 'docs/recipes/git-show.rst' in tx
+        del tx['docs/recipes']
+        assert 'docs/recipes/git-show.rst' not in tx
+        assert 'docs' in tx
+        tx['docs/recipes/new.txt'] = 'new'
+        assert 'docs/recipes/new.txt' in tx
+        assert 'docs/recipes/git-show.rst' not in tx
+        with pytest.raises(KeyError):
+            del tx['no/such/file']
+    assert list(repo['docs/recipes'].keys()) == ['new.txt']
+
+def test_transaction_removes_empty_folders(writable):
+    repo = gitdict.Repository(writable)
+    names = list(repo['docs/recipes'].keys())
+    with repo.transaction('empty folder', AUTHOR) as tx:
+        for name in names:
+            del tx['docs/recipes/' + name]
+    assert 'docs/recipes' not in repo
+    assert 'docs' in repo
+
+def test_transaction_without_changes(writable):
+    repo = gitdict.Repository(writable)
+    head = repo.last_commit.id
+    with repo.transaction('nothing', AUTHOR) as tx:
+        tx['README.rst'] = repo['README.rst'].data
+    assert tx.commit_id is None
+    assert repo.last_commit.id == head
+
+def test_transaction_discarded_on_exception(writable):
+    repo = gitdict.Repository(writable)
+    head = repo.last_commit.id
+    with pytest.raises(ValueError):
+        with repo.transaction('failed', AUTHOR) as tx:
+            tx['new.txt'] = 'text'
+            raise ValueError()
+    assert repo.last_commit.id == head
+    assert gitdict.Repository(writable).last_commit.id == head
+
+def test_transaction_branch_moved(writable):
+    repo = gitdict.Repository(writable)
+    other = gitdict.Repository(writable)
+    with other.transaction('first', AUTHOR) as tx:
+        tx['first.txt'] = 'first'
+    with pytest.raises(gitdict.GitDictError):
+        with repo.transaction('second', AUTHOR) as tx:
+            tx['second.txt'] = 'second'
+
+def test_transaction_errors(writable):
+    repo = gitdict.Repository(writable)
+    with pytest.raises(gitdict.GitDictError):
+        repo.transaction('bad author', 'A U Thor')
+    tx = repo.transaction('bad content', AUTHOR)
+    with pytest.raises(gitdict.GitDictError):
+        tx['file.txt'] = 42
+    with pytest.raises(gitdict.GitDictError):
+        tx['/'] = 'no name'
+
+def test_refresh_and_history(writable):
+    repo = gitdict.Repository(writable)
+    other = gitdict.Repository(writable)
+    assert len(list(repo.history(limit=2))) == 2
+    with other.transaction('pushed', AUTHOR) as tx:
+        tx['pushed.txt'] = 'text'
+    assert 'pushed.txt' not in repo
+    repo.refresh()
+    assert repo['pushed.txt'].text == 'text'
+    assert repo.history(limit=1)[0].id == tx.commit_id
+
+def test_transaction_root_folder(writable):
+    repo = gitdict.Repository(writable, root='docs')
+    with repo.transaction('in docs', AUTHOR) as tx:
+        tx['recipes/new.txt'] = 'new'
+        del tx['recipes/git-show.rst']
+    assert repo['recipes/new.txt'].text == 'new'
+    assert 'recipes/git-show.rst' not in repo
+    full = gitdict.Repository(writable)
+    assert full['docs/recipes/new.txt'].text == 'new'
+    assert 'src' in full
@@ -49,4 +49,18 @@ def test_ensure_oid_form_raises_error():
     with pytest.raises(gitdict.GitDictError):
         assert gitdict.utils.ensure_oid(None)
         assert gitdict.utils.ensure_oid("x")
-        assert gitdict.utils.ensure_oid(object())
\ No newline at end of file
+        assert gitdict.utils.ensure_oid(object())
+
+
+def test_ensure_timestamp_from_number():
+    assert gitdict.utils.ensure_timestamp(1234) == 1234
+    assert gitdict.utils.ensure_timestamp(1234.5) == 1234
+
+def test_ensure_timestamp_from_datetime():
+    import datetime
+    moment = datetime.datetime(2015, 6, 1, 12, tzinfo=datetime.timezone.utc)
+    assert gitdict.utils.ensure_timestamp(moment) == 1433160000
+
+def test_ensure_timestamp_raises_error():
+    with pytest.raises(gitdict.GitDictError):
+        gitdict.utils.ensure_timestamp('yesterday')